@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from celery.schedules import crontab
 
 load_dotenv()
 
@@ -73,7 +74,106 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 GRAPHENE = {"SCHEMA": "config.schema.schema", "ATOMIC_MUTATIONS": True}
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.getenv("GRAPHQL_DOCUMENT_CACHE_SIZE", "500"))
+# Static limits checked before execution; lists without `first` count as this many rows
+GRAPHQL_MAX_QUERY_DEPTH = int(os.getenv("GRAPHQL_MAX_QUERY_DEPTH", "15"))
+GRAPHQL_MAX_QUERY_COST = int(os.getenv("GRAPHQL_MAX_QUERY_COST", "100000"))
+GRAPHQL_DEFAULT_LIST_SIZE = int(os.getenv("GRAPHQL_DEFAULT_LIST_SIZE", "100"))
+
+GRAPHQL_RESPONSE_CACHE_TTL = int(os.getenv("GRAPHQL_RESPONSE_CACHE_TTL", "60"))
+
+# Record resolver timings of every operation into the in-process histograms
+GRAPHQL_TRACING = os.getenv("GRAPHQL_TRACING", "0") == "1"
+# X-GraphQL-Trace header value that returns extensions.tracing (any value in DEBUG)
+GRAPHQL_TRACING_TOKEN = os.getenv("GRAPHQL_TRACING_TOKEN") or None
+
+# Bearer token required by /export/ when set
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN") or None
+
+
+def _shared_cache(redis_url, location, max_entries):
+    """Redis when configured, so all workers share it, otherwise per-process memory."""
+    if redis_url:
+        return {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": redis_url,
+            "TIMEOUT": None,
+        }
+    return {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": location,
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": max_entries},
+    }
+
+
+# Automatic persisted queries and cached query responses
+PERSISTED_QUERIES_REDIS_URL = os.getenv("PERSISTED_QUERIES_REDIS_URL")
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "persisted_queries": _shared_cache(PERSISTED_QUERIES_REDIS_URL, "persisted-queries", 10000),
+    "graphql_responses": _shared_cache(RESPONSE_CACHE_REDIS_URL, "graphql-responses", 5000),
+}
+
+# Products waiting for a stock recalculation: a Redis set when set, else a table
+RECALC_QUEUE_REDIS_URL = os.getenv("RECALC_QUEUE_REDIS_URL") or None
+RECALC_DEBOUNCE_SECONDS = int(os.getenv("RECALC_DEBOUNCE_SECONDS", "5"))
+RECALC_BATCH_SIZE = int(os.getenv("RECALC_BATCH_SIZE", "1000"))
+
+# In-process write-behind AnalyticsEvent buffer
+ANALYTICS_BUFFER_SIZE = int(os.getenv("ANALYTICS_BUFFER_SIZE", "500"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "1.0"))
+# Events waiting past this are dropped (0 for no limit)
+ANALYTICS_BUFFER_MAX_DEPTH = int(os.getenv("ANALYTICS_BUFFER_MAX_DEPTH", "100000"))
+
+# Daily sales / stock movement rollups, refreshed by beat; the lag leaves room for
+# transactions still open when a refresh runs
+ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", "300"))
+ROLLUP_LAG_SECONDS = int(os.getenv("ROLLUP_LAG_SECONDS", "300"))
+
+# Monthly partitions of AnalyticsEvent / InventoryEntry: created this many months
+# ahead, and AnalyticsEvent ones dropped (or only detached) after the retention;
+# 0 keeps every month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+ANALYTICS_RETENTION_MONTHS = int(os.getenv("ANALYTICS_RETENTION_MONTHS", "0"))
+ANALYTICS_RETENTION_DETACH = os.getenv("ANALYTICS_RETENTION_DETACH", "0") == "1"
+
+# Transactional outbox relay: batch size, idle poll interval of `manage.py relay_outbox`
+# and attempts before a failing message is left for inspection
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+
+# Full-catalog stock reconciliation: products per chunk, and local processes when
+# Celery runs eager
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "5000"))
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", str(min(os.cpu_count() or 1, 8))))
 
 CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "0") == "1"
+CELERY_BEAT_SCHEDULE = {
+    "checkpoint-stock": {
+        "task": "inventory.checkpoint_stock",
+        "schedule": crontab(hour=0, minute=5),
+    },
+    # Safety net for drains the debounced scheduling missed
+    "drain-recalculations": {
+        "task": "inventory.drain_recalculations",
+        "schedule": 60.0,
+    },
+    "refresh-rollups": {
+        "task": "inventory.refresh_rollups",
+        "schedule": float(ROLLUP_REFRESH_SECONDS),
+    },
+    # Safety net for deployments without the relay_outbox process
+    "relay-outbox": {
+        "task": "inventory.relay_outbox",
+        "schedule": 30.0,
+    },
+    "maintain-partitions": {
+        "task": "inventory.maintain_partitions",
+        "schedule": crontab(hour=0, minute=15),
+    },
+}
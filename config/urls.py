@@ -2,8 +2,10 @@ from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 from modules.graphene_custom.custom_view import CustomGraphQLView
+from modules.graphene_custom.export import ExportView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("export/<str:name>/", ExportView.as_view(types="inventory.schema.exports")),
     path("graphql/", csrf_exempt(CustomGraphQLView.as_view(graphiql=True))),
 ]
@@ -0,0 +1,174 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import AnalyticsEvent
+
+logger = logging.getLogger(__name__)
+
+
+class LocalEventStore:
+    """Events buffered in this process only."""
+
+    def __init__(self):
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def push(self, events):
+        with self._lock:
+            self._events.extend(events)
+            return len(self._events)
+
+    def push_front(self, events):
+        with self._lock:
+            self._events.extendleft(reversed(events))
+
+    def pop(self, count):
+        with self._lock:
+            return [self._events.popleft() for _ in range(min(count, len(self._events)))]
+
+    def depth(self):
+        return len(self._events)
+
+
+class AnalyticsBuffer:
+    """
+    Write-behind buffer of AnalyticsEvent rows, for producers writing one event at
+    a time (the outbox relay and the recalc drain insert theirs in bulk, in the
+    transaction that claims their work). Producers append, and events are
+    written with one bulk_create per `batch_size` events, as soon as that many are
+    waiting or at the latest `flush_interval` seconds after being appended (by a
+    daemon thread). Whatever is left is flushed at interpreter exit and worker
+    shutdown; events of a batch that fails to insert go back to the queue. Past
+    `max_depth` waiting events, new ones are dropped and counted rather than
+    queued, so a database outage cannot exhaust memory.
+    """
+
+    def __init__(self, store=None, batch_size=500, flush_interval=1.0, max_depth=None):
+        self.store = store or LocalEventStore()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.flushed = self.flushes = self.failures = self.dropped = 0
+        self.last_flush_ms = self.max_flush_ms = 0.0
+        self._flush_lock = threading.Lock()
+        self._pid = None
+
+    def append(self, kind, payload, order_id=None):
+        self.extend([{"kind": kind, "payload": payload, "order_id": order_id}])
+
+    def extend(self, events):
+        if self.max_depth:
+            room = max(self.max_depth - self.store.depth(), 0)
+            if room < len(events):
+                self.dropped += len(events) - room
+                logger.warning(
+                    "Analytics buffer full (%d events), dropped %d event(s)",
+                    self.max_depth,
+                    len(events) - room,
+                )
+                events = events[:room]
+                if not events:
+                    return
+        depth = self.store.push(events)
+        self._start()
+        if depth >= self.batch_size:
+            try:
+                self.flush(full_batches_only=True)
+            except Exception:
+                # The events stay queued; failing the producer would only duplicate them
+                logger.exception("Analytics event flush failed")
+
+    def flush(self, full_batches_only=False):
+        """Write the buffered events; returns how many were written."""
+        written = 0
+        with self._flush_lock:
+            while not full_batches_only or self.store.depth() >= self.batch_size:
+                events = self.store.pop(self.batch_size)
+                if not events:
+                    break
+                started = time.perf_counter()
+                try:
+                    AnalyticsEvent.objects.bulk_create(
+                        [
+                            AnalyticsEvent(
+                                kind=event["kind"],
+                                payload=event["payload"],
+                                order_id=event["order_id"],
+                            )
+                            for event in events
+                        ]
+                    )
+                except Exception:
+                    self.failures += 1
+                    self.store.push_front(events)
+                    raise
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+                self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+                self.flushes += 1
+                self.flushed += len(events)
+                written += len(events)
+                logger.info(
+                    "Flushed %d analytics events in %.1f ms, %d waiting",
+                    len(events),
+                    self.last_flush_ms,
+                    self.store.depth(),
+                )
+        return written
+
+    def stats(self):
+        return {
+            "depth": self.store.depth(),
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+    def _start(self):
+        # Once per process: prefork workers must not rely on their parent's thread
+        if self._pid == os.getpid() or not self.flush_interval:
+            return
+        self._pid = os.getpid()
+        self._flush_lock = threading.Lock()
+        atexit.register(self.close)
+        threading.Thread(target=self._run, name="analytics-flusher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self._flush_in_background()
+
+    def _flush_in_background(self):
+        # Outside any request cycle, so broken or expired connections are dropped here
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Analytics event flush failed")
+        finally:
+            close_old_connections()
+
+    def close(self):
+        """Flush what is left; called at exit and on worker shutdown."""
+        self.flush()
+
+
+def make_buffer():
+    return AnalyticsBuffer(
+        LocalEventStore(),
+        batch_size=settings.ANALYTICS_BUFFER_SIZE,
+        flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+        max_depth=settings.ANALYTICS_BUFFER_MAX_DEPTH,
+    )
+
+
+analytics_buffer = make_buffer()
@@ -2,3 +2,16 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "inventory"
+
+    def ready(self):
+        from modules.graphene_custom.response_cache import connect_invalidation
+        from .models import Customer, InventoryEntry, Order, OrderItem, Product, StockBalance
+        from .rollups import connect_rollups
+
+        # The models the schema exposes. Materialized columns and ledger entries are
+        # written by queryset updates and bulk_create, which send no signal
+        connect_invalidation(
+            [Product, Customer, InventoryEntry, Order, OrderItem],
+            derived={InventoryEntry: [StockBalance], OrderItem: [Order, InventoryEntry]},
+        )
+        connect_rollups()
@@ -0,0 +1,70 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inventory.models import DailySales, DailyStockMovement, RollupWatermark
+from inventory.rollups import WATERMARK, all_days, rebuild_days
+from modules.shared.utils import db_now
+
+
+def backfill_chunk(days):
+    try:
+        return rebuild_days(days)
+    finally:
+        # Each worker thread has its own connection
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales and stock movement rollups, in parallel by date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first", type=datetime.date.fromisoformat)
+        parser.add_argument("--to", dest="last", type=datetime.date.fromisoformat)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-days", type=int, default=7, help="Days rebuilt per job")
+
+    def handle(self, *args, **options):
+        first, last = options["first"], options["last"]
+        if first and last and last < first:
+            raise CommandError("--to must not be before --from")
+        started = db_now() - timedelta(seconds=settings.ROLLUP_LAG_SECONDS)
+        # Days already rolled up too, so rollups of since deleted rows are cleared
+        known = all_days()
+        for model in (DailySales, DailyStockMovement):
+            known.update(model.objects.values_list("day", flat=True).distinct())
+        days = sorted(
+            day
+            for day in known
+            if (first is None or day >= first) and (last is None or day <= last)
+        )
+        chunks = []
+        for day in days:
+            if chunks and day - chunks[-1][0] < timedelta(days=options["chunk_days"]):
+                chunks[-1].append(day)
+            else:
+                chunks.append([day])
+
+        if options["workers"] > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                written = sum(executor.map(backfill_chunk, chunks))
+        else:
+            written = sum(rebuild_days(chunk) for chunk in chunks)
+
+        if first is None and last is None:
+            # A full backfill covers everything updated before it started
+            RollupWatermark.objects.get_or_create(
+                name=WATERMARK, defaults={"updated_through": started}
+            )
+            RollupWatermark.objects.filter(name=WATERMARK, updated_through__isnull=True).update(
+                updated_through=started
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(days)} day(s) in {len(chunks)} chunk(s): {written} rollup row(s)."
+            )
+        )
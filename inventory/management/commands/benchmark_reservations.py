@@ -0,0 +1,75 @@
+import threading
+import time
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connection
+from inventory.models import InventoryEntry, Product
+from inventory.stock import current_stock, ledger_stock, reserve_stock
+
+
+class Command(BaseCommand):
+    help = "Measure reserve_stock throughput with many concurrent writers on one hot SKU"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=50)
+        parser.add_argument("--reservations", type=int, default=20, help="Attempts per writer")
+        parser.add_argument(
+            "--stock",
+            type=int,
+            default=None,
+            help="Initial stock (default: half of all attempts, so the rest must be rejected)",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark product")
+
+    def handle(self, *args, **options):
+        writers, per_writer = options["writers"], options["reservations"]
+        attempts = writers * per_writer
+        initial = options["stock"] if options["stock"] is not None else attempts // 2
+
+        product = Product.objects.create(name="Reservation benchmark", sku=f"BENCH-{uuid.uuid4()}")
+        InventoryEntry.objects.create(product=product, delta=initial, note="Benchmark stock")
+
+        reserved, rejected = [], []
+        start_gate = threading.Barrier(writers)
+
+        def writer():
+            ok = failed = 0
+            try:
+                start_gate.wait()
+                for _ in range(per_writer):
+                    try:
+                        reserve_stock(product.id, 1, "Benchmark reservation")
+                        ok += 1
+                    except ValidationError:
+                        failed += 1
+            finally:
+                reserved.append(ok)
+                rejected.append(failed)
+                connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        balance, ledger = current_stock(product.id), ledger_stock(product.id)
+        self.stdout.write(
+            f"{writers} writers x {per_writer} attempts on one SKU in {elapsed:.2f}s: "
+            f"{attempts / elapsed:.0f} attempts/s, {sum(reserved) / elapsed:.0f} reservations/s"
+        )
+        self.stdout.write(
+            f"initial={initial} reserved={sum(reserved)} rejected={sum(rejected)} "
+            f"balance={balance} ledger={ledger}"
+        )
+        if balance < 0 or balance != ledger or sum(reserved) > initial:
+            self.stdout.write(self.style.ERROR("Oversold or balance out of step with ledger!"))
+        else:
+            self.stdout.write(self.style.SUCCESS("No oversell; balance matches ledger."))
+
+        if not options["keep"]:
+            product.delete()
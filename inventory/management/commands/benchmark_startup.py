@@ -0,0 +1,72 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, so every import is cold as in a new worker
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+timings = {}
+
+def mark(name):
+    global started
+    now = time.perf_counter()
+    timings[name] = (now - started) * 1000
+    started = now
+
+import django
+django.setup()
+# As the first request does; the node types must not be built by the URLconf
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark("django.setup")
+import inventory.schema
+mark("node types")
+from graphene_django.settings import graphene_settings
+graphene_settings.SCHEMA
+mark("schema build")
+from modules.shared.utils import convert_offset_to_timezone
+convert_offset_to_timezone(0)
+mark("timezone lookup")
+from graphql import parse, validate
+validate(graphene_settings.SCHEMA.graphql_schema, parse("{ products(first: 1) { sku } }"))
+mark("first validation")
+print(json.dumps(timings))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure worker cold start: django.setup, node types, schema build, first request work"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--max-ms", type=float, help="Fail when the median total is over this budget"
+        )
+
+    def handle(self, *args, **options):
+        runs = []
+        for _ in range(options["runs"]):
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT],
+                capture_output=True,
+                check=True,
+                cwd=settings.BASE_DIR,
+                text=True,
+            ).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+
+        medians = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+        total = statistics.median(sum(run.values()) for run in runs)
+        for name, ms in medians.items():
+            self.stdout.write(f"{name:<18}{ms:9.1f} ms")
+        self.stdout.write(f"{'total':<18}{total:9.1f} ms  (median of {len(runs)} runs)")
+
+        if options["max_ms"] is not None and total > options["max_ms"]:
+            raise CommandError(
+                f"Cold start {total:.1f} ms is over the {options['max_ms']} ms budget"
+            )
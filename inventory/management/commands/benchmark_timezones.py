@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from django.core.management.base import BaseCommand
+from modules.shared.utils import convert_offset_to_timezone, timezone_offset_index
+
+
+def scan_offset_to_timezone(offset_minutes):
+    """The previous implementation: scan every pytz zone on each call."""
+    offset = timedelta(minutes=offset_minutes)
+    now = datetime.now(pytz.utc)
+    for tz in map(pytz.timezone, pytz.all_timezones):
+        if now.astimezone(tz).utcoffset() == offset:
+            return tz.zone
+    return "America/New_York"
+
+
+class Command(BaseCommand):
+    help = "Compare the offset -> timezone index with a full pytz scan per call"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=200)
+
+    def handle(self, *args, **options):
+        calls = options["calls"]
+        offsets = [0, -300, 60, 330, -180, 545, 720, -600]
+
+        started = time.perf_counter()
+        timezone_offset_index()
+        build = time.perf_counter() - started
+
+        results = {}
+        for name, convert in (
+            ("pytz scan", scan_offset_to_timezone),
+            ("offset index", convert_offset_to_timezone),
+        ):
+            started = time.perf_counter()
+            results[name] = [convert(offsets[i % len(offsets)]) for i in range(calls)]
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{name:>12}: {elapsed / calls * 1e6:10.1f} us/call over {calls} calls"
+            )
+
+        self.stdout.write(f"index build: {build * 1e3:.1f} ms (once, until the next DST change)")
+        if results["pytz scan"] == results["offset index"]:
+            self.stdout.write(self.style.SUCCESS("Both return the same zones."))
+        else:
+            self.stdout.write(self.style.ERROR("Zone names differ!"))
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.schema import exports
+from modules.graphene_custom.export import (
+    FORMATS,
+    ExportError,
+    export_queryset,
+    export_stream,
+    parse_json_argument,
+)
+from modules.shared.utils import convert_offset_to_timezone
+
+
+class Command(BaseCommand):
+    help = "Stream every row of an export (inventory-entries, orders, order-items) to a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", choices=sorted(exports))
+        parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+        parser.add_argument("--where", help="JSON where input, as for the BatchReadField")
+        parser.add_argument("--order-by", help="JSON orderBy input")
+        parser.add_argument("--created-at", help="JSON createdAt filter (year, month, gte, lte)")
+        parser.add_argument("--timezone", type=int, default=0, help="Minutes from UTC")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--output", "-o", help="File to write, stdout by default")
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                exports[options["name"]],
+                where=parse_json_argument(options["where"], "where"),
+                order_by=parse_json_argument(options["order_by"], "orderBy"),
+                created_at=parse_json_argument(options["created_at"], "createdAt"),
+                timezone=convert_offset_to_timezone(options["timezone"]),
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        chunks = export_stream(queryset, options["format"], options["gzip"], options["chunk_size"])
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
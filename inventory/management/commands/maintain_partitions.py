@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from inventory.partitions import maintain_partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions and drop AnalyticsEvent ones past the retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, help="Months to create ahead of this one")
+        parser.add_argument(
+            "--retention", type=int, help="Months of AnalyticsEvent partitions to keep, 0 for all"
+        )
+        parser.add_argument(
+            "--detach", action="store_true", default=None, help="Detach expired partitions only"
+        )
+
+    def handle(self, *args, **options):
+        result = maintain_partitions(
+            ahead=options["ahead"], retention=options["retention"], detach=options["detach"]
+        )
+        for name in result["created"]:
+            self.stdout.write(f"created {name}")
+        for name in result["dropped"]:
+            self.stdout.write(f"{'detached' if options['detach'] else 'dropped'} {name}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(result['created'])} partition(s) created, "
+                f"{len(result['dropped'])} expired."
+            )
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from inventory.models import InventoryEntry, StockBalance
+
+
+class Command(BaseCommand):
+    help = "Rebuild StockBalance rows from the InventoryEntry ledger, or check them with --verify"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verify", action="store_true", help="Report drift without writing")
+
+    def handle(self, *args, **options):
+        ledger = dict(
+            InventoryEntry.objects.order_by().values_list("product_id").annotate(total=Sum("delta"))
+        )
+        balances = dict(StockBalance.objects.values_list("product_id", "quantity"))
+        drift = {
+            product_id: ledger.get(product_id, 0)
+            for product_id in set(ledger) | set(balances)
+            if ledger.get(product_id, 0) != balances.get(product_id)
+        }
+        for product_id, expected in sorted(drift.items()):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Product {product_id}: balance {balances.get(product_id)} != ledger {expected}"
+                )
+            )
+
+        if options["verify"]:
+            if drift:
+                raise CommandError(f"{len(drift)} stock balance(s) out of step with the ledger")
+            self.stdout.write(
+                self.style.SUCCESS(f"{len(balances)} stock balances match the ledger.")
+            )
+            return
+
+        with transaction.atomic():
+            for product_id, expected in drift.items():
+                StockBalance.objects.update_or_create(
+                    product_id=product_id, defaults={"quantity": expected}
+                )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(drift)} stock balance(s)."))
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inventory.outbox import outbox_stats, relay_outbox
+
+
+class Command(BaseCommand):
+    help = "Dispatch outbox messages in batches; runs until stopped unless --once"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Relay what is due, then exit")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--interval", type=float, help="Seconds to wait when nothing is due")
+
+    def handle(self, *args, **options):
+        interval = options["interval"] or settings.OUTBOX_POLL_INTERVAL
+        while True:
+            started = time.perf_counter()
+            relayed = relay_outbox(options["batch_size"])
+            if relayed:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"Relayed {relayed} message(s) in {elapsed * 1000:.1f} ms, {outbox_stats()}"
+                )
+            if options["once"]:
+                return
+            close_old_connections()
+            if not relayed:
+                time.sleep(interval)
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_balances(apps, schema_editor):
+    InventoryEntry = apps.get_model("inventory", "InventoryEntry")
+    StockBalance = apps.get_model("inventory", "StockBalance")
+    totals = (
+        InventoryEntry.objects.order_by()
+        .values_list("product_id")
+        .annotate(total=models.Sum("delta"))
+    )
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=product_id, quantity=total) for product_id, total in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_balance",
+                        to="inventory.product",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_stockbalance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("as_of", models.DateTimeField()),
+                ("quantity", models.IntegerField()),
+            ],
+            options={
+                "ordering": ["-as_of"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="inventoryentry",
+            index=models.Index(fields=["product", "created_at"], name="inv_entry_product_created"),
+        ),
+        migrations.AddField(
+            model_name="stockcheckpoint",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_checkpoints",
+                to="inventory.product",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stockcheckpoint",
+            constraint=models.UniqueConstraint(
+                fields=("product", "as_of"), name="unique_stock_checkpoint"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:38
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model("inventory", "Order")
+    OrderItem = apps.get_model("inventory", "OrderItem")
+    item_totals = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum(F("quantity") * F("unit_price_cents")))
+        .values("total")
+    )
+    Order.objects.update(total_cents=Coalesce(Subquery(item_totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_stock_checkpoints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="total_cents",
+            field=models.BigIntegerField(
+                default=0,
+                editable=False,
+                help_text="Sum of item totals, kept in step by OrderItem writes",
+            ),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
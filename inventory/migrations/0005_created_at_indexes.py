@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:54
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking writes on the large tables
+    atomic = False
+
+    dependencies = [
+        ("inventory", "0004_order_total_cents"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="analyticsevent",
+            index=models.Index(fields=["created_at", "id"], name="analytics_event_created_at"),
+        ),
+        AddIndexConcurrently(
+            model_name="inventoryentry",
+            index=models.Index(fields=["created_at", "id"], name="inv_entry_created_at"),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(fields=["created_at", "id"], name="order_created_at"),
+        ),
+    ]
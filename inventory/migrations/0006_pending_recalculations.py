@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_created_at_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingRecalculation",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="inventory.product",
+                    ),
+                ),
+                ("requested_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
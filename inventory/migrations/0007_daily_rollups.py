@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0006_pending_recalculations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("revenue_cents", models.BigIntegerField(default=0)),
+                ("units", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DailyStockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("net_delta", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupStaleDay",
+            fields=[
+                ("day", models.DateField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("name", models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ("updated_through", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="dailystockmovement",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="inventory.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailysales",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="inventory.product",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailystockmovement",
+            constraint=models.UniqueConstraint(
+                fields=("product", "day"), name="unique_daily_stock_movement"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="dailysales",
+            constraint=models.UniqueConstraint(
+                fields=("product", "day"), name="unique_daily_sales"
+            ),
+        ),
+    ]
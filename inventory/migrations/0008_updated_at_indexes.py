@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking writes on the large tables
+    atomic = False
+
+    dependencies = [
+        ("inventory", "0007_daily_rollups"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="inventoryentry",
+            index=models.Index(fields=["updated_at"], name="inv_entry_updated_at"),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(fields=["updated_at"], name="order_updated_at"),
+        ),
+        AddIndexConcurrently(
+            model_name="orderitem",
+            index=models.Index(fields=["updated_at"], name="order_item_updated_at"),
+        ),
+    ]
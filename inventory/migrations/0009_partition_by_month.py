@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from inventory.partitions import PARTITIONED_TABLES, partition_table, unpartition_table
+
+
+def partition(apps, schema_editor):
+    for table in PARTITIONED_TABLES:
+        partition_table(table)
+
+
+def unpartition(apps, schema_editor):
+    for table in PARTITIONED_TABLES:
+        unpartition_table(table)
+
+
+class Migration(migrations.Migration):
+    # Copies both tables into monthly partitions under an exclusive lock: plan a
+    # maintenance window on large databases. Nothing changes on the Django side,
+    # the models keep `id` as their primary key.
+
+    dependencies = [
+        ("inventory", "0008_updated_at_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition, elidable=False),
+    ]
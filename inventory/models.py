@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 
 class TimeStampedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -14,12 +16,92 @@ class Product(TimeStampedModel):
     def __str__(self):
         return f"{self.sku} - {self.name}"
 
+class StockBalance(TimeStampedModel):
+    """Materialized sum of InventoryEntry.delta, one row per product."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="stock_balance")
+    quantity = models.IntegerField(default=0)
+
+    @classmethod
+    def apply_delta(cls, product_id:int, delta:int):
+        if not delta:
+            return
+        updated = cls.objects.filter(product_id=product_id).update(
+            quantity=F("quantity") + delta, updated_at=timezone.now()
+        )
+        if not updated:
+            cls.objects.get_or_create(product_id=product_id)
+            cls.objects.filter(product_id=product_id).update(
+                quantity=F("quantity") + delta, updated_at=timezone.now()
+            )
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        # Product order, so concurrent batches lock balance rows in the same order
+        for product_id in sorted(deltas):
+            cls.apply_delta(product_id, deltas[product_id])
+
+# Range partitioned by created_at month in Postgres (migration 0009, inventory/partitions.py)
 class InventoryEntry(TimeStampedModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="inventory_entries")
     delta = models.IntegerField(help_text="Positive or negative stock change")
     note = models.CharField(max_length=255, blank=True, default="")
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="inv_entry_product_created"),
+            models.Index(fields=["created_at", "id"], name="inv_entry_created_at"),
+            models.Index(fields=["updated_at"], name="inv_entry_updated_at"),
+        ]
+
+    # StockBalance is kept in step here, in the same transaction as the ledger write.
+    # Queryset-level writes (bulk_create, update, delete) bypass it; run
+    # `manage.py rebuild_stock_balances` after those.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    InventoryEntry.objects.filter(pk=self.pk)
+                    .values_list("product_id", "delta", "created_at")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            if previous is not None:
+                StockBalance.apply_delta(previous[0], -previous[1])
+                # Rewriting history makes every later checkpoint of both products stale
+                StockCheckpoint.invalidate(previous[0], previous[2])
+                StockCheckpoint.invalidate(self.product_id, previous[2])
+            StockBalance.apply_delta(self.product_id, self.delta)
+            product_ids = {self.product_id, previous[0]} if previous else {self.product_id}
+            OutboxMessage.publish("stock.changed", {"product_ids": sorted(product_ids)})
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            StockBalance.apply_delta(self.product_id, -self.delta)
+            StockCheckpoint.invalidate(self.product_id, self.created_at)
+            OutboxMessage.publish("stock.changed", {"product_ids": [self.product_id]})
+        return result
+
+class StockCheckpoint(TimeStampedModel):
+    """Sum of InventoryEntry.delta for a product over entries created before `as_of`."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_checkpoints")
+    as_of = models.DateTimeField()
+    quantity = models.IntegerField()
+    class Meta:
+        ordering = ["-as_of"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "as_of"], name="unique_stock_checkpoint")
+        ]
+
+    @classmethod
+    def invalidate(cls, product_id:int, since):
+        cls.objects.filter(product_id=product_id, as_of__gt=since).delete()
+
+class PendingRecalculation(models.Model):
+    """Product waiting for the next recalculation drain; the primary key coalesces repeats."""
+    product = models.OneToOneField(Product, primary_key=True, on_delete=models.CASCADE, related_name="+")
+    requested_at = models.DateTimeField(auto_now_add=True)
 
 class Customer(TimeStampedModel):
     email = models.EmailField(unique=True)
@@ -28,20 +110,126 @@ class Customer(TimeStampedModel):
 class Order(TimeStampedModel):
     customer = models.ForeignKey(Customer, on_delete=models.PROTECT, related_name="orders")
     status = models.CharField(max_length=20, default="PENDING", choices=[("PENDING","PENDING"),("PAID","PAID"),("CANCELLED","CANCELLED")])
-    @property
-    def total_cents(self):
-        return sum(item.total_cents for item in self.items.all())
+    total_cents = models.BigIntegerField(default=0, editable=False, help_text="Sum of item totals, kept in step by OrderItem writes")
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="order_created_at"),
+            models.Index(fields=["updated_at"], name="order_updated_at"),
+        ]
+
+    # Side effects of a new order go through the outbox, in the same transaction.
+    # total_cents is left out of updates: the loaded value may predate item writes
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            adding = self._state.adding
+            if not adding and not args and kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != "total_cents"
+                ]
+            super().save(*args, **kwargs)
+            if adding:
+                OutboxMessage.publish("order.created", {"order_id": self.pk})
+
+    @classmethod
+    def add_to_total(cls, order_id:int, cents:int):
+        if cents:
+            cls.objects.filter(pk=order_id).update(total_cents=F("total_cents") + cents)
+
+    @classmethod
+    def add_to_totals(cls, cents_by_order):
+        for order_id in sorted(cents_by_order):
+            cls.add_to_total(order_id, cents_by_order[order_id])
 
 class OrderItem(TimeStampedModel):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField(default=1)
     unit_price_cents = models.PositiveIntegerField()
+    class Meta:
+        indexes = [models.Index(fields=["updated_at"], name="order_item_updated_at")]
+
     @property
     def total_cents(self):
         return self.quantity * self.unit_price_cents
 
+    # Order.total_cents is adjusted here, in the same transaction as the item write
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = (
+                    OrderItem.objects.filter(pk=self.pk)
+                    .values_list("order_id", "quantity", "unit_price_cents")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            if previous is not None:
+                Order.add_to_total(previous[0], -previous[1] * previous[2])
+            Order.add_to_total(self.order_id, self.total_cents)
+        self._refresh_order_total()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Order.add_to_total(self.order_id, -self.total_cents)
+        self._refresh_order_total()
+        return result
+
+    def _refresh_order_total(self):
+        if OrderItem.order.is_cached(self):
+            self.order.refresh_from_db(fields=["total_cents"])
+
+# Partitioned like InventoryEntry; ANALYTICS_RETENTION_MONTHS expires old months
 class AnalyticsEvent(TimeStampedModel):
     order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.CASCADE, related_name="analytics_events")
     kind = models.CharField(max_length=50)
     payload = models.JSONField(default=dict)
+    class Meta:
+        indexes = [models.Index(fields=["created_at", "id"], name="analytics_event_created_at")]
+
+class OutboxMessage(TimeStampedModel):
+    """
+    Side effect of a write, inserted in the write's transaction and dispatched after
+    commit by the relay in inventory/outbox.py, which deletes it once handled.
+    """
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Not relayed before this time")
+    last_error = models.TextField(blank=True, default="")
+
+    @classmethod
+    def publish(cls, topic:str, payload:dict):
+        return cls.objects.create(topic=topic, payload=payload)
+
+    @classmethod
+    def publish_many(cls, topic:str, payloads):
+        return cls.objects.bulk_create([cls(topic=topic, payload=payload) for payload in payloads])
+
+# Daily rollups kept up to date by inventory/rollups.py, read by the reporting queries
+class DailySales(models.Model):
+    """Revenue and units sold of a product on a day, from the items of uncancelled orders."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+    revenue_cents = models.BigIntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["product", "day"], name="unique_daily_sales")]
+
+class DailyStockMovement(models.Model):
+    """Net InventoryEntry.delta of a product on a day."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+    net_delta = models.BigIntegerField(default=0)
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["product", "day"], name="unique_daily_stock_movement")]
+
+class RollupWatermark(models.Model):
+    """Rows updated after `updated_through` are not in the rollups yet."""
+    name = models.CharField(max_length=50, primary_key=True)
+    updated_through = models.DateTimeField(null=True)
+
+class RollupStaleDay(models.Model):
+    """Day whose rollups lost rows to a delete, which no updated_at can show."""
+    day = models.DateField(primary_key=True)
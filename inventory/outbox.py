@@ -0,0 +1,121 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from modules.shared.utils import db_now
+
+from .models import AnalyticsEvent, Order, OutboxMessage
+from .recalc import request_recalculation
+
+logger = logging.getLogger(__name__)
+
+# topic -> handler taking the payloads of every claimed message of that topic
+HANDLERS = {}
+
+
+def handler(topic):
+    def register(function):
+        HANDLERS[topic] = function
+        return function
+
+    return register
+
+
+@handler("order.created")
+def record_orders(payloads):
+    # In the relay transaction, so each event is written exactly once with its message
+    orders = Order.objects.filter(id__in=[payload["order_id"] for payload in payloads])
+    AnalyticsEvent.objects.bulk_create(
+        [
+            AnalyticsEvent(
+                order_id=order_id, kind="ORDER_CREATED", payload={"total_cents": total_cents}
+            )
+            for order_id, total_cents in orders.values_list("id", "total_cents")
+        ]
+    )
+
+
+@handler("stock.changed")
+def recalculate_stock(payloads):
+    request_recalculation(
+        product_id for payload in payloads for product_id in payload["product_ids"]
+    )
+
+
+def _delete(ids):
+    # Raw so no collector SELECT runs per batch, as in DatabaseRecalcQueue.pop
+    table = connection.ops.quote_name(OutboxMessage._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id = ANY(%s)", [list(ids)])
+
+
+def relay_batch(batch_size=None):
+    """
+    Claim up to `batch_size` due messages (SELECT ... FOR UPDATE SKIP LOCKED, so
+    relays running side by side take different rows), hand each topic's payloads
+    to its handler at once and delete the messages in the same transaction. A
+    failing topic is retried later with exponential backoff, up to
+    OUTBOX_MAX_ATTEMPTS times. Returns the number of messages claimed.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    now = db_now()
+    with transaction.atomic():
+        claimed = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=now, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+            .order_by("id")
+            .values_list("id", "topic", "payload", "attempts")[:batch_size]
+        )
+        by_topic = defaultdict(list)
+        for message in claimed:
+            by_topic[message[1]].append(message)
+
+        for topic, messages in by_topic.items():
+            ids = [message[0] for message in messages]
+            try:
+                with transaction.atomic():
+                    HANDLERS[topic]([message[2] for message in messages])
+            except Exception as e:
+                logger.exception("Outbox handler for %s failed on %d message(s)", topic, len(ids))
+                for attempts, group in _by_attempts(messages).items():
+                    OutboxMessage.objects.filter(id__in=group).update(
+                        attempts=attempts + 1,
+                        available_at=now + timedelta(seconds=min(2**attempts, 300)),
+                        last_error=repr(e),
+                    )
+            else:
+                _delete(ids)
+    return len(claimed)
+
+
+def _by_attempts(messages):
+    groups = defaultdict(list)
+    for id, _, _, attempts in messages:
+        groups[attempts].append(id)
+    return groups
+
+
+def relay_outbox(batch_size=None, max_batches=None):
+    """Relay batches until none are due (or `max_batches`); returns the messages claimed."""
+    relayed = batches = 0
+    while max_batches is None or batches < max_batches:
+        claimed = relay_batch(batch_size)
+        relayed += claimed
+        batches += 1
+        if claimed < (batch_size or settings.OUTBOX_BATCH_SIZE):
+            break
+    return relayed
+
+
+def outbox_stats():
+    """Messages waiting, how old the oldest is, and how many gave up retrying."""
+    pending = OutboxMessage.objects.filter(attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+    oldest = pending.order_by("id").values_list("created_at", flat=True).first()
+    return {
+        "pending": pending.count(),
+        "oldest_seconds": (db_now() - oldest).total_seconds() if oldest else 0.0,
+        "failed": OutboxMessage.objects.filter(attempts__gte=settings.OUTBOX_MAX_ATTEMPTS).count(),
+    }
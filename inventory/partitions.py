@@ -0,0 +1,224 @@
+import datetime
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Append-only tables range partitioned by created_at month (migration 0009)
+PARTITIONED_TABLES = ("inventory_analyticsevent", "inventory_inventoryentry")
+# Tables whose expired partitions ANALYTICS_RETENTION_MONTHS drops; the ledger is never dropped
+RETENTION_TABLES = ("inventory_analyticsevent",)
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _bound(month):
+    # A literal rather than a parameter: DDL takes no bind parameters
+    return f"'{month.isoformat()} 00:00:00'"
+
+
+def partitions(table):
+    """Months of the monthly partitions of `table`, oldest first."""
+    pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})_(\d{{2}})$")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [table],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    return sorted(
+        datetime.date(int(match[1]), int(match[2]), 1)
+        for match in map(pattern.match, names)
+        if match
+    )
+
+
+def create_partition(table, month):
+    """
+    Add the partition of `table` for `month`, moving in the rows the default
+    partition holds for it (Postgres refuses the new bounds otherwise).
+    """
+    name, default = _quote(partition_name(table, month)), _quote(f"{table}_default")
+    start, end = _bound(month), _bound(add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {_quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} "
+            f"WHERE created_at >= {start} AND created_at < {end} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ({start}) TO ({end})"
+        )
+
+
+def drop_partition(table, month, detach=False):
+    """Detach the partition of `table` for `month`, and drop it unless `detach`."""
+    name = _quote(partition_name(table, month))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {_quote(table)} DETACH PARTITION {name}")
+        if not detach:
+            cursor.execute(f"DROP TABLE {name}")
+
+
+def default_months(table):
+    """Months with rows in the default partition, which no monthly partition covers."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT date_trunc('month', created_at)::date "
+            f"FROM {_quote(table + '_default')}"
+        )
+        return sorted(month for (month,) in cursor.fetchall())
+
+
+def maintain_partitions(today=None, ahead=None, retention=None, detach=None):
+    """
+    Create the monthly partitions from this month to `ahead` months out, and for
+    any month rows were written to in the default partition; then drop (or detach)
+    the partitions of RETENTION_TABLES that ended more than `retention` months
+    before this month. Returns {"created": [...], "dropped": [...]} partition names.
+    """
+    if today is None:
+        today = timezone.localdate() if settings.USE_TZ else datetime.date.today()
+    ahead = settings.PARTITION_MONTHS_AHEAD if ahead is None else ahead
+    retention = settings.ANALYTICS_RETENTION_MONTHS if retention is None else retention
+    detach = settings.ANALYTICS_RETENTION_DETACH if detach is None else detach
+    current = month_start(today)
+    result = {"created": [], "dropped": []}
+    for table in PARTITIONED_TABLES:
+        existing = set(partitions(table))
+        wanted = {add_months(current, offset) for offset in range(ahead + 1)}
+        wanted.update(default_months(table))
+        for month in sorted(wanted - existing):
+            create_partition(table, month)
+            existing.add(month)
+            result["created"].append(partition_name(table, month))
+
+        if table not in RETENTION_TABLES or not retention:
+            continue
+        cutoff = add_months(current, -retention)
+        for month in sorted(existing):
+            if add_months(month, 1) <= cutoff:
+                drop_partition(table, month, detach)
+                result["dropped"].append(partition_name(table, month))
+
+    for action, names in result.items():
+        for name in names:
+            logger.info("Partition %s %s", name, action)
+    return result
+
+
+def _table_definition(cursor, table):
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+        [table, f"{table}_pkey"],
+    )
+    indexes = [definition for (definition,) in cursor.fetchall()]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    return indexes, cursor.fetchall()
+
+
+def _rebuild_table(table, partition_by, primary_key, months=()):
+    """
+    Recreate `table` (partitioned when `partition_by` is given) with its rows,
+    indexes and foreign keys, under the same names.
+    """
+    old = f"{table}_old"
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = _table_definition(cursor, table)
+        cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(old)}")
+        cursor.execute(
+            f"ALTER TABLE {_quote(old)} RENAME CONSTRAINT {_quote(table + '_pkey')} "
+            f"TO {_quote(old + '_pkey')}"
+        )
+        for name, _ in foreign_keys:
+            cursor.execute(f"ALTER TABLE {_quote(old)} DROP CONSTRAINT {_quote(name)}")
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            [old, f"{old}_pkey"],
+        )
+        for (name,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {_quote(name)}")
+
+        cursor.execute(
+            f"CREATE TABLE {_quote(table)} (LIKE {_quote(old)} INCLUDING DEFAULTS "
+            f"INCLUDING CONSTRAINTS INCLUDING IDENTITY){partition_by}"
+        )
+        cursor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(table + '_pkey')} "
+            f"PRIMARY KEY ({primary_key})"
+        )
+        if partition_by:
+            cursor.execute(
+                f"CREATE TABLE {_quote(table + '_default')} PARTITION OF {_quote(table)} DEFAULT"
+            )
+            for month in months:
+                cursor.execute(
+                    f"CREATE TABLE {_quote(partition_name(table, month))} "
+                    f"PARTITION OF {_quote(table)} "
+                    f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+                )
+        cursor.execute(f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(old)}")
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"coalesce((SELECT max(id) FROM {_quote(table)}), 0) + 1, false)",
+            [table],
+        )
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {definition}"
+            )
+        for definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(f"DROP TABLE {_quote(old)} CASCADE")
+
+
+def partition_table(table, months_ahead=3):
+    """
+    Turn `table` into a table range partitioned by created_at month: one partition
+    per month from its oldest row to `months_ahead` months out, and a default one.
+    The primary key becomes (id, created_at), as Postgres requires the partition
+    key in it; ids stay unique through the identity sequence.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(created_at)::date FROM {_quote(table)}")
+        (oldest,) = cursor.fetchone()
+    current = month_start(datetime.date.today())
+    month = month_start(oldest) if oldest else current
+    months = []
+    while month <= add_months(current, months_ahead):
+        months.append(month)
+        month = add_months(month, 1)
+    _rebuild_table(table, " PARTITION BY RANGE (created_at)", "id, created_at", months)
+
+
+def unpartition_table(table):
+    _rebuild_table(table, "", "id")
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import AnalyticsEvent, PendingRecalculation
+from .stock import iter_stock_levels
+
+SCHEDULED_KEY = "inventory:recalc:scheduled"
+
+
+class DatabaseRecalcQueue:
+    """Pending products in the PendingRecalculation table, the local stand-in for Redis."""
+
+    def add(self, product_ids):
+        PendingRecalculation.objects.bulk_create(
+            [PendingRecalculation(product_id=product_id) for product_id in product_ids],
+            ignore_conflicts=True,
+        )
+
+    def pop(self, count):
+        """
+        Take up to `count` products in one DELETE ... RETURNING, to be called in a
+        transaction: rows other drains hold are skipped, and a rollback puts the
+        taken ones back.
+        """
+        table = connection.ops.quote_name(PendingRecalculation._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE product_id IN ("
+                f"SELECT product_id FROM {table} ORDER BY product_id LIMIT %s "
+                "FOR UPDATE SKIP LOCKED) RETURNING product_id",
+                [count],
+            )
+            return sorted(product_id for (product_id,) in cursor.fetchall())
+
+    def claim_schedule(self, seconds):
+        return cache.add(SCHEDULED_KEY, 1, seconds)
+
+
+class RedisRecalcQueue:
+    """Pending products in a Redis set shared by every web and worker process."""
+
+    key = "inventory:recalc:pending"
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def add(self, product_ids):
+        self.client.sadd(self.key, *product_ids)
+
+    def pop(self, count):
+        return sorted(int(product_id) for product_id in self.client.spop(self.key, count))
+
+    def claim_schedule(self, seconds):
+        return bool(self.client.set(SCHEDULED_KEY, 1, nx=True, ex=seconds))
+
+
+_redis_queues = {}
+
+
+def get_recalc_queue():
+    url = getattr(settings, "RECALC_QUEUE_REDIS_URL", None)
+    if not url:
+        return DatabaseRecalcQueue()
+    if url not in _redis_queues:
+        _redis_queues[url] = RedisRecalcQueue(url)
+    return _redis_queues[url]
+
+
+def request_recalculation(product_ids):
+    """
+    Queue products for a stock recalculation once the current transaction commits.
+    Repeats coalesce in the queue, and at most one drain task is scheduled per
+    RECALC_DEBOUNCE_SECONDS, so a burst of writes costs one recalculation per
+    product instead of one task per write.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+
+    def enqueue():
+        from .tasks import drain_recalculations_async
+
+        queue = get_recalc_queue()
+        queue.add(product_ids)
+        debounce = settings.RECALC_DEBOUNCE_SECONDS
+        if queue.claim_schedule(debounce):
+            drain_recalculations_async.apply_async(countdown=debounce)
+
+    transaction.on_commit(enqueue)
+
+
+def drain_recalculations(batch_size=None):
+    """
+    Recompute the stock of every queued product: one grouped aggregate and one
+    bulk insert of RECALC_PRODUCT events per batch. Returns the products drained.
+    """
+    batch_size = batch_size or settings.RECALC_BATCH_SIZE
+    queue = get_recalc_queue()
+    drained = 0
+    while True:
+        with transaction.atomic():
+            product_ids = queue.pop(batch_size)
+            if not product_ids:
+                return drained
+            try:
+                AnalyticsEvent.objects.bulk_create(
+                    [
+                        AnalyticsEvent(
+                            order=None,
+                            kind="RECALC_PRODUCT",
+                            payload={"product_id": product_id, "stock": stock},
+                        )
+                        for product_id, stock in iter_stock_levels(product_ids=product_ids)
+                    ]
+                )
+            except Exception:
+                if isinstance(queue, RedisRecalcQueue):
+                    # The set is not transactional: put the batch back for the next drain
+                    queue.add(product_ids)
+                raise
+        drained += len(product_ids)
@@ -0,0 +1,156 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .models import AnalyticsEvent, InventoryEntry, Product, StockBalance
+
+# Drifting products listed in the summary event; the count covers all of them
+MAX_REPORTED_DRIFT = 1000
+
+
+def product_id_chunks(chunk_size):
+    """(first_id, last_id) ranges of `chunk_size` ids covering every product id."""
+    bounds = Product.objects.aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return []
+    return [
+        (first, min(first + chunk_size - 1, bounds["last"]))
+        for first in range(bounds["first"], bounds["last"] + 1, chunk_size)
+    ]
+
+
+def reconcile_chunk(first_id, last_id):
+    """
+    Compare the stored StockBalance of the products with ids in [first_id, last_id]
+    with their ledger sum, computed with one grouped aggregate. Both are read from
+    one snapshot, so writes running meanwhile are not reported as drift.
+    """
+    started = time.perf_counter()
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        if outermost:
+            connection.cursor().execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        products = Product.objects.filter(id__range=(first_id, last_id)).count()
+        ledger, entries = {}, 0
+        for product_id, total, count in (
+            InventoryEntry.objects.order_by()
+            .filter(product_id__gte=first_id, product_id__lte=last_id)
+            .values_list("product_id")
+            .annotate(total=Sum("delta"), count=Count("id"))
+        ):
+            ledger[product_id] = total
+            entries += count
+        balances = dict(
+            StockBalance.objects.filter(
+                product_id__gte=first_id, product_id__lte=last_id
+            ).values_list("product_id", "quantity")
+        )
+    drift = [
+        [product_id, balances.get(product_id), ledger.get(product_id, 0)]
+        for product_id in sorted(set(ledger) | set(balances))
+        if balances.get(product_id, 0) != ledger.get(product_id, 0)
+    ]
+    return {
+        "first_id": first_id,
+        "last_id": last_id,
+        "products": products,
+        "entries": entries,
+        "drift": drift,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def summarize(results, seconds):
+    drift = sorted(row for result in results for row in result["drift"])
+    entries = sum(result["entries"] for result in results)
+    return {
+        "chunks": len(results),
+        "products": sum(result["products"] for result in results),
+        "entries": entries,
+        "drift_count": len(drift),
+        "drift": drift[:MAX_REPORTED_DRIFT],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(entries / seconds) if seconds else 0,
+    }
+
+
+def record_reconciliation(results, seconds):
+    """Write the summary of the chunk results as a STOCK_RECONCILED AnalyticsEvent."""
+    summary = summarize(results, seconds)
+    AnalyticsEvent.objects.create(kind="STOCK_RECONCILED", payload=summary)
+    return summary
+
+
+def _reconcile_in_process(chunk):
+    return reconcile_chunk(*chunk)
+
+
+def run_local(chunks, workers, progress=None):
+    """
+    Reconcile `chunks` in a pool of `workers` forked processes (inline for one),
+    calling progress(done, total, entries, seconds) as chunks finish.
+    """
+    started = time.perf_counter()
+    results, entries = [], 0
+
+    def finished(result):
+        nonlocal entries
+        results.append(result)
+        entries += result["entries"]
+        if progress:
+            progress(len(results), len(chunks), entries, time.perf_counter() - started)
+
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            finished(reconcile_chunk(*chunk))
+    else:
+        # Forked children must open their own connections, not share the parent's
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_reconcile_in_process, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                finished(future.result())
+    return results, time.perf_counter() - started
+
+
+def run_celery(chunks, progress=None, poll_interval=0.5):
+    """Fan the chunks out as a Celery group and wait for it, reporting progress."""
+    from celery import group
+
+    from .tasks import reconcile_stock_chunk_async
+
+    started = time.perf_counter()
+    result = group(reconcile_stock_chunk_async.s(*chunk) for chunk in chunks).apply_async()
+    reported = 0
+    while True:
+        finished = [chunk for chunk in result.results if chunk.successful()]
+        if progress and len(finished) != reported:
+            reported = len(finished)
+            entries = sum(chunk.result["entries"] for chunk in finished)
+            progress(reported, len(chunks), entries, time.perf_counter() - started)
+        if result.ready():
+            break
+        time.sleep(poll_interval)
+    return result.get(), time.perf_counter() - started
+
+
+def reconcile_stock(chunk_size=None, workers=None, local=None, progress=None):
+    """
+    Check every product's StockBalance against the ledger, chunk by chunk of the
+    product id space: in Celery workers, or in a local process pool when Celery
+    runs eager (or `local`). Returns the summary it records.
+    """
+    chunks = product_id_chunks(chunk_size or settings.RECONCILE_CHUNK_SIZE)
+    if local is None:
+        local = settings.CELERY_TASK_ALWAYS_EAGER
+    if local:
+        workers = settings.RECONCILE_WORKERS if workers is None else workers
+        results, seconds = run_local(chunks, workers, progress)
+    else:
+        results, seconds = run_celery(chunks, progress)
+    return record_reconciliation(results, seconds)
@@ -0,0 +1,192 @@
+import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+from modules.shared.utils import as_db_datetime, db_now
+
+from .models import (
+    DailySales,
+    DailyStockMovement,
+    InventoryEntry,
+    OrderItem,
+    RollupStaleDay,
+    RollupWatermark,
+)
+
+WATERMARK = "daily"
+
+
+def day_ranges(days):
+    """Merge `days` into (first, last) runs of consecutive days."""
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(run) for run in ranges]
+
+
+def _created_between(queryset, first, last):
+    # A range on created_at rather than on its date, so the index can be used
+    start = datetime.datetime.combine(first, datetime.time.min)
+    end = datetime.datetime.combine(last + timedelta(days=1), datetime.time.min)
+    return queryset.filter(created_at__gte=start, created_at__lt=end)
+
+
+def rebuild_days(days):
+    """
+    Recompute both rollups of every product for `days` from the raw rows, one
+    grouped aggregate per run of consecutive days, replacing what was there.
+    Returns the number of rollup rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        for first, last in day_ranges(days):
+            DailySales.objects.filter(day__range=(first, last)).delete()
+            DailyStockMovement.objects.filter(day__range=(first, last)).delete()
+            sales = (
+                _created_between(OrderItem.objects.order_by(), first, last)
+                .exclude(order__status="CANCELLED")
+                .annotate(day=TruncDate("created_at"))
+                .values_list("product_id", "day")
+                .annotate(revenue=Sum(F("quantity") * F("unit_price_cents")), units=Sum("quantity"))
+            )
+            movements = (
+                _created_between(InventoryEntry.objects.order_by(), first, last)
+                .annotate(day=TruncDate("created_at"))
+                .values_list("product_id", "day")
+                .annotate(net_delta=Sum("delta"))
+            )
+            written += len(
+                DailySales.objects.bulk_create(
+                    [
+                        DailySales(
+                            product_id=product_id, day=day, revenue_cents=revenue, units=units
+                        )
+                        for product_id, day, revenue, units in sales
+                    ],
+                    batch_size=1000,
+                )
+            )
+            written += len(
+                DailyStockMovement.objects.bulk_create(
+                    [
+                        DailyStockMovement(product_id=product_id, day=day, net_delta=net_delta)
+                        for product_id, day, net_delta in movements
+                    ],
+                    batch_size=1000,
+                )
+            )
+    return written
+
+
+def changed_days(since):
+    """Days with an order item, order or inventory entry updated after `since`."""
+    querysets = [
+        OrderItem.objects.filter(updated_at__gt=since),
+        # Cancelling an order changes the sales of the days its items were created on
+        OrderItem.objects.filter(order__updated_at__gt=since),
+        InventoryEntry.objects.filter(updated_at__gt=since),
+    ]
+    days = set()
+    for queryset in querysets:
+        days.update(
+            queryset.order_by()
+            .annotate(day=TruncDate("created_at"))
+            .values_list("day", flat=True)
+            .distinct()
+        )
+    return days
+
+
+def all_days():
+    days = set()
+    for model in (OrderItem, InventoryEntry):
+        days.update(
+            model.objects.order_by()
+            .annotate(day=TruncDate("created_at"))
+            .values_list("day", flat=True)
+            .distinct()
+        )
+    return days
+
+
+def refresh_rollups(now=None):
+    """
+    Bring the rollups up to date: rebuild the days touched by rows updated since
+    the watermark, and the days deletes marked stale, then move the watermark.
+    It stops ROLLUP_LAG_SECONDS short of `now`, so rows of transactions still open
+    are picked up by a later run. Returns the number of days rebuilt.
+    """
+    now = as_db_datetime(now) if now else db_now()
+    mark = now - timedelta(seconds=settings.ROLLUP_LAG_SECONDS)
+    with transaction.atomic():
+        # Locked so concurrent runs queue up instead of rebuilding the same days
+        RollupWatermark.objects.get_or_create(name=WATERMARK)
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+        if watermark.updated_through is None:
+            days = all_days()
+        else:
+            days = changed_days(watermark.updated_through)
+        stale = RollupStaleDay.objects.select_for_update(skip_locked=True)
+        stale_days = list(stale.values_list("day", flat=True))
+        days.update(stale_days)
+        rebuild_days(days)
+        RollupStaleDay.objects.filter(day__in=stale_days).delete()
+        if watermark.updated_through is None or mark > watermark.updated_through:
+            watermark.updated_through = mark
+            watermark.save(update_fields=["updated_through"])
+    return len(days)
+
+
+def mark_day_stale(sender, instance, **kwargs):
+    """post_delete receiver: the day of a deleted row is rebuilt by the next refresh."""
+    RollupStaleDay.objects.bulk_create(
+        [RollupStaleDay(day=instance.created_at.date())], ignore_conflicts=True
+    )
+
+
+def connect_rollups():
+    from django.db.models.signals import post_delete
+
+    for model in (OrderItem, InventoryEntry):
+        post_delete.connect(mark_day_stale, sender=model, dispatch_uid=f"rollups_{model.__name__}")
+
+
+def _fill_days(rows, first, last, empty):
+    by_day = {row.day: row for row in rows}
+    day = first
+    while day <= last:
+        yield by_day.get(day) or empty(day)
+        day += timedelta(days=1)
+
+
+def sales_by_day(product_id, first, last):
+    """DailySales of a product for every day from `first` to `last`, zero when none."""
+    rows = DailySales.objects.filter(product_id=product_id, day__range=(first, last))
+    return list(
+        _fill_days(
+            rows,
+            first,
+            last,
+            lambda day: DailySales(product_id=product_id, day=day, revenue_cents=0, units=0),
+        )
+    )
+
+
+def stock_movement_by_day(product_id, first, last):
+    """DailyStockMovement of a product for every day from `first` to `last`, zero when none."""
+    rows = DailyStockMovement.objects.filter(product_id=product_id, day__range=(first, last))
+    return list(
+        _fill_days(
+            rows,
+            first,
+            last,
+            lambda day: DailyStockMovement(product_id=product_id, day=day, net_delta=0),
+        )
+    )
@@ -1,5 +1,6 @@
 import graphene
 from .schemas import queries, mutations
+from .schemas.types import InventoryEntryNode, OrderItemNode, OrderNode
 
 
 class Query(
@@ -8,6 +9,8 @@ class Query(
     queries.InventoryEntries,
     queries.Orders,
     queries.OrderItems,
+    queries.Stock,
+    queries.Reports,
     graphene.ObjectType,
 ):
     pass
@@ -22,3 +25,11 @@ class Mutation(
     graphene.ObjectType,
 ):
     pass
+
+
+# Node types served by the streaming export (modules/graphene_custom/export.py)
+exports = {
+    "inventory-entries": InventoryEntryNode,
+    "orders": OrderNode,
+    "order-items": OrderItemNode,
+}
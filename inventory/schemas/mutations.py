@@ -7,27 +7,37 @@ class Products(graphene.ObjectType):
     product_create = ProductNode.CreateField()
     product_update = ProductNode.UpdateField()
     product_delete = ProductNode.DeleteField()
+    product_create_many = ProductNode.CreateManyField()
+    product_update_many = ProductNode.UpdateManyField()
 
 
 class Customers(graphene.ObjectType):
     customer_create = CustomerNode.CreateField()
     customer_update = CustomerNode.UpdateField()
     customer_delete = CustomerNode.DeleteField()
+    customer_create_many = CustomerNode.CreateManyField()
+    customer_update_many = CustomerNode.UpdateManyField()
 
 
 class InventoryEntries(graphene.ObjectType):
     inventory_entry_create = InventoryEntryNode.CreateField()
     inventory_entry_update = InventoryEntryNode.UpdateField()
     inventory_entry_delete = InventoryEntryNode.DeleteField()
+    inventory_entry_create_many = InventoryEntryNode.CreateManyField()
+    inventory_entry_update_many = InventoryEntryNode.UpdateManyField()
 
 
 class Orders(graphene.ObjectType):
     order_create = OrderNode.CreateField()
     order_update = OrderNode.UpdateField()
     order_delete = OrderNode.DeleteField()
+    order_create_many = OrderNode.CreateManyField()
+    order_update_many = OrderNode.UpdateManyField()
 
 
 class OrderItems(graphene.ObjectType):
     order_item_create = OrderItemNode.CreateField()
     order_item_update = OrderItemNode.UpdateField()
     order_item_delete = OrderItemNode.DeleteField()
+    order_item_create_many = OrderItemNode.CreateManyField()
+    order_item_update_many = OrderItemNode.UpdateManyField()
@@ -1,6 +1,22 @@
 import graphene
+from graphql import GraphQLError
+from graphene_django_crud.utils import resolve_argument, where_input_to_Q
 
-from .types import ProductNode, CustomerNode, InventoryEntryNode, OrderNode, OrderItemNode
+from ..models import Product
+from ..rollups import sales_by_day, stock_movement_by_day
+from ..stock import iter_stock_levels, stock_as_of
+from .types import (
+    ProductNode,
+    CustomerNode,
+    InventoryEntryNode,
+    OrderNode,
+    OrderItemNode,
+    SalesDay,
+    StockLevel,
+    StockMovementDay,
+)
+
+REPORT_MAX_DAYS = 731
 
 
 class Products(graphene.ObjectType):
@@ -26,3 +42,65 @@ class Orders(graphene.ObjectType):
 class OrderItems(graphene.ObjectType):
     order_item = OrderItemNode.ReadField()
     order_items = OrderItemNode.BatchReadField()
+
+
+class Stock(graphene.ObjectType):
+    stock_as_of = graphene.Int(
+        product_id=graphene.ID(required=True),
+        at=graphene.DateTime(required=True),
+        description="Stock including every inventory entry created up to `at`",
+    )
+
+    stock_levels = graphene.List(
+        graphene.NonNull(StockLevel),
+        product_ids=graphene.List(graphene.NonNull(graphene.ID)),
+        where=graphene.Argument(ProductNode.WhereInputType()),
+        description="Stock for many products, aggregated in SQL and streamed in chunks",
+    )
+
+    def resolve_stock_as_of(self, info, product_id, at):
+        return stock_as_of(product_id, at)
+
+    def resolve_stock_levels(self, info, product_ids=None, where=None):
+        products = Product.objects.all()
+        if where:
+            where = resolve_argument(ProductNode.WhereInputType(), where)
+            products = products.filter(where_input_to_Q(where)).distinct()
+        return (
+            StockLevel(product_id=product_id, stock=stock)
+            for product_id, stock in iter_stock_levels(products, product_ids=product_ids)
+        )
+
+
+def report_range(first, last):
+    if last < first:
+        raise GraphQLError("`to` must not be before `from`.")
+    if (last - first).days >= REPORT_MAX_DAYS:
+        raise GraphQLError(f"Reports cover at most {REPORT_MAX_DAYS} days.")
+    return first, last
+
+
+class Reports(graphene.ObjectType):
+    """Daily figures read from the rollup tables only, one entry per day of the range."""
+
+    sales_by_day = graphene.List(
+        graphene.NonNull(SalesDay),
+        product_id=graphene.ID(required=True),
+        from_=graphene.Date(required=True, name="from"),
+        to=graphene.Date(required=True),
+        description="Revenue and units sold per day, cancelled orders excluded",
+    )
+
+    stock_movement_by_day = graphene.List(
+        graphene.NonNull(StockMovementDay),
+        product_id=graphene.ID(required=True),
+        from_=graphene.Date(required=True, name="from"),
+        to=graphene.Date(required=True),
+        description="Net inventory entry delta per day",
+    )
+
+    def resolve_sales_by_day(self, info, product_id, from_, to):
+        return sales_by_day(product_id, *report_range(from_, to))
+
+    def resolve_stock_movement_by_day(self, info, product_id, from_, to):
+        return stock_movement_by_day(product_id, *report_range(from_, to))
@@ -1,15 +1,53 @@
+import copy
+from collections import defaultdict
+
+import graphene
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from graphene_django_crud.types import resolver_hints
+
 from modules.graphene_custom.custom_django_crud import CustomDjangoCRUDObjectType
 from modules.shared.utils import CustomNode, TotalCountConnection
 
-from ..models import Product, Customer, InventoryEntry, Order, OrderItem
+from ..models import (
+    Product,
+    Customer,
+    InventoryEntry,
+    Order,
+    OrderItem,
+    OutboxMessage,
+    StockBalance,
+)
+from ..stock import (
+    apply_stock_change,
+    cancelled_order_ids,
+    item_stock_change,
+    lock_stock_balances,
+    release_order_stock,
+    reserve_order_stock,
+    stock_entries_rewritten,
+    write_stock_entries,
+)
 
 
 class ProductNode(CustomDjangoCRUDObjectType):
+    stock = graphene.Int(description="Stock on hand, read from the materialized stock balance")
+
+    # joins the stock balance
+    field_costs = {"stock": 1}
+
     class Meta:
         model = Product
         interfaces = (CustomNode,)
         connection_class = TotalCountConnection
 
+    @resolver_hints(select_related=["stock_balance"], only=["stock_balance__quantity"])
+    def resolve_stock(self, info):
+        try:
+            return self.stock_balance.quantity
+        except StockBalance.DoesNotExist:
+            return 0
+
 
 class CustomerNode(CustomDjangoCRUDObjectType):
     class Meta:
@@ -24,16 +62,231 @@ class InventoryEntryNode(CustomDjangoCRUDObjectType):
         interfaces = (CustomNode,)
         connection_class = TotalCountConnection
 
+    @classmethod
+    def bulk_create(cls, instances):
+        return write_stock_entries(instances, cls.bulk_chunk_size)
+
+    @classmethod
+    def bulk_update(cls, instances, fields, previous):
+        with transaction.atomic():
+            result = super().bulk_update(instances, fields, previous)
+            stock_entries_rewritten(instances, previous)
+        return result
+
 
 class OrderItemNode(CustomDjangoCRUDObjectType):
+    """
+    Order items reserve stock on create and adjust or release it on update/delete;
+    items of cancelled orders hold none, their stock went back on cancellation.
+    """
+
     class Meta:
         model = OrderItem
         interfaces = (CustomNode,)
         connection_class = TotalCountConnection
 
+    @classmethod
+    def create(cls, parent, info, instance, data, *args, **kwargs):
+        with transaction.atomic():
+            instance = super().create(parent, info, instance, data, *args, **kwargs)
+            cancelled = cancelled_order_ids([instance.order_id])
+            apply_stock_change(
+                item_stock_change(None, instance, cancelled), f"Order {instance.order_id}"
+            )
+        return instance
+
+    @classmethod
+    def update(cls, parent, info, instance, data, *args, **kwargs):
+        old = copy.copy(instance)
+        with transaction.atomic():
+            instance = super().update(parent, info, instance, data, *args, **kwargs)
+            cancelled = cancelled_order_ids([old.order_id, instance.order_id])
+            apply_stock_change(
+                item_stock_change(old, instance, cancelled), f"Order {instance.order_id}"
+            )
+        return instance
+
+    @classmethod
+    def delete(cls, parent, info, instance, data, *args, **kwargs):
+        with transaction.atomic():
+            instance = super().delete(parent, info, instance, data, *args, **kwargs)
+            cancelled = cancelled_order_ids([instance.order_id])
+            apply_stock_change(
+                item_stock_change(instance, None, cancelled), f"Order {instance.order_id}"
+            )
+        return instance
+
+    @classmethod
+    def bulk_clean(cls, instances, previous):
+        # Stock each row takes, checked in input order against balances locked for the batch
+        old_orders = [old.order_id for old in previous.values()]
+        cancelled = cancelled_order_ids(
+            [*old_orders, *(item.order_id for item in instances.values())]
+        )
+        needed = [
+            (position, product_id, -units)
+            for position, item in instances.items()
+            for product_id, units in item_stock_change(
+                previous.get(item.pk), item, cancelled
+            ).items()
+            if units < 0
+        ]
+        available = lock_stock_balances(product_id for _, product_id, _ in needed)
+        errors = {}
+        for position, product_id, quantity in needed:
+            if available[product_id] < quantity:
+                errors[position] = ValidationError(
+                    {"quantity": [f"Only {max(available[product_id], 0)} unit(s) in stock."]}
+                )
+            else:
+                available[product_id] -= quantity
+        return errors
+
+    @classmethod
+    def bulk_create(cls, instances):
+        with transaction.atomic():
+            items = super().bulk_create(instances)
+            totals = defaultdict(int)
+            for item in items:
+                totals[item.order_id] += item.total_cents
+            Order.add_to_totals(totals)
+            cls.write_stock_changes([(None, item) for item in items])
+        return items
+
+    @classmethod
+    def bulk_update(cls, instances, fields, previous):
+        with transaction.atomic():
+            result = super().bulk_update(instances, fields, previous)
+            totals = defaultdict(int)
+            for item in instances:
+                old = previous[item.pk]
+                totals[old.order_id] -= old.total_cents
+                totals[item.order_id] += item.total_cents
+            Order.add_to_totals(totals)
+            cls.write_stock_changes([(previous[item.pk], item) for item in instances])
+        return result
+
+    @classmethod
+    def write_stock_changes(cls, changes):
+        """Ledger entries for (old, new) item pairs, written in bulk."""
+        cancelled = cancelled_order_ids(
+            item.order_id for pair in changes for item in pair if item is not None
+        )
+        entries = [
+            InventoryEntry(product_id=product_id, delta=units, note=f"Order {new.order_id}")
+            for old, new in changes
+            for product_id, units in item_stock_change(old, new, cancelled).items()
+        ]
+        write_stock_entries(entries, cls.bulk_chunk_size)
+
 
 class OrderNode(CustomDjangoCRUDObjectType):
+    """
+    Cancelling or deleting an order releases the stock its items reserve, and
+    taking it out of CANCELLED reserves that stock again.
+    """
+
     class Meta:
         model = Order
         interfaces = (CustomNode,)
         connection_class = TotalCountConnection
+        # maintained by OrderItem writes
+        input_exclude_fields = ("total_cents",)
+
+    @classmethod
+    def update(cls, parent, info, instance, data, *args, **kwargs):
+        status = instance.status
+        with transaction.atomic():
+            instance = super().update(parent, info, instance, data, *args, **kwargs)
+            if status != "CANCELLED" and instance.status == "CANCELLED":
+                release_order_stock([instance.pk], cls.bulk_chunk_size)
+            elif status == "CANCELLED" and instance.status != "CANCELLED":
+                reserve_order_stock([instance.pk], cls.bulk_chunk_size)
+        return instance
+
+    @classmethod
+    def delete(cls, parent, info, instance, data, *args, **kwargs):
+        with transaction.atomic():
+            # Before the items go with the order; a cancelled order holds no stock
+            if instance.status != "CANCELLED":
+                release_order_stock([instance.pk], cls.bulk_chunk_size)
+            return super().delete(parent, info, instance, data, *args, **kwargs)
+
+    @classmethod
+    def bulk_clean(cls, instances, previous):
+        # Stock of the orders leaving CANCELLED, checked in input order as OrderItemNode does
+        reopened = {
+            position: order.pk
+            for position, order in instances.items()
+            if order.pk in previous
+            and previous[order.pk].status == "CANCELLED"
+            and order.status != "CANCELLED"
+        }
+        needed = defaultdict(lambda: defaultdict(int))
+        for order_id, product_id, quantity in OrderItem.objects.filter(
+            order_id__in=reopened.values()
+        ).values_list("order_id", "product_id", "quantity"):
+            needed[order_id][product_id] += quantity
+        available = lock_stock_balances(
+            product_id for quantities in needed.values() for product_id in quantities
+        )
+        errors = {}
+        for position, order_id in reopened.items():
+            quantities = needed[order_id]
+            short = [
+                product_id
+                for product_id, quantity in quantities.items()
+                if available[product_id] < quantity
+            ]
+            if short:
+                errors[position] = ValidationError(
+                    {
+                        "status": [
+                            f"Only {max(available[product_id], 0)} unit(s) of product "
+                            f"{product_id} in stock."
+                            for product_id in short
+                        ]
+                    }
+                )
+                continue
+            for product_id, quantity in quantities.items():
+                available[product_id] -= quantity
+        return errors
+
+    @classmethod
+    def bulk_update(cls, instances, fields, previous):
+        with transaction.atomic():
+            result = super().bulk_update(instances, fields, previous)
+            cancelled, reopened = [], []
+            for order in instances:
+                was_cancelled = previous[order.pk].status == "CANCELLED"
+                if not was_cancelled and order.status == "CANCELLED":
+                    cancelled.append(order.pk)
+                elif was_cancelled and order.status != "CANCELLED":
+                    reopened.append(order.pk)
+            release_order_stock(cancelled, cls.bulk_chunk_size)
+            reserve_order_stock(reopened, cls.bulk_chunk_size)
+        return result
+
+    @classmethod
+    def bulk_create(cls, instances):
+        with transaction.atomic():
+            orders = super().bulk_create(instances)
+            OutboxMessage.publish_many("order.created", [{"order_id": o.pk} for o in orders])
+        return orders
+
+
+class StockLevel(graphene.ObjectType):
+    product_id = graphene.ID()
+    stock = graphene.Int()
+
+
+class SalesDay(graphene.ObjectType):
+    day = graphene.Date()
+    revenue_cents = graphene.Int()
+    units = graphene.Int()
+
+
+class StockMovementDay(graphene.ObjectType):
+    day = graphene.Date()
+    net_delta = graphene.Int()
@@ -0,0 +1,297 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from modules.shared.utils import as_db_datetime, db_now
+
+from .models import (
+    InventoryEntry,
+    Order,
+    OrderItem,
+    OutboxMessage,
+    Product,
+    StockBalance,
+    StockCheckpoint,
+)
+
+STOCK_LEVELS_CHUNK_SIZE = 2000
+
+
+def current_stock(product_id: int) -> int:
+    """Stock on hand for a product, read from its materialized StockBalance."""
+    quantity = (
+        StockBalance.objects.filter(product_id=product_id)
+        .values_list("quantity", flat=True)
+        .first()
+    )
+    return quantity or 0
+
+
+def ledger_stock(product_id: int) -> int:
+    """Stock on hand recomputed from the InventoryEntry ledger."""
+    total = InventoryEntry.objects.filter(product_id=product_id).aggregate(total=Sum("delta"))
+    return total["total"] or 0
+
+
+def reserve_stock(product_id: int, quantity: int, note: str = "") -> InventoryEntry:
+    """
+    Take `quantity` units of a product by writing a negative InventoryEntry.
+
+    The product's StockBalance row is locked (SELECT ... FOR UPDATE) for the check
+    and the write, so concurrent reservations on one SKU queue up instead of
+    overselling. Raises ValidationError when the balance cannot cover the request.
+    """
+    with transaction.atomic():
+        balance, _ = StockBalance.objects.select_for_update().get_or_create(product_id=product_id)
+        if balance.quantity < quantity:
+            raise ValidationError(
+                {"quantity": [f"Only {max(balance.quantity, 0)} unit(s) in stock."]}
+            )
+        return InventoryEntry.objects.create(product_id=product_id, delta=-quantity, note=note)
+
+
+def release_stock(product_id: int, quantity: int, note: str = "") -> InventoryEntry:
+    """Give back stock taken by reserve_stock."""
+    return InventoryEntry.objects.create(product_id=product_id, delta=quantity, note=note)
+
+
+def cancelled_order_ids(order_ids) -> set:
+    """
+    Ids of the cancelled orders among `order_ids`, whose items hold no stock. The
+    orders are locked, so they cannot be cancelled or reopened meanwhile.
+    """
+    return set(
+        Order.objects.select_for_update()
+        .filter(pk__in=set(order_ids), status="CANCELLED")
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def item_stock_change(old, new, cancelled) -> dict:
+    """
+    Units of each product an order item write gives back (positive) or takes
+    (negative), `old` and `new` being the item before and after (None when it is
+    created or deleted). Items of orders in `cancelled` hold no stock.
+    """
+    change = defaultdict(int)
+    if old is not None and old.order_id not in cancelled:
+        change[old.product_id] += old.quantity
+    if new is not None and new.order_id not in cancelled:
+        change[new.product_id] -= new.quantity
+    return {product_id: units for product_id, units in change.items() if units}
+
+
+def apply_stock_change(change, note=""):
+    """Write the releases, then the reservations, of an item_stock_change."""
+    for product_id, units in sorted(change.items(), key=lambda item: -item[1]):
+        if units > 0:
+            release_stock(product_id, units, note)
+        else:
+            reserve_stock(product_id, -units, note)
+
+
+def lock_stock_balances(product_ids) -> dict:
+    """
+    Stock keyed by product id, with the products' StockBalance rows locked
+    (SELECT ... FOR UPDATE, in product order) until the transaction ends.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return {}
+    StockBalance.objects.bulk_create(
+        [StockBalance(product_id=product_id) for product_id in product_ids], ignore_conflicts=True
+    )
+    return dict(
+        StockBalance.objects.select_for_update()
+        .filter(product_id__in=product_ids)
+        .order_by("product_id")
+        .values_list("product_id", "quantity")
+    )
+
+
+def write_stock_entries(entries, chunk_size=500):
+    """
+    Insert many InventoryEntry rows with bulk_create and move the StockBalance of
+    each product once, as InventoryEntry.save does per row.
+    """
+    with transaction.atomic():
+        entries = InventoryEntry.objects.bulk_create(entries, batch_size=chunk_size)
+        deltas = defaultdict(int)
+        for entry in entries:
+            deltas[entry.product_id] += entry.delta
+        StockBalance.apply_deltas(deltas)
+        if deltas:
+            OutboxMessage.publish("stock.changed", {"product_ids": sorted(deltas)})
+    return entries
+
+
+def stock_entries_rewritten(entries, previous):
+    """
+    Bring StockBalance and StockCheckpoint in step after `entries` were updated in
+    bulk, `previous` mapping their pks to the entries as they were before.
+    """
+    deltas, stale = defaultdict(int), {}
+    for entry in entries:
+        old = previous[entry.pk]
+        deltas[old.product_id] -= old.delta
+        deltas[entry.product_id] += entry.delta
+        # Rewriting history makes every later checkpoint of both products stale
+        for product_id in (old.product_id, entry.product_id):
+            stale[product_id] = min(stale.get(product_id, old.created_at), old.created_at)
+    StockBalance.apply_deltas(deltas)
+    for product_id, since in stale.items():
+        StockCheckpoint.invalidate(product_id, since)
+    if deltas:
+        OutboxMessage.publish("stock.changed", {"product_ids": sorted(deltas)})
+
+
+def order_reservations(order_ids):
+    """
+    The InventoryEntry rows (unsaved) of the stock the items of `order_ids` hold,
+    one negative entry per item as reserve_stock writes them.
+    """
+    return [
+        InventoryEntry(product_id=product_id, delta=-quantity, note=f"Order {order_id}")
+        for order_id, product_id, quantity in OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("id")
+        .values_list("order_id", "product_id", "quantity")
+    ]
+
+
+def release_order_stock(order_ids, chunk_size=500):
+    """Give back the stock held by the items of orders being cancelled or deleted."""
+    entries = order_reservations(order_ids)
+    for entry in entries:
+        entry.delta = -entry.delta
+    return write_stock_entries(entries, chunk_size)
+
+
+def reserve_order_stock(order_ids, chunk_size=500):
+    """
+    Take again the stock of the items of orders leaving CANCELLED, checked against
+    their locked StockBalance rows. Raises ValidationError when it cannot be covered.
+    """
+    with transaction.atomic():
+        entries = order_reservations(order_ids)
+        available = lock_stock_balances(entry.product_id for entry in entries)
+        needed = defaultdict(int)
+        for entry in entries:
+            needed[entry.product_id] -= entry.delta
+        for product_id, quantity in needed.items():
+            if available[product_id] < quantity:
+                raise ValidationError(
+                    {
+                        "status": [
+                            f"Only {max(available[product_id], 0)} unit(s) of product "
+                            f"{product_id} in stock."
+                        ]
+                    }
+                )
+        return write_stock_entries(entries, chunk_size)
+
+
+def iter_stock_levels(products=None, product_ids=None, chunk_size=STOCK_LEVELS_CHUNK_SIZE):
+    """
+    Yield (product_id, stock) for the given products, ordered by id.
+
+    Each chunk is one aggregate query (SUM(delta) grouped by product) read through
+    a server-side cursor. Explicit id lists are split into chunks of `chunk_size`
+    so the IN clause stays bounded; unknown ids are skipped.
+    """
+    if products is None:
+        products = Product.objects.all()
+    if product_ids is None:
+        chunks = [products]
+    else:
+        product_ids = list(product_ids)
+        chunks = (
+            products.filter(id__in=product_ids[start : start + chunk_size])
+            for start in range(0, len(product_ids), chunk_size)
+        )
+    for chunk in chunks:
+        # Re-select by id so joins used for filtering do not multiply the sum
+        rows = (
+            Product.objects.filter(id__in=chunk.values("id"))
+            .order_by("id")
+            .annotate(stock=Coalesce(Sum("inventory_entries__delta"), 0))
+            .values_list("id", "stock")
+        )
+        yield from rows.iterator(chunk_size=chunk_size)
+
+
+def current_stock_many(product_ids, chunk_size=STOCK_LEVELS_CHUNK_SIZE) -> dict:
+    """Stock keyed by product id, computed with one grouped aggregate per chunk of ids."""
+    return dict(iter_stock_levels(product_ids=product_ids, chunk_size=chunk_size))
+
+
+def stock_as_of(product_id: int, at) -> int:
+    """
+    Stock for a product including every entry created up to `at`.
+
+    Starts from the nearest StockCheckpoint at or before `at` and only sums
+    the ledger tail after it.
+    """
+    at = as_db_datetime(at)
+    entries = InventoryEntry.objects.filter(product_id=product_id, created_at__lte=at)
+    checkpoint = (
+        StockCheckpoint.objects.filter(product_id=product_id, as_of__lte=at)
+        .order_by("-as_of")
+        .first()
+    )
+    quantity = 0
+    if checkpoint is not None:
+        quantity = checkpoint.quantity
+        entries = entries.filter(created_at__gte=checkpoint.as_of)
+    return quantity + (entries.aggregate(total=Sum("delta"))["total"] or 0)
+
+
+def create_stock_checkpoints(as_of=None) -> int:
+    """
+    Write a checkpoint at `as_of` (default: today's midnight) for every product
+    with ledger activity since its previous checkpoint. Returns the number written.
+    """
+    if as_of is None:
+        as_of = db_now().replace(hour=0, minute=0, second=0, microsecond=0)
+    as_of = as_db_datetime(as_of)
+
+    earlier = StockCheckpoint.objects.filter(as_of__lt=as_of)
+    previous = (
+        earlier.order_by("product_id", "-as_of")
+        .distinct("product_id")
+        .values_list("product_id", "as_of", "quantity")
+    )
+    # Products are normally checkpointed together, so group them by their previous
+    # checkpoint and sum each group's tail with one aggregate query
+    by_start = defaultdict(dict)
+    for product_id, start, quantity in previous:
+        by_start[start][product_id] = quantity
+
+    tails = InventoryEntry.objects.order_by().filter(created_at__lt=as_of)
+    totals = dict(
+        tails.exclude(product_id__in=earlier.values("product_id"))
+        .values_list("product_id")
+        .annotate(total=Sum("delta"))
+    )
+    for start, base in by_start.items():
+        for product_id, tail in (
+            tails.filter(product_id__in=list(base), created_at__gte=start)
+            .values_list("product_id")
+            .annotate(total=Sum("delta"))
+        ):
+            totals[product_id] = base[product_id] + tail
+
+    StockCheckpoint.objects.bulk_create(
+        [
+            StockCheckpoint(product_id=product_id, as_of=as_of, quantity=quantity)
+            for product_id, quantity in totals.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["product", "as_of"],
+        update_fields=["quantity", "updated_at"],
+    )
+    return len(totals)
@@ -1,15 +1,64 @@
-from celery import shared_task
-from .models import Product, InventoryEntry, Order, AnalyticsEvent
-
-def current_stock(product_id:int) -> int:
-    return sum(InventoryEntry.objects.filter(product_id=product_id).values_list("delta", flat=True))
+import time
+from celery import chord, shared_task
+from celery.signals import worker_process_shutdown, worker_shutting_down
+from django.conf import settings
+from .analytics import analytics_buffer
+from .models import Order
+from .outbox import relay_outbox
+from .partitions import maintain_partitions
+from .reconcile import product_id_chunks, reconcile_chunk, record_reconciliation
+from .recalc import drain_recalculations, request_recalculation
+from .rollups import refresh_rollups
+from .stock import create_stock_checkpoints, current_stock, ledger_stock  # noqa: F401
 
 @shared_task(name="inventory.recalculate_inventory")
 def recalc_inventory_async(product_id:int):
-    total = current_stock(product_id)
-    AnalyticsEvent.objects.create(order=None, kind="RECALC_PRODUCT", payload={"product_id": product_id, "stock": total})
+    # Kept for already queued messages; new callers use request_recalculation directly
+    request_recalculation([product_id])
+
+@shared_task(name="inventory.drain_recalculations")
+def drain_recalculations_async():
+    return drain_recalculations()
 
 @shared_task(name="inventory.post_order_analytics")
 def post_order_analytics_async(order_id:int):
+    # Kept for already queued messages; new orders are recorded through the outbox
     order = Order.objects.get(id=order_id)
-    AnalyticsEvent.objects.create(order=order, kind="ORDER_CREATED", payload={"total_cents": order.total_cents})
+    analytics_buffer.append("ORDER_CREATED", {"total_cents": order.total_cents}, order_id=order.id)
+
+@shared_task(name="inventory.checkpoint_stock")
+def checkpoint_stock_async():
+    return create_stock_checkpoints()
+
+@shared_task(name="inventory.refresh_rollups")
+def refresh_rollups_async():
+    return refresh_rollups()
+
+@shared_task(name="inventory.relay_outbox")
+def relay_outbox_async():
+    return relay_outbox()
+
+@shared_task(name="inventory.maintain_partitions")
+def maintain_partitions_async():
+    return maintain_partitions()
+
+@shared_task(name="inventory.reconcile_stock_chunk")
+def reconcile_stock_chunk_async(first_id:int, last_id:int):
+    return reconcile_chunk(first_id, last_id)
+
+@shared_task(name="inventory.record_reconciliation")
+def record_reconciliation_async(results, started:float):
+    return record_reconciliation(results, time.time() - started)
+
+@shared_task(name="inventory.reconcile_stock")
+def reconcile_stock_async(chunk_size:int=None):
+    # A chord rather than waiting on a group, which would block this worker
+    chunks = product_id_chunks(chunk_size or settings.RECONCILE_CHUNK_SIZE)
+    chord(reconcile_stock_chunk_async.s(*chunk) for chunk in chunks)(
+        record_reconciliation_async.s(time.time())
+    )
+
+@worker_process_shutdown.connect
+@worker_shutting_down.connect
+def flush_analytics_on_shutdown(**kwargs):
+    analytics_buffer.close()
@@ -1,5 +1,8 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from graphene_django.utils.testing import GraphQLTestCase
 from inventory.models import Product, InventoryEntry
+from inventory.stock import current_stock
 
 
 class TestInventoryEntryMutations(GraphQLTestCase):
@@ -31,6 +34,7 @@ class TestInventoryEntryMutations(GraphQLTestCase):
         payload = r.json()["data"]["inventoryEntryCreate"]
         assert payload["ok"] is True
         eid = payload["result"]["id"]
+        assert current_stock(self.prod.id) == 50
 
         # update
         update = """
@@ -43,10 +47,12 @@ class TestInventoryEntryMutations(GraphQLTestCase):
         }
         """
         r = self.query(
-            update, variables={"where": {"id": {"exact": eid}}, "input": {"note": "Adjusted"}}
+            update,
+            variables={"where": {"id": {"exact": eid}}, "input": {"note": "Adjusted", "delta": 40}},
         )
         self.assertResponseNoErrors(r)
         assert r.json()["data"]["inventoryEntryUpdate"]["result"]["note"] == "Adjusted"
+        assert current_stock(self.prod.id) == 40
 
         # delete (no result)
         delete = """
@@ -58,3 +64,63 @@ class TestInventoryEntryMutations(GraphQLTestCase):
         self.assertResponseNoErrors(r)
         assert r.json()["data"]["inventoryEntryDelete"]["ok"] is True
         assert InventoryEntry.objects.filter(product=self.prod).count() == 0
+        assert current_stock(self.prod.id) == 0
+
+    def test_inventory_entry_create_many_and_update_many(self):
+        other = Product.objects.create(name="Widget B", sku="W-B", price_cents=300)
+        create = """
+        mutation ($input: [InventoryEntryCreateInput!]!, $partial: Boolean) {
+          inventoryEntryCreateMany(input: $input, partial: $partial) {
+            ok
+            errors { index field messages }
+            results { id delta product { sku } }
+          }
+        }
+        """
+
+        def rows(count):
+            return [
+                {"delta": 5, "product": {"connect": {"sku": {"exact": sku}}}}
+                for sku in ("W-A", "W-B") * count
+            ]
+
+        # Queries do not grow with the number of rows
+        self.assertResponseNoErrors(self.query(create, variables={"input": rows(1)}))
+        with CaptureQueriesContext(connection) as small:
+            self.assertResponseNoErrors(self.query(create, variables={"input": rows(1)}))
+        with self.assertNumQueries(len(small.captured_queries)):
+            r = self.query(create, variables={"input": rows(20)})
+        payload = r.json()["data"]["inventoryEntryCreateMany"]
+        assert payload["ok"] is True and len(payload["results"]) == 40
+        assert payload["results"][1]["product"]["sku"] == "W-B"
+        assert current_stock(self.prod.id) == current_stock(other.id) == 110
+
+        # One bad row rejects the batch unless partial
+        bad = [*rows(1), {"delta": 1, "product": {"connect": {"sku": {"exact": "NOPE"}}}}]
+        payload = self.query(create, variables={"input": bad}).json()["data"]
+        payload = payload["inventoryEntryCreateMany"]
+        assert payload["ok"] is False
+        assert [(e["index"], e["field"]) for e in payload["errors"]] == [(2, "product.connect")]
+        assert current_stock(self.prod.id) == 110
+        payload = self.query(create, variables={"input": bad, "partial": True}).json()["data"]
+        payload = payload["inventoryEntryCreateMany"]
+        assert payload["ok"] is False and payload["results"][2] is None
+        assert current_stock(self.prod.id) == current_stock(other.id) == 115
+
+        update = """
+        mutation ($input: [InventoryEntryUpdateManyInput!]!) {
+          inventoryEntryUpdateMany(input: $input) { ok errors { index field messages } }
+        }
+        """
+        entries = InventoryEntry.objects.filter(product=self.prod)[:2]
+        r = self.query(
+            update,
+            variables={
+                "input": [
+                    {"where": {"id": {"exact": entry.id}}, "input": {"delta": 1}}
+                    for entry in entries
+                ]
+            },
+        )
+        assert r.json()["data"]["inventoryEntryUpdateMany"]["ok"] is True
+        assert current_stock(self.prod.id) == 107
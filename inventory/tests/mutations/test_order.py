@@ -1,11 +1,24 @@
 # inventory/tests/mutations/test_order.py
 from graphene_django.utils.testing import GraphQLTestCase
-from inventory.models import Customer, Product, Order
+from inventory.models import Customer, InventoryEntry, Order, OrderItem, Product
+from inventory.stock import current_stock, reserve_stock
 
 
 class TestOrderMutations(GraphQLTestCase):
     GRAPHQL_URL = "/graphql/"
 
+    UPDATE_STATUS = """
+    mutation ($where: OrderWhereInput!, $input: OrderUpdateInput!) {
+      orderUpdate(where: $where, input: $input) { ok errors { field messages } }
+    }
+    """
+
+    DELETE = """
+    mutation ($where: OrderWhereInput!) {
+      orderDelete(where: $where) { ok errors { field messages } }
+    }
+    """
+
     def setUp(self):
         self.customer = Customer.objects.create(email="c@example.com", full_name="Carol")
         self.product = Product.objects.create(name="Mouse", sku="M-1", price_cents=800)
@@ -78,3 +91,71 @@ class TestOrderMutations(GraphQLTestCase):
         self.assertResponseNoErrors(r3)
         assert r3.json()["data"]["orderDelete"]["ok"] is True
         assert Order.objects.count() == 0
+
+    def _reserved_order(self, quantity=3):
+        InventoryEntry.objects.create(product=self.product, delta=10)
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=quantity, unit_price_cents=800
+        )
+        reserve_stock(self.product.id, quantity, f"Order {order.id}")
+        return order
+
+    def _set_status(self, order, status):
+        r = self.query(
+            self.UPDATE_STATUS,
+            variables={"where": {"id": {"exact": order.id}}, "input": {"status": status}},
+        )
+        self.assertResponseNoErrors(r)
+        return r.json()["data"]["orderUpdate"]
+
+    def test_cancelling_releases_and_reopening_reserves_stock(self):
+        order = self._reserved_order()
+        assert current_stock(self.product.id) == 7
+
+        assert self._set_status(order, "CANCELLED")["ok"] is True
+        assert current_stock(self.product.id) == 10
+        assert self._set_status(order, "PAID")["ok"] is True
+        assert current_stock(self.product.id) == 7
+
+        # Stock sold meanwhile cannot be reserved again
+        self._set_status(order, "CANCELLED")
+        reserve_stock(self.product.id, 9)
+        payload = self._set_status(order, "PENDING")
+        assert payload["ok"] is False
+        assert payload["errors"] == [
+            {
+                "field": "status",
+                "messages": [f"Only 1 unit(s) of product {self.product.id} in stock."],
+            }
+        ]
+        assert Order.objects.get().status == "CANCELLED"
+        assert current_stock(self.product.id) == 1
+
+    def test_bulk_cancelling_releases_stock(self):
+        order = self._reserved_order()
+        r = self.query(
+            """
+            mutation ($input: [OrderUpdateManyInput!]!) {
+              orderUpdateMany(input: $input) { ok }
+            }
+            """,
+            variables={
+                "input": [{"where": {"id": {"exact": order.id}}, "input": {"status": "CANCELLED"}}]
+            },
+        )
+        self.assertResponseNoErrors(r)
+        assert current_stock(self.product.id) == 10
+
+    def test_deleting_releases_stock_once(self):
+        order = self._reserved_order()
+        r = self.query(self.DELETE, variables={"where": {"id": {"exact": order.id}}})
+        assert r.json()["data"]["orderDelete"]["ok"] is True
+        assert current_stock(self.product.id) == 10
+
+        # A cancelled order already gave its stock back
+        order = self._reserved_order(quantity=4)
+        self._set_status(order, "CANCELLED")
+        self.query(self.DELETE, variables={"where": {"id": {"exact": order.id}}})
+        assert not Order.objects.exists()
+        assert current_stock(self.product.id) == 20
@@ -1,5 +1,6 @@
 from graphene_django.utils.testing import GraphQLTestCase
-from inventory.models import Product, Customer, Order, OrderItem
+from inventory.models import Product, Customer, Order, OrderItem, InventoryEntry
+from inventory.stock import current_stock
 
 
 class TestOrderItemMutations(GraphQLTestCase):
@@ -8,6 +9,7 @@ class TestOrderItemMutations(GraphQLTestCase):
     def setUp(self):
         # Create backing records via ORM (simpler) and get the GraphQL ID via a query
         self.product = Product.objects.create(name="Mouse", sku="M-1", price_cents=800)
+        InventoryEntry.objects.create(product=self.product, delta=10, note="Initial stock")
         self.customer = Customer.objects.create(email="c@example.com", full_name="C")
         self.order = Order.objects.create(customer=self.customer)
 
@@ -72,3 +74,146 @@ class TestOrderItemMutations(GraphQLTestCase):
         self.assertResponseNoErrors(r)
         assert r.json()["data"]["orderItemDelete"]["ok"] is True
         assert OrderItem.objects.count() == 0
+
+
+class TestOrderItemReservations(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+
+    create = """
+    mutation ($input: OrderItemCreateInput!) {
+      orderItemCreate(input: $input) {
+        ok
+        errors { field messages }
+        result { id quantity }
+      }
+    }
+    """
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Mouse", sku="M-1", price_cents=800)
+        InventoryEntry.objects.create(product=self.product, delta=5, note="Initial stock")
+        customer = Customer.objects.create(email="c@example.com", full_name="C")
+        self.order = Order.objects.create(customer=customer)
+
+    def create_item(self, quantity):
+        v = {
+            "input": {
+                "quantity": quantity,
+                "unitPriceCents": 800,
+                "product": {"connect": {"sku": {"exact": "M-1"}}},
+                "order": {"connect": {"id": {"exact": self.order.id}}},
+            }
+        }
+        r = self.query(self.create, variables=v)
+        self.assertResponseNoErrors(r)
+        return r.json()["data"]["orderItemCreate"]
+
+    def test_create_reserves_stock(self):
+        payload = self.create_item(3)
+        assert payload["ok"] is True
+        assert current_stock(self.product.id) == 2
+        assert InventoryEntry.objects.filter(product=self.product, delta=-3).exists()
+
+    def test_create_rejects_oversell(self):
+        payload = self.create_item(6)
+        assert payload["ok"] is False
+        assert payload["errors"][0]["field"] == "quantity"
+        assert OrderItem.objects.count() == 0
+        assert current_stock(self.product.id) == 5
+
+    def test_update_and_delete_adjust_reservation(self):
+        iid = self.create_item(2)["result"]["id"]
+        update = """
+        mutation ($where: OrderItemWhereInput!, $input: OrderItemUpdateInput!) {
+          orderItemUpdate(where: $where, input: $input) { ok errors { field messages } }
+        }
+        """
+        r = self.query(
+            update, variables={"where": {"id": {"exact": iid}}, "input": {"quantity": 4}}
+        )
+        self.assertResponseNoErrors(r)
+        assert r.json()["data"]["orderItemUpdate"]["ok"] is True
+        assert current_stock(self.product.id) == 1
+
+        r = self.query(
+            update, variables={"where": {"id": {"exact": iid}}, "input": {"quantity": 9}}
+        )
+        assert r.json()["data"]["orderItemUpdate"]["ok"] is False
+        assert OrderItem.objects.get(pk=iid).quantity == 4
+
+        delete = """
+        mutation ($where: OrderItemWhereInput!) {
+          orderItemDelete(where: $where) { ok }
+        }
+        """
+        r = self.query(delete, variables={"where": {"id": {"exact": iid}}})
+        self.assertResponseNoErrors(r)
+        assert current_stock(self.product.id) == 5
+
+    def _mutate(self, mutation, **variables):
+        r = self.query(mutation, variables=variables)
+        self.assertResponseNoErrors(r)
+        return next(iter(r.json()["data"].values()))
+
+    def cancel_order(self):
+        return self._mutate(
+            """
+            mutation ($where: OrderWhereInput!) {
+              orderUpdate(where: $where, input: {status: CANCELLED}) { ok }
+            }
+            """,
+            where={"id": {"exact": self.order.id}},
+        )
+
+    def test_items_of_cancelled_orders_hold_no_stock(self):
+        iid = self.create_item(3)["result"]["id"]
+        assert self.cancel_order()["ok"] is True
+        assert current_stock(self.product.id) == 5
+
+        # Already released by the cancellation
+        delete = """
+        mutation ($where: OrderItemWhereInput!) { orderItemDelete(where: $where) { ok } }
+        """
+        assert self._mutate(delete, where={"id": {"exact": iid}})["ok"] is True
+        assert current_stock(self.product.id) == 5
+
+    def test_item_added_to_cancelled_order_reserves_nothing(self):
+        self.cancel_order()
+        assert self.create_item(2)["ok"] is True
+        assert current_stock(self.product.id) == 5
+
+        delete = """
+        mutation ($where: OrderWhereInput!) { orderDelete(where: $where) { ok } }
+        """
+        assert self._mutate(delete, where={"id": {"exact": self.order.id}})["ok"] is True
+        assert current_stock(self.product.id) == 5
+
+    def test_create_many_reserves_stock_per_row(self):
+        create_many = """
+        mutation ($input: [OrderItemCreateInput!]!) {
+          orderItemCreateMany(input: $input, partial: true) {
+            ok
+            errors { index field messages }
+          }
+        }
+        """
+        item = {
+            "unitPriceCents": 800,
+            "product": {"connect": {"sku": {"exact": "M-1"}}},
+            "order": {"connect": {"id": {"exact": self.order.id}}},
+        }
+        r = self.query(
+            create_many,
+            variables={
+                "input": [{**item, "quantity": q} for q in (2, 4, 3)],
+            },
+        )
+        self.assertResponseNoErrors(r)
+        payload = r.json()["data"]["orderItemCreateMany"]
+        # 5 in stock: 2 and 3 fit, 4 does not once 2 are taken
+        assert payload["errors"] == [
+            {"index": 1, "field": "quantity", "messages": ["Only 3 unit(s) in stock."]}
+        ]
+        assert current_stock(self.product.id) == 0
+        self.order.refresh_from_db()
+        assert self.order.total_cents == 5 * 800
@@ -87,3 +87,53 @@ class ProductMutationTests(GraphQLTestCase):
         payload = resp.json()["data"]["productDelete"]
         assert payload["ok"] is True
         assert not Product.objects.filter(sku="TEMP-1").exists()
+
+    def test_product_create_many_and_update_many(self):
+        Product.objects.create(name="Taken", sku="TAKEN", price_cents=1)
+        create = """
+        mutation ($input: [ProductCreateInput!]!) {
+          productCreateMany(input: $input, partial: true) {
+            ok
+            errors { index field messages }
+            results { sku }
+          }
+        }
+        """
+        r = self.query(
+            create,
+            variables={
+                "input": [
+                    {"name": "A", "sku": "A-1", "priceCents": 100},
+                    {"name": "Dup", "sku": "TAKEN", "priceCents": 100},
+                    {"name": "B", "sku": "A-1", "priceCents": 100},
+                    {"name": "C", "sku": "C-1", "priceCents": -5},
+                ]
+            },
+        )
+        self.assertResponseNoErrors(r)
+        payload = r.json()["data"]["productCreateMany"]
+        assert payload["ok"] is False
+        assert [(e["index"], e["field"]) for e in payload["errors"]] == [
+            (1, "sku"),
+            (2, "sku"),
+            (3, "price_cents"),
+        ]
+        assert payload["results"] == [{"sku": "A-1"}, None, None, None]
+
+        update = """
+        mutation ($input: [ProductUpdateManyInput!]!) {
+          productUpdateMany(input: $input) { ok errors { index field messages } }
+        }
+        """
+        r = self.query(
+            update,
+            variables={
+                "input": [
+                    {"where": {"sku": {"exact": "A-1"}}, "input": {"priceCents": 150}},
+                    {"where": {"sku": {"exact": "TAKEN"}}, "input": {"name": "Kept"}},
+                ]
+            },
+        )
+        assert r.json()["data"]["productUpdateMany"] == {"ok": True, "errors": []}
+        assert Product.objects.get(sku="A-1").price_cents == 150
+        assert Product.objects.get(sku="TAKEN").name == "Kept"
@@ -1,5 +1,12 @@
+from datetime import datetime
+
+import pytz
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from graphene_django.utils.testing import GraphQLTestCase
 from inventory.models import Product, InventoryEntry
+from modules.shared.utils import estimate_count
 
 
 class TestInventoryEntryQueries(GraphQLTestCase):
@@ -29,3 +36,69 @@ class TestInventoryEntryQueries(GraphQLTestCase):
         # pick one via list → then query single by where.id
         q_list = "{ inventoryEntries { product { sku } } }"
         self.assertResponseNoErrors(self.query(q_list))
+
+    def _page_through(self, q, variables, field="inventoryEntries", first=2):
+        rows, after = [], None
+        while True:
+            r = self.query(q, variables={**variables, "first": first, "after": after})
+            self.assertResponseNoErrors(r)
+            page = r.json()["data"][field]
+            rows.extend(page)
+            if len(page) < first:
+                return rows
+            after = page[-1]["cursor"]
+
+    def test_inventory_entries_keyset_pages(self):
+        for delta in (5, 1, 5, 3, 1):
+            InventoryEntry.objects.create(product=self.p, delta=delta, note="More")
+        q = """
+        query ($o: [InventoryEntryOrderByInput!], $first: Int, $after: String) {
+          inventoryEntries(orderBy: $o, first: $first, after: $after) { id delta cursor }
+        }
+        """
+        for order_by in (
+            [{"createdAt": "DESC"}],
+            [{"delta": "ASC"}, {"createdAt": "DESC"}],
+        ):
+            full = self.query(q, variables={"o": order_by}).json()["data"]["inventoryEntries"]
+            paged = self._page_through(q, {"o": order_by})
+            assert len(full) == 7
+            assert [e["id"] for e in paged] == [e["id"] for e in full]
+
+    def test_inventory_entries_invalid_cursor(self):
+        r = self.query('{ inventoryEntries(first: 1, after: "nope") { id } }')
+        assert "Invalid cursor" in r.json()["errors"][0]["message"]
+
+    def test_estimate_count_uses_planner_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE inventory_inventoryentry")
+        assert estimate_count(InventoryEntry.objects.all()) == 2
+        assert estimate_count(InventoryEntry.objects.filter(delta__gt=0)) >= 0
+
+    def test_created_at_filters_use_the_cookie_timezone(self):
+        late, early = InventoryEntry.objects.all()
+        # Asia/Kolkata (+05:30): 20:00 UTC is already Feb 1st, 18:00 UTC still Jan 31st
+        for entry, hour in ((late, 20), (early, 18)):
+            at = datetime(2024, 1, 31, hour, tzinfo=pytz.utc)
+            InventoryEntry.objects.filter(pk=entry.pk).update(created_at=timezone.make_naive(at))
+        self.client.cookies["timezone"] = "330"
+        q = """
+        query ($createdAt: DatetimeFilter) {
+          inventoryEntries(where: {createdAt: $createdAt}) { id }
+        }
+        """
+        for created_at, expected in (
+            ({"year": {"exact": 2024}, "month": {"exact": 2}}, [late]),
+            ({"year": {"exact": 2024}, "month": {"exact": 1}}, [early]),
+            ({"year": {"exact": 2024}}, [late, early]),
+            ({"gte": "2024-02-01T00:00:00"}, [late]),
+            ({"lte": "2024-01-31T23:59:59"}, [early]),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                r = self.query(q, variables={"createdAt": created_at})
+            self.assertResponseNoErrors(r)
+            ids = {int(e["id"]) for e in r.json()["data"]["inventoryEntries"]}
+            assert ids == {entry.pk for entry in expected}, created_at
+            # A range on the indexed column, not a conversion of every row
+            assert "timezone(" not in queries[-1]["sql"]
+            assert "EXTRACT" not in queries[-1]["sql"]
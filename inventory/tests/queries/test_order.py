@@ -1,5 +1,6 @@
 from graphene_django.utils.testing import GraphQLTestCase
 from inventory.models import Product, Customer, Order, OrderItem
+from modules.graphene_custom.dataloaders import RequestLoaders
 
 
 class TestOrderQueries(GraphQLTestCase):
@@ -56,3 +57,108 @@ class TestOrderQueries(GraphQLTestCase):
         assert data["customer"]["email"] == "c@example.com"
         nodes = [e["node"] for e in data["items"]["edges"]]
         assert any(n["product"]["sku"] == "M-1" and n["quantity"] >= 1 for n in nodes)
+
+    def test_orders_filter_and_sort_by_total(self):
+        big = Order.objects.create(customer=self.cust)
+        OrderItem.objects.create(order=big, product=self.prod, quantity=5, unit_price_cents=800)
+        Order.objects.create(customer=self.cust)
+
+        q = """
+        query ($w: OrderWhereInput, $o: [OrderOrderByInput!]) {
+          orders(where: $w, orderBy: $o) { id totalCents }
+        }
+        """
+        with self.assertNumQueries(1):
+            r = self.query(q, variables={"o": [{"totalCents": "DESC"}]})
+        self.assertResponseNoErrors(r)
+        totals = [o["totalCents"] for o in r.json()["data"]["orders"]]
+        assert totals == [4000, 1600, 0]
+
+        r = self.query(
+            q, variables={"w": {"totalCents": {"gte": 1000}}, "o": [{"totalCents": "ASC"}]}
+        )
+        self.assertResponseNoErrors(r)
+        assert [o["totalCents"] for o in r.json()["data"]["orders"]] == [1600, 4000]
+
+    def _add_orders(self, count):
+        for i in range(count):
+            order = Order.objects.create(customer=self.cust)
+            product = Product.objects.create(name=f"P{i}", sku=f"P-{i}", price_cents=100)
+            OrderItem.objects.create(order=order, product=product, quantity=1, unit_price_cents=100)
+
+    def test_orders_nested_selection_uses_fixed_number_of_queries(self):
+        q = """
+        {
+          orders {
+            id
+            customer { email }
+            items { edges { node { quantity product { sku stock } } } }
+          }
+        }
+        """
+        # orders + customers joined, items + products joined
+        with self.assertNumQueries(2):
+            r = self.query(q)
+        self.assertResponseNoErrors(r)
+
+        self._add_orders(5)
+        with self.assertNumQueries(2):
+            r = self.query(q)
+        self.assertResponseNoErrors(r)
+        data = r.json()["data"]["orders"]
+        assert len(data) == 6
+        assert all(len(o["items"]["edges"]) == 1 for o in data)
+        assert all(o["customer"]["email"] == "c@example.com" for o in data)
+
+    def test_orders_nested_selection_through_fragments(self):
+        self._add_orders(3)
+        q = """
+        fragment ItemFields on OrderItemType { quantity product { sku } }
+        {
+          orders {
+            ... on OrderType { customer { email } }
+            items(where: { quantity: { gte: 2 } }) { edges { node { ...ItemFields } } }
+          }
+        }
+        """
+        with self.assertNumQueries(2):
+            r = self.query(q)
+        self.assertResponseNoErrors(r)
+        items = [e["node"] for o in r.json()["data"]["orders"] for e in o["items"]["edges"]]
+        assert items == [{"quantity": 2, "product": {"sku": "M-1"}}]
+
+    def test_orders_aliased_relations_are_batched_per_selection(self):
+        self._add_orders(4)
+        OrderItem.objects.create(
+            order=self.order, product=self.prod, quantity=1, unit_price_cents=800
+        )
+        q = """
+        fragment Edges on OrderItemTypeConnection { edges { node { quantity product { sku } } } }
+        {
+          orders(orderBy: [{ id: ASC }]) {
+            id
+            small: items(where: { quantity: { lt: 2 } }) { ...Edges }
+            big: items(where: { quantity: { gte: 2 } }) { ...Edges }
+          }
+        }
+        """
+        # orders, then one WHERE order_id IN (...) query per aliased selection
+        with self.assertNumQueries(3):
+            r = self.query(q)
+        self.assertResponseNoErrors(r)
+        data = r.json()["data"]["orders"]
+        assert len(data) == 5
+        first = data[0]
+        assert [e["node"]["quantity"] for e in first["small"]["edges"]] == [1]
+        assert [e["node"]["quantity"] for e in first["big"]["edges"]] == [2]
+        assert all(len(o["small"]["edges"]) == 1 and not o["big"]["edges"] for o in data[1:])
+
+    def test_request_loaders_batch_foreign_keys_of_siblings(self):
+        self._add_orders(4)
+        loaders = RequestLoaders()
+        items = list(OrderItem.objects.only("id", "order", "product"))
+        loaders.register(items)
+        product_field = OrderItem._meta.get_field("product")
+        with self.assertNumQueries(1):
+            skus = [loaders.load_object(item, product_field).sku for item in items]
+        assert sorted(skus) == ["M-1", "P-0", "P-1", "P-2", "P-3"]
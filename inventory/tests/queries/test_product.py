@@ -1,5 +1,5 @@
 from graphene_django.utils.testing import GraphQLTestCase
-from inventory.models import Product
+from inventory.models import Product, InventoryEntry
 
 
 class QueryTests(GraphQLTestCase):
@@ -64,3 +64,130 @@ class QueryTests(GraphQLTestCase):
         self.assertResponseNoErrors(response)
         node = response.json()["data"]["product"]
         assert node["sku"] == "WM-001"
+
+    def test_products_stock_from_balance(self):
+        mouse = Product.objects.get(sku="WM-001")
+        InventoryEntry.objects.create(product=mouse, delta=25, note="Load")
+        InventoryEntry.objects.create(product=mouse, delta=-5, note="Order")
+        query = """
+        {
+          products(orderBy: [{ sku: ASC }]) {
+            sku
+            stock
+          }
+        }
+        """
+        response = self.query(query)
+        self.assertResponseNoErrors(response)
+        stock = {p["sku"]: p["stock"] for p in response.json()["data"]["products"]}
+        assert stock == {"BM-010": 0, "KB-101": 0, "WM-001": 20}
+
+    def test_product_inventory_entries_keyset_connection(self):
+        product = Product.objects.get(sku="WM-001")
+        for delta in range(1, 6):
+            InventoryEntry.objects.create(product=product, delta=delta, note="Load")
+        q = """
+        query ($after: String) {
+          products(where: { sku: { exact: "WM-001" } }) {
+            inventoryEntries(first: 2, after: $after, orderBy: [{ delta: DESC }]) {
+              totalCount
+              edges { cursor node { delta } }
+              pageInfo { hasNextPage endCursor }
+            }
+          }
+        }
+        """
+        deltas, after = [], None
+        while True:
+            r = self.query(q, variables={"after": after})
+            self.assertResponseNoErrors(r)
+            connection = r.json()["data"]["products"][0]["inventoryEntries"]
+            assert connection["totalCount"] == 5
+            deltas.extend(e["node"]["delta"] for e in connection["edges"])
+            if not connection["pageInfo"]["hasNextPage"]:
+                break
+            after = connection["pageInfo"]["endCursor"]
+        assert deltas == [5, 4, 3, 2, 1]
+
+    def _products_with_entries(self, per_product=3):
+        for product in Product.objects.all():
+            for delta in range(1, per_product + 1):
+                InventoryEntry.objects.create(product=product, delta=delta, note="Load")
+
+    def test_product_connections_count_only_when_selected(self):
+        self._products_with_entries()
+        q = """
+        query ($after: String) {
+          products {
+            inventoryEntries(first: 1, after: $after, orderBy: [{ delta: ASC }]) {
+              %s
+              edges { cursor node { delta } }
+            }
+          }
+        }
+        """
+        after = self.query(q % "", variables={}).json()["data"]["products"][0]
+        after = after["inventoryEntries"]["edges"][0]["cursor"]
+
+        # products, then entries
+        with self.assertNumQueries(2):
+            r = self.query(q % "", variables={"after": after})
+        self.assertResponseNoErrors(r)
+
+        # plus one grouped COUNT for every product, however often totalCount is read
+        with self.assertNumQueries(3):
+            r = self.query(q % "totalCount again: totalCount", variables={"after": after})
+        self.assertResponseNoErrors(r)
+        for product in r.json()["data"]["products"]:
+            assert product["inventoryEntries"]["totalCount"] == 3
+            assert product["inventoryEntries"]["again"] == 3
+
+    def test_product_connections_total_count_estimate(self):
+        self._products_with_entries()
+        q = """
+        query ($after: String) {
+          products {
+            page: inventoryEntries(after: $after) { totalCountEstimate }
+            all: inventoryEntries { totalCountEstimate edges { cursor } }
+          }
+        }
+        """
+        r = self.query(q, variables={"after": None})
+        self.assertResponseNoErrors(r)
+        product = r.json()["data"]["products"][0]
+        # without a cursor the rows are loaded already, so the estimate is exact
+        assert product["all"]["totalCountEstimate"] == 3
+
+        r = self.query(q, variables={"after": product["all"]["edges"][0]["cursor"]})
+        self.assertResponseNoErrors(r)
+        # behind a cursor the planner is asked instead of counting
+        assert r.json()["data"]["products"][0]["page"]["totalCountEstimate"] >= 0
+
+    def test_product_connections_are_windowed_in_sql(self):
+        self._products_with_entries(per_product=5)
+        q = """
+        query ($first: Int, $last: Int) {
+          products(orderBy: [{ sku: ASC }]) {
+            inventoryEntries(first: $first, last: $last, orderBy: [{ delta: ASC }]) {
+              edges { node { delta } }
+              pageInfo { hasNextPage hasPreviousPage }
+            }
+          }
+        }
+        """
+        # products, then one ROW_NUMBER() windowed query for every product's page
+        with self.assertNumQueries(2):
+            r = self.query(q, variables={"first": 2})
+        self.assertResponseNoErrors(r)
+        for product in r.json()["data"]["products"]:
+            connection = product["inventoryEntries"]
+            assert [e["node"]["delta"] for e in connection["edges"]] == [1, 2]
+            assert connection["pageInfo"] == {"hasNextPage": True, "hasPreviousPage": False}
+
+        with self.assertNumQueries(2):
+            r = self.query(q, variables={"last": 2})
+        self.assertResponseNoErrors(r)
+        for product in r.json()["data"]["products"]:
+            connection = product["inventoryEntries"]
+            assert [e["node"]["delta"] for e in connection["edges"]] == [4, 5]
+            assert connection["pageInfo"] == {"hasNextPage": False, "hasPreviousPage": True}
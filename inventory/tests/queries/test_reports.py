@@ -0,0 +1,117 @@
+import datetime
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from inventory.models import (
+    Customer,
+    DailySales,
+    DailyStockMovement,
+    InventoryEntry,
+    Order,
+    OrderItem,
+    Product,
+    RollupStaleDay,
+    RollupWatermark,
+)
+from inventory.rollups import WATERMARK, refresh_rollups
+
+
+class TestReportQueries(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+
+    def setUp(self):
+        self.p = Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        self.customer = Customer.objects.create(email="a@example.com", full_name="A")
+        self.today = datetime.datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        InventoryEntry.objects.create(product=self.p, delta=100)
+        self.order = self.add_order(days_ago=2, quantity=3)
+        self.add_order(days_ago=2, quantity=1)
+        self.add_order(days_ago=0, quantity=2)
+
+    def at(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def add_order(self, days_ago, quantity):
+        order = Order.objects.create(customer=self.customer)
+        item = OrderItem.objects.create(
+            order=order, product=self.p, quantity=quantity, unit_price_cents=500
+        )
+        OrderItem.objects.filter(pk=item.pk).update(created_at=self.at(days_ago))
+        InventoryEntry.objects.create(product=self.p, delta=-quantity)
+        InventoryEntry.objects.filter(delta=-quantity).update(created_at=self.at(days_ago))
+        return order
+
+    def sales(self, days_back=3):
+        q = """
+        query ($p: ID!, $from: Date!, $to: Date!) {
+          salesByDay(productId: $p, from: $from, to: $to) { day revenueCents units }
+        }
+        """
+        variables = {
+            "p": self.p.id,
+            "from": self.at(days_back).date().isoformat(),
+            "to": self.today.date().isoformat(),
+        }
+        r = self.query(q, variables=variables)
+        self.assertResponseNoErrors(r)
+        return [(row["units"], row["revenueCents"]) for row in r.json()["data"]["salesByDay"]]
+
+    @override_settings(ROLLUP_LAG_SECONDS=0)
+    def test_reports_read_rollups_refreshed_incrementally(self):
+        assert self.sales() == [(0, 0)] * 4
+        now = datetime.datetime.now()
+        assert refresh_rollups(now=now) == 2
+        assert self.sales() == [(0, 0), (4, 2000), (0, 0), (2, 1000)]
+
+        q = """
+        query ($p: ID!, $d: Date!) {
+          stockMovementByDay(productId: $p, from: $d, to: $d) { day netDelta }
+        }
+        """
+        r = self.query(q, variables={"p": self.p.id, "d": self.today.date().isoformat()})
+        assert r.json()["data"]["stockMovementByDay"] == [
+            {"day": self.today.date().isoformat(), "netDelta": 98}
+        ]
+
+        # Only days with rows updated since the watermark are rebuilt
+        assert refresh_rollups(now=now) == 0
+        self.order.status = "CANCELLED"
+        self.order.save()
+        OrderItem.objects.filter(order__status="PENDING", created_at=self.at(0)).delete()
+        assert RollupStaleDay.objects.count() == 1
+        assert refresh_rollups() == 2
+        assert not RollupStaleDay.objects.exists()
+        assert self.sales() == [(0, 0), (1, 500), (0, 0), (0, 0)]
+
+    def test_report_range_is_checked(self):
+        q = """
+        query ($p: ID!) { salesByDay(productId: $p, from: "2024-02-01", to: "2024-01-01") { day } }
+        """
+        r = self.query(q, variables={"p": self.p.id})
+        assert "must not be before" in r.json()["errors"][0]["message"]
+
+    def test_backfill_command_by_date_range(self):
+        out = StringIO()
+        call_command(
+            "backfill_rollups",
+            "--from",
+            self.at(2).date().isoformat(),
+            "--workers",
+            "1",
+            stdout=out,
+        )
+        assert DailySales.objects.count() == 2
+        assert set(DailyStockMovement.objects.values_list("day", "net_delta")) == {
+            (self.at(2).date(), -4),
+            (self.today.date(), 98),
+        }
+        assert not RollupWatermark.objects.exists()
+
+        DailySales.objects.update(units=0)
+        call_command("backfill_rollups", "--workers", "1", "--chunk-days", "1", stdout=out)
+        assert "2 day(s) in 2 chunk(s)" in out.getvalue()
+        assert sorted(DailySales.objects.values_list("units", flat=True)) == [2, 4]
+        assert RollupWatermark.objects.get(name=WATERMARK).updated_through is not None
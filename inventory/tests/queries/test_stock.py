@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from graphene_django.utils.testing import GraphQLTestCase
+from inventory.models import Product, InventoryEntry, StockCheckpoint
+from inventory.stock import create_stock_checkpoints, current_stock_many
+
+
+class TestStockQueries(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+
+    def setUp(self):
+        self.p = Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        self.now = timezone.now()
+        for days_ago, delta in [(5, 100), (3, -10), (1, -5)]:
+            entry = InventoryEntry.objects.create(product=self.p, delta=delta)
+            InventoryEntry.objects.filter(pk=entry.pk).update(
+                created_at=self.now - timedelta(days=days_ago)
+            )
+
+    def stock_as_of(self, at):
+        q = """
+        query ($p: ID!, $at: DateTime!) { stockAsOf(productId: $p, at: $at) }
+        """
+        r = self.query(q, variables={"p": self.p.id, "at": at.isoformat()})
+        self.assertResponseNoErrors(r)
+        return r.json()["data"]["stockAsOf"]
+
+    def test_stock_as_of_from_ledger_and_checkpoints(self):
+        expected = {6: 0, 4: 100, 2: 90, 0: 85}
+        for days_ago, stock in expected.items():
+            assert self.stock_as_of(self.now - timedelta(days=days_ago)) == stock
+
+        assert create_stock_checkpoints(as_of=self.now - timedelta(days=4)) == 1
+        assert create_stock_checkpoints(as_of=self.now - timedelta(days=2)) == 1
+        assert StockCheckpoint.objects.get(as_of=self.now - timedelta(days=2)).quantity == 90
+        for days_ago, stock in expected.items():
+            assert self.stock_as_of(self.now - timedelta(days=days_ago)) == stock
+
+    def test_editing_history_invalidates_later_checkpoints(self):
+        create_stock_checkpoints(as_of=self.now - timedelta(days=2))
+        entry = InventoryEntry.objects.get(delta=-10)
+        entry.delta = -20
+        entry.save()
+        assert not StockCheckpoint.objects.exists()
+        assert self.stock_as_of(self.now) == 75
+
+    def test_stock_levels_by_ids_and_where(self):
+        other = Product.objects.create(name="Gadget", sku="G-1", price_cents=100, is_active=False)
+        InventoryEntry.objects.create(product=other, delta=7)
+        empty = Product.objects.create(name="Empty", sku="E-1", price_cents=100)
+
+        q = """
+        query ($ids: [ID!], $w: ProductWhereInput) {
+          stockLevels(productIds: $ids, where: $w) { productId stock }
+        }
+        """
+        r = self.query(q, variables={"ids": [self.p.id, other.id, empty.id]})
+        self.assertResponseNoErrors(r)
+        rows = r.json()["data"]["stockLevels"]
+        assert rows == [
+            {"productId": str(self.p.id), "stock": 85},
+            {"productId": str(other.id), "stock": 7},
+            {"productId": str(empty.id), "stock": 0},
+        ]
+
+        r = self.query(q, variables={"w": {"isActive": {"exact": False}}})
+        self.assertResponseNoErrors(r)
+        assert r.json()["data"]["stockLevels"] == [{"productId": str(other.id), "stock": 7}]
+
+    def test_current_stock_many_one_query_per_chunk(self):
+        products = [
+            Product.objects.create(name=f"P{i}", sku=f"P-{i}", price_cents=1) for i in range(5)
+        ]
+        for i, product in enumerate(products):
+            InventoryEntry.objects.create(product=product, delta=i)
+        ids = [p.id for p in products]
+        with self.assertNumQueries(1):
+            levels = current_stock_many(ids)
+        assert levels == {p.id: i for i, p in enumerate(products)}
+        with self.assertNumQueries(3):
+            assert current_stock_many(ids, chunk_size=2) == levels
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.test import TestCase
+from inventory import tasks
+from inventory.analytics import AnalyticsBuffer
+from inventory.models import AnalyticsEvent, Customer, Order
+
+
+class AnalyticsBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = AnalyticsBuffer(batch_size=3, flush_interval=None)
+
+    def test_events_are_written_in_batches(self):
+        self.buffer.append("A", {"n": 1})
+        self.buffer.append("A", {"n": 2})
+        assert not AnalyticsEvent.objects.exists()
+        with self.assertNumQueries(1):
+            self.buffer.append("A", {"n": 3})
+        assert list(AnalyticsEvent.objects.order_by("id").values_list("payload", flat=True)) == [
+            {"n": 1},
+            {"n": 2},
+            {"n": 3},
+        ]
+        self.buffer.append("B", {})
+        stats = self.buffer.stats()
+        assert (stats["depth"], stats["flushed"], stats["flushes"]) == (1, 3, 1)
+
+        # Shutdown writes the partial batch
+        self.buffer.close()
+        assert AnalyticsEvent.objects.filter(kind="B").exists()
+        assert self.buffer.stats()["depth"] == 0
+
+    def test_failed_flush_keeps_the_events_queued(self):
+        with (
+            mock.patch.object(
+                AnalyticsEvent.objects, "bulk_create", side_effect=RuntimeError("db down")
+            ),
+            self.assertLogs("inventory.analytics", "ERROR"),
+        ):
+            for n in range(3):
+                self.buffer.append("A", {"n": n})
+        assert self.buffer.stats()["depth"] == 3
+        assert self.buffer.stats()["failures"] == 1
+        assert self.buffer.flush() == 3
+        assert AnalyticsEvent.objects.count() == 3
+
+    def test_events_past_max_depth_are_dropped(self):
+        self.buffer.batch_size, self.buffer.max_depth = 10, 4
+        with self.assertLogs("inventory.analytics", "WARNING"):
+            self.buffer.extend(
+                [{"kind": "A", "payload": {"n": n}, "order_id": None} for n in range(3)]
+            )
+            self.buffer.extend(
+                [{"kind": "A", "payload": {"n": n}, "order_id": None} for n in range(3)]
+            )
+            self.buffer.append("A", {})
+        stats = self.buffer.stats()
+        assert (stats["depth"], stats["dropped"]) == (4, 3)
+
+    def test_background_flush_replaces_broken_connections(self):
+        self.buffer.append("A", {})
+        with (
+            mock.patch("inventory.analytics.close_old_connections") as close_old_connections,
+            mock.patch.object(
+                AnalyticsEvent.objects, "bulk_create", side_effect=RuntimeError("db down")
+            ),
+            self.assertLogs("inventory.analytics", "ERROR"),
+        ):
+            self.buffer._flush_in_background()
+        # Closed before and after, so the next flush reconnects
+        assert close_old_connections.call_count == 2
+        assert self.buffer.stats()["depth"] == 1
+
+    def test_order_analytics_task_uses_the_buffer(self):
+        customer = Customer.objects.create(email="a@example.com", full_name="A")
+        order = Order.objects.create(customer=customer)
+        with mock.patch.object(tasks, "analytics_buffer", self.buffer):
+            tasks.post_order_analytics_async(order.id)
+            assert not AnalyticsEvent.objects.exists()
+            tasks.flush_analytics_on_shutdown()
+        event = AnalyticsEvent.objects.get()
+        assert (event.kind, event.order_id, event.payload) == (
+            "ORDER_CREATED",
+            order.id,
+            {"total_cents": 0},
+        )
@@ -0,0 +1,73 @@
+from functools import partial
+from unittest import mock
+
+from django.test import TestCase
+from graphql import GraphQLError
+from inventory.models import Product, InventoryEntry
+from inventory.schemas.types import InventoryEntryNode
+from modules.graphene_custom.custom_connection_field import (
+    CustomDjangoConnectionField,
+    CustomDjangoConnectionFieldWithOutPagination,
+)
+
+
+class ConnectionFieldTests(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name="Widget", sku="W-1")
+        for delta in range(1, 6):
+            InventoryEntry.objects.create(product=product, delta=delta)
+        self.connection = InventoryEntryNode._meta.connection
+        self.entries = InventoryEntry.objects.order_by("delta")
+
+    def test_queryset_is_cut_to_the_page_before_evaluation(self):
+        with self.assertNumQueries(1):
+            conn = CustomDjangoConnectionField.resolve_connection(
+                self.connection, {"first": 2}, self.entries
+            )
+        assert [edge.node.delta for edge in conn.edges] == [1, 2]
+        assert conn.page_info.has_next_page
+
+        after = conn.page_info.end_cursor
+        conn = CustomDjangoConnectionField.resolve_connection(
+            self.connection, {"first": 2, "after": after}, self.entries
+        )
+        assert [edge.node.delta for edge in conn.edges] == [3, 4]
+
+        conn = CustomDjangoConnectionField.resolve_connection(
+            self.connection, {"last": 2}, self.entries
+        )
+        assert [edge.node.delta for edge in conn.edges] == [4, 5]
+        assert conn.page_info.has_previous_page and not conn.page_info.has_next_page
+
+    def test_without_pagination_enforces_hard_cap(self):
+        field = CustomDjangoConnectionFieldWithOutPagination
+        conn = field.resolve_connection(self.connection, {}, self.entries, max_rows=5)
+        assert [edge.node.delta for edge in conn.edges] == [1, 2, 3, 4, 5]
+        with self.assertRaises(GraphQLError):
+            field.resolve_connection(self.connection, {}, self.entries, max_rows=4)
+
+    def test_without_pagination_streams_rows(self):
+        field = CustomDjangoConnectionFieldWithOutPagination
+        conn = field.resolve_connection(
+            self.connection, {}, self.entries, max_rows=5, stream=True, chunk_size=2
+        )
+        assert [edge.node.delta for edge in conn.edges] == [1, 2, 3, 4, 5]
+        with self.assertRaises(GraphQLError):
+            field.resolve_connection(self.connection, {}, self.entries, max_rows=4, stream=True)
+
+    def test_without_pagination_field_resolves_relations_with_its_options(self):
+        def parent_resolver(related_field, parent, info, **kwargs):
+            pass
+
+        product = Product.objects.get()
+        field = CustomDjangoConnectionFieldWithOutPagination(InventoryEntryNode, max_rows=5)
+        resolve = field.wrap_resolve(partial(parent_resolver, "inventory_entries"))
+        with mock.patch.object(InventoryEntryNode, "batchread", return_value=self.entries) as read:
+            conn = resolve(product, None)
+            read.assert_called_once_with(product, None, related_field="inventory_entries")
+            assert conn.length == 5
+
+            field.max_rows = 4
+            resolve = field.wrap_resolve(partial(parent_resolver, "inventory_entries"))
+            with self.assertRaises(GraphQLError):
+                resolve(product, None)
@@ -0,0 +1,120 @@
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.core.management import call_command
+from django.db import connection
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from inventory.models import Customer, InventoryEntry, Order, OrderItem, Product
+from modules.graphene_custom.export import export_stream
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        self.other = Product.objects.create(name="Gadget", sku="G-1", price_cents=900)
+        for delta in (5, -2, 7):
+            InventoryEntry.objects.create(product=self.product, delta=delta, note=f"d{delta}")
+        InventoryEntry.objects.create(product=self.other, delta=3)
+
+    def lines(self, response):
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_ndjson_rows_filtered_with_where(self):
+        where = json.dumps({"product": {"sku": {"exact": "W-1"}}, "delta": {"gt": 0}})
+        r = self.client.get("/export/inventory-entries/", {"where": where})
+        assert r.status_code == 200
+        assert r["Content-Type"] == "application/x-ndjson"
+        rows = self.lines(r)
+        assert [(row["product_id"], row["delta"], row["note"]) for row in rows] == [
+            (self.product.id, 5, "d5"),
+            (self.product.id, 7, "d7"),
+        ]
+        assert set(rows[0]) == {"id", "created_at", "updated_at", "product_id", "delta", "note"}
+
+    def test_csv_gzip_with_order_by(self):
+        customer = Customer.objects.create(email="a@example.com", full_name="A")
+        order = Order.objects.create(customer=customer)
+        for quantity in range(1, 6):
+            OrderItem.objects.create(
+                order=order, product=self.other, quantity=quantity, unit_price_cents=100
+            )
+        r = self.client.get(
+            "/export/order-items/",
+            {"format": "csv", "orderBy": json.dumps({"quantity": "DESC"})},
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        assert r["Content-Encoding"] == "gzip"
+        chunks = list(r.streaming_content)
+        text = gzip.decompress(b"".join(chunks)).decode()
+        header, *rows = text.splitlines()
+        assert header.split(",")[-4:] == ["order_id", "product_id", "quantity", "unit_price_cents"]
+        assert [row.split(",")[-2] for row in rows] == ["5", "4", "3", "2", "1"]
+
+    def test_invalid_where_is_rejected(self):
+        r = self.client.get("/export/orders/", {"where": json.dumps({"nope": {"exact": 1}})})
+        assert r.status_code == 400
+        assert "nope" in r.json()["errors"][0]["message"]
+        assert self.client.get("/export/products-and-more/").status_code == 404
+
+    def test_export_token(self):
+        with self.settings(EXPORT_TOKEN="secret"):
+            assert self.client.get("/export/orders/").status_code == 401
+            r = self.client.get("/export/orders/", HTTP_AUTHORIZATION="Bearer secret")
+            assert r.status_code == 200
+
+    def test_management_command_writes_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "entries.ndjson.gz")
+            call_command(
+                "export_rows",
+                "inventory-entries",
+                "--gzip",
+                "--chunk-size=2",
+                "--where",
+                json.dumps({"delta": {"lt": 0}}),
+                output=path,
+                stdout=io.StringIO(),
+            )
+            with gzip.open(path) as f:
+                rows = [json.loads(line) for line in f]
+        assert [row["delta"] for row in rows] == [-2]
+
+
+class TestExportCursor(TransactionTestCase):
+    def test_rows_are_read_through_a_cursor_that_is_not_holdable(self):
+        product = Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        for delta in range(1, 6):
+            InventoryEntry.objects.create(product=product, delta=delta)
+        # Outside a transaction, as when the response is streamed after the view returned
+        assert connection.get_autocommit()
+        chunks = export_stream(InventoryEntry.objects.order_by("pk"), chunk_size=2)
+        next(chunks)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT is_holdable FROM pg_cursors")
+            assert cursor.fetchall() == [(False,)]
+        assert len(b"".join(chunks).splitlines()) == 3
+        assert connection.get_autocommit()
+
+
+class TestExportUrls(SimpleTestCase):
+    def test_urlconf_does_not_build_the_node_types(self):
+        script = (
+            "import sys, django; django.setup(); "
+            "from django.urls import get_resolver; get_resolver().url_patterns; "
+            "print('inventory.schemas.types' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings"},
+            text=True,
+        ).stdout
+        assert output.splitlines()[-1] == "False"
@@ -0,0 +1,267 @@
+import hashlib
+import threading
+from unittest import mock
+
+from config.schema import schema
+from django.core.cache import caches
+from django.db.models.deletion import Collector
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.testing import GraphQLTestCase
+from graphql.execution import ExecutionResult
+from inventory.models import AnalyticsEvent, Customer, InventoryEntry, Order, OutboxMessage, Product
+from modules.graphene_custom.custom_view import CustomGraphQLView
+from modules.graphene_custom.response_cache import ResponseCache
+from modules.graphene_custom.tracing import histograms
+
+
+class TestGraphQLView(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+    QUERY = "{ products { sku } }"
+
+    def setUp(self):
+        Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        CustomGraphQLView.document_cache.clear()
+        caches["persisted_queries"].clear()
+        caches["graphql_responses"].clear()
+
+    def _persisted(self, query=None, sha=None):
+        extensions = {
+            "persistedQuery": {
+                "version": 1,
+                "sha256Hash": sha or hashlib.sha256((query or self.QUERY).encode()).hexdigest(),
+            }
+        }
+        body = {"extensions": extensions}
+        if query:
+            body["query"] = query
+        return self.client.post(self.GRAPHQL_URL, body, content_type="application/json")
+
+    def test_documents_are_parsed_and_validated_once(self):
+        for _ in range(3):
+            self.assertResponseNoErrors(self.query(self.QUERY))
+        info = CustomGraphQLView.document_cache.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+
+        r = self.query("{ products { nope } }")
+        assert "nope" in r.json()["errors"][0]["message"]
+        r = self.query("{ products { nope } }")
+        assert "nope" in r.json()["errors"][0]["message"]
+        assert CustomGraphQLView.document_cache.cache_info().hits == 3
+
+    def test_document_cache_is_bounded(self):
+        cache = CustomGraphQLView.document_cache
+        maxsize, cache.maxsize = cache.maxsize, 2
+        try:
+            for field in ("sku", "name", "priceCents", "sku"):
+                self.assertResponseNoErrors(self.query(f"{{ products {{ {field} }} }}"))
+            info = cache.cache_info()
+            assert (info.hits, info.misses, info.currsize) == (0, 4, 2)
+        finally:
+            cache.maxsize = maxsize
+
+    def test_persisted_query_round_trip(self):
+        r = self._persisted()
+        assert r.json()["errors"][0]["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+
+        self.assertResponseNoErrors(self._persisted(self.QUERY))
+        r = self._persisted()
+        self.assertResponseNoErrors(r)
+        assert r.json()["data"]["products"] == [{"sku": "W-1"}]
+
+        # GET with the hash only, as CDNs cache it
+        r = self.client.get(
+            self.GRAPHQL_URL,
+            {
+                "extensions": (
+                    '{"persistedQuery": {"version": 1, "sha256Hash": "%s"}}'
+                    % hashlib.sha256(self.QUERY.encode()).hexdigest()
+                )
+            },
+            HTTP_ACCEPT="application/json",
+        )
+        assert r.json()["data"]["products"] == [{"sku": "W-1"}]
+
+    def test_persisted_query_hash_must_match(self):
+        r = self._persisted(self.QUERY, sha="0" * 64)
+        assert r.json()["errors"][0]["message"] == "Provided sha does not match query"
+
+    def test_query_cost_is_reported(self):
+        r = self.query("{ products(first: 10) { sku stock } }")
+        self.assertResponseNoErrors(r)
+        # 1 for the list + 10 rows x stock weight
+        assert r.json()["extensions"]["cost"] == {"requested": 11, "depth": 2}
+
+    def test_nested_lists_multiply_cost(self):
+        q = """
+        {
+          customers {
+            orders(first: 50) {
+              edges { node { items { edges { node { product { sku } } } } } }
+            }
+          }
+        }
+        """
+        r = self.query(q)
+        error = r.json()["errors"][0]
+        assert r.status_code == 400
+        assert error["extensions"]["code"] == "QUERY_TOO_COMPLEX"
+        # customers (100) x orders (50) x items (100, the connection max limit) x product
+        assert error["extensions"]["cost"] == 1 + 100 * (1 + 50 * (2 + 1 * (1 + 100 * 3)))
+
+        r = self.query(q.replace("customers", "customers(first: 1)"))
+        self.assertResponseNoErrors(r)
+
+    def test_cost_without_a_connection_limit(self):
+        q = "{ customers(first: 2) { orders(first: 3) { edges { node { id } } } } }"
+        with mock.patch.object(graphene_settings, "RELAY_CONNECTION_MAX_LIMIT", None):
+            r = self.query(q)
+            self.assertResponseNoErrors(r)
+            # customers (2) x orders (3 requested) x node
+            assert r.json()["extensions"]["cost"]["requested"] == 1 + 2 * (1 + 3 * 2)
+
+            r = self.query(q.replace("orders(first: 3)", "orders"))
+            self.assertResponseNoErrors(r)
+            assert r.json()["extensions"]["cost"]["requested"] == 1 + 2 * (1 + 100 * 2)
+
+    def test_negative_limits_are_rejected(self):
+        r = self.query("{ customers { orders(last: -5) { edges { node { id } } } } }")
+        assert r.status_code == 400
+        assert r.json()["errors"][0]["extensions"] == {
+            "code": "INVALID_LIMIT",
+            "field": "orders",
+            "argument": "last",
+        }
+
+        # Executed without the view's cost check, the list field itself refuses it
+        result = schema.execute("{ products(first: -1) { sku } }")
+        assert result.errors[0].message == 'Argument "first" must not be negative.'
+
+    def test_query_depth_limit(self):
+        with self.settings(GRAPHQL_MAX_QUERY_DEPTH=3):
+            r = self.query("{ orderItems(first: 1) { order { customer { email } } } }")
+        error = r.json()["errors"][0]
+        assert error["extensions"] == {"code": "QUERY_TOO_DEEP", "depth": 4, "maxDepth": 3}
+
+    def test_query_responses_are_cached_until_a_model_write(self):
+        q = "{ products { sku stock } }"
+        r = self.query(q)
+        assert r.json()["extensions"]["cache"] == {"hit": False, "ttl": 60}
+        with self.assertNumQueries(0):
+            r = self.query(q)
+        assert r.json()["extensions"]["cache"]["hit"] is True
+        assert r.json()["data"]["products"] == [{"sku": "W-1", "stock": 0}]
+
+        # The stock balance is updated in SQL by the ledger write
+        InventoryEntry.objects.create(product=Product.objects.get(), delta=4)
+        r = self.query(q)
+        assert r.json()["extensions"]["cache"]["hit"] is False
+        assert r.json()["data"]["products"] == [{"sku": "W-1", "stock": 4}]
+
+        # Variables and the timezone cookie are part of the key
+        self.client.cookies["timezone"] = "330"
+        assert self.query(q).json()["extensions"]["cache"]["hit"] is False
+
+    def test_mutations_invalidate_cached_responses(self):
+        self.assertResponseNoErrors(self.query(self.QUERY))
+        r = self.query(
+            """
+            mutation {
+              productUpdate(where: {sku: {exact: "W-1"}}, input: {sku: "W-2"}) { ok }
+            }
+            """
+        )
+        self.assertResponseNoErrors(r)
+        assert "cache" not in r.json()["extensions"]
+        r = self.query(self.QUERY)
+        assert r.json()["data"]["products"] == [{"sku": "W-2"}]
+
+    def test_bulk_mutations_invalidate_derived_models(self):
+        InventoryEntry.objects.create(product=Product.objects.get(), delta=10)
+        order = Order.objects.create(customer=Customer.objects.create(email="c@example.com"))
+        q = "{ products { stock } orders { totalCents } }"
+        assert self.query(q).json()["data"] == {
+            "products": [{"stock": 10}],
+            "orders": [{"totalCents": 0}],
+        }
+        assert self.query(q).json()["extensions"]["cache"]["hit"] is True
+
+        # Stock and order totals are written with bulk_create and queryset updates
+        item = {
+            "quantity": 3,
+            "unitPriceCents": 100,
+            "product": {"connect": {"sku": {"exact": "W-1"}}},
+            "order": {"connect": {"id": {"exact": order.id}}},
+        }
+        r = self.query(
+            """
+            mutation ($input: [OrderItemCreateInput!]!) {
+              orderItemCreateMany(input: $input) { ok }
+            }
+            """,
+            variables={"input": [item]},
+        )
+        self.assertResponseNoErrors(r)
+        r = self.query(q)
+        assert r.json()["extensions"]["cache"]["hit"] is False
+        assert r.json()["data"] == {"products": [{"stock": 7}], "orders": [{"totalCents": 300}]}
+
+    def test_invalidation_keeps_fast_deletes_of_other_models(self):
+        collector = Collector(using="default")
+        for model in (AnalyticsEvent, OutboxMessage):
+            assert collector.can_fast_delete(model.objects.all())
+
+    def test_untracked_fields_are_not_cached(self):
+        r = self.query("{ stockLevels { productId stock } }")
+        self.assertResponseNoErrors(r)
+        assert "cache" not in r.json()["extensions"]
+
+    def test_concurrent_misses_wait_for_the_first_request(self):
+        cache = caches["graphql_responses"]
+        responses = ResponseCache(lock_wait=2.0, poll_interval=0.01)
+        cache.add("gqlresp:test:lock", 1)
+        filler = threading.Timer(0.05, cache.set, ("gqlresp:test", {"products": []}))
+        filler.start()
+
+        def execute():
+            raise AssertionError("executed while another request fills the entry")
+
+        result, hit = responses.get_or_execute("gqlresp:test", 60, execute)
+        filler.join()
+        assert hit and result.data == {"products": []}
+
+        # Without a holder of the lock the query runs once and fills the entry
+        result, hit = responses.get_or_execute(
+            "gqlresp:other", 60, lambda: ExecutionResult(data={"products": []})
+        )
+        assert not hit and cache.get("gqlresp:other") == {"products": []}
+
+    def test_tracing_extension_requires_the_trace_token(self):
+        Product.objects.create(name="Gadget", sku="G-1", price_cents=900)
+        histograms.reset()
+        q = "{ products { sku stock } }"
+        with self.settings(GRAPHQL_TRACING_TOKEN="trace-me"):
+            r = self.query(q, headers={"HTTP_X_GRAPHQL_TRACE": "wrong"})
+            assert "tracing" not in r.json()["extensions"]
+            caches["graphql_responses"].clear()
+            CustomGraphQLView.document_cache.clear()
+            r = self.query(q, headers={"HTTP_X_GRAPHQL_TRACE": "trace-me"})
+        self.assertResponseNoErrors(r)
+        tracing = r.json()["extensions"]["tracing"]
+        assert {"parsing", "validation", "execution"} <= set(tracing["phases"])
+        fields = {field["path"]: field for field in tracing["fields"]}
+        assert fields["products"]["resolver"] == "Query.products"
+        assert fields["products.sku"]["count"] == 2
+        # stock is joined by the list query, which is the only SQL sent
+        assert fields["products.stock"]["sqlCount"] == 0
+        assert fields["products"]["sqlCount"] == tracing["sql"]["count"] == 1
+        assert "Query.products" in {hot["resolver"] for hot in tracing["hotResolvers"]}
+
+    def test_tracing_feeds_histograms_without_exposing_them(self):
+        histograms.reset()
+        with self.settings(GRAPHQL_TRACING=True):
+            r = self.query(self.QUERY)
+        assert "tracing" not in r.json()["extensions"]
+        stats = histograms.snapshot()
+        assert stats["Query.products"]["count"] == 1
+        assert stats["ProductType.sku"]["calls"] == 1
+        assert sum(stats["ProductType.sku"]["buckets"].values()) == 1
@@ -1,5 +1,8 @@
+from io import StringIO
+from django.core.management import CommandError, call_command
 from django.test import TestCase
-from inventory.models import Product, InventoryEntry, Customer, Order, OrderItem
+from inventory.models import Product, InventoryEntry, Customer, Order, OrderItem, StockBalance
+from inventory.stock import current_stock
 
 
 class ModelTests(TestCase):
@@ -17,3 +20,61 @@ class ModelTests(TestCase):
         self.assertEqual(order.total_cents, 1000)
         stock = sum(e.delta for e in self.product.inventory_entries.all())
         self.assertEqual(stock, 8)
+
+    def test_stock_balance_follows_ledger_writes(self):
+        entry = InventoryEntry.objects.create(product=self.product, delta=10, note="Initial")
+        InventoryEntry.objects.create(product=self.product, delta=-3, note="Order")
+        self.assertEqual(current_stock(self.product.id), 7)
+
+        entry.delta = 12
+        entry.save()
+        self.assertEqual(current_stock(self.product.id), 9)
+
+        other = Product.objects.create(name="Gadget", sku="G-001", price_cents=100)
+        entry.product = other
+        entry.save()
+        self.assertEqual(current_stock(self.product.id), -3)
+        self.assertEqual(current_stock(other.id), 12)
+
+        entry.delete()
+        self.assertEqual(current_stock(other.id), 0)
+
+    def test_rebuild_stock_balances_repairs_drift(self):
+        InventoryEntry.objects.create(product=self.product, delta=10, note="Initial")
+        StockBalance.objects.filter(product=self.product).update(quantity=99)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_stock_balances", verify=True, stdout=StringIO())
+        call_command("rebuild_stock_balances", stdout=StringIO())
+        self.assertEqual(current_stock(self.product.id), 10)
+        call_command("rebuild_stock_balances", verify=True, stdout=StringIO())
+
+    def test_order_total_follows_item_writes(self):
+        c = Customer.objects.create(email="c@example.com", full_name="C")
+        order = Order.objects.create(customer=c)
+        item = OrderItem.objects.create(
+            order=order, product=self.product, quantity=2, unit_price_cents=500
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=1, unit_price_cents=300
+        )
+        self.assertEqual(order.total_cents, 1300)
+
+        item.quantity = 4
+        item.save()
+        self.assertEqual(Order.objects.get(pk=order.pk).total_cents, 2300)
+
+        item.delete()
+        self.assertEqual(Order.objects.get(pk=order.pk).total_cents, 300)
+
+    def test_saving_a_stale_order_keeps_its_total(self):
+        c = Customer.objects.create(email="c@example.com", full_name="C")
+        Order.objects.create(customer=c)
+        stale = Order.objects.get()
+        OrderItem.objects.create(
+            order=Order.objects.get(), product=self.product, quantity=3, unit_price_cents=100
+        )
+        stale.status = "PAID"
+        stale.save()
+        order = Order.objects.get()
+        self.assertEqual(order.status, "PAID")
+        self.assertEqual(order.total_cents, 300)
@@ -0,0 +1,103 @@
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from inventory import outbox
+from inventory.models import (
+    AnalyticsEvent,
+    Customer,
+    InventoryEntry,
+    Order,
+    OrderItem,
+    OutboxMessage,
+    PendingRecalculation,
+    Product,
+)
+from inventory.outbox import relay_batch, relay_outbox
+from inventory.tasks import drain_recalculations_async
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(drain_recalculations_async, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.customer = Customer.objects.create(email="a@example.com", full_name="A")
+        self.products = [
+            Product.objects.create(name=f"P{i}", sku=f"P-{i}", price_cents=100) for i in range(3)
+        ]
+
+    def test_messages_are_written_in_the_write_transaction(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Order.objects.create(customer=self.customer)
+            InventoryEntry.objects.create(product=self.products[0], delta=5)
+            raise RuntimeError
+        assert not OutboxMessage.objects.exists()
+
+        order = Order.objects.create(customer=self.customer)
+        InventoryEntry.objects.create(product=self.products[0], delta=5)
+        assert list(OutboxMessage.objects.order_by("id").values_list("topic", "payload")) == [
+            ("order.created", {"order_id": order.id}),
+            ("stock.changed", {"product_ids": [self.products[0].id]}),
+        ]
+
+    def test_relay_dispatches_each_topic_in_one_batch(self):
+        orders = [Order.objects.create(customer=self.customer) for _ in range(5)]
+        OrderItem.objects.create(order=orders[0], product=self.products[0], unit_price_cents=250)
+        for product in self.products * 10:
+            InventoryEntry.objects.create(product=product, delta=1)
+        assert OutboxMessage.objects.count() == 35
+
+        with (
+            self.captureOnCommitCallbacks(execute=True),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            assert relay_outbox() == 35
+        assert "FOR UPDATE SKIP LOCKED" in queries[1]["sql"]
+        # savepoint, claim, per topic: savepoint, handler queries, release, delete; release.
+        # The recalculation enqueue runs on commit.
+        assert len(queries) == 11
+        assert not OutboxMessage.objects.exists()
+        assert list(
+            AnalyticsEvent.objects.filter(kind="ORDER_CREATED")
+            .order_by("order_id")
+            .values_list("order_id", "payload")
+        ) == [(order.id, {"total_cents": 250 if order == orders[0] else 0}) for order in orders]
+        assert PendingRecalculation.objects.count() == 3
+        self.apply_async.assert_called_once()
+
+    def test_failing_topic_is_retried_with_backoff(self):
+        Order.objects.create(customer=self.customer)
+        InventoryEntry.objects.create(product=self.products[0], delta=1)
+        failing = mock.Mock(side_effect=ValueError("boom"))
+        with mock.patch.dict(outbox.HANDLERS, {"order.created": failing}):
+            with self.assertLogs("inventory.outbox", "ERROR"):
+                assert relay_batch() == 2
+            # The other topic went through; the failed message waits for its backoff
+            message = OutboxMessage.objects.get()
+            assert (message.topic, message.attempts, message.last_error) == (
+                "order.created",
+                1,
+                "ValueError('boom')",
+            )
+            assert message.available_at > datetime.now()
+            assert relay_batch() == 0
+
+            OutboxMessage.objects.update(available_at=datetime(2001, 1, 1), attempts=9)
+            with self.assertLogs("inventory.outbox", "ERROR"):
+                relay_batch()
+            assert relay_batch() == 0
+            assert outbox.outbox_stats()["failed"] == 1
+
+    def test_relay_command_once(self):
+        Order.objects.create(customer=self.customer)
+        out = StringIO()
+        call_command("relay_outbox", "--once", stdout=out)
+        assert out.getvalue().startswith("Relayed 1 message(s)")
+        assert AnalyticsEvent.objects.filter(kind="ORDER_CREATED").count() == 1
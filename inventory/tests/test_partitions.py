@@ -0,0 +1,92 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from graphene_django.utils.testing import GraphQLTestCase
+from inventory.models import AnalyticsEvent, InventoryEntry, Product, StockBalance
+from inventory.partitions import add_months, month_start, partition_name, partitions
+
+ENTRIES = "inventory_inventoryentry"
+EVENTS = "inventory_analyticsevent"
+
+
+def rows_in(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {connection.ops.quote_name(table)}")
+        return cursor.fetchone()[0]
+
+
+class PartitionTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        self.month = month_start(datetime.date.today())
+
+    def backdate(self, model, pk, when):
+        model.objects.filter(pk=pk).update(created_at=when)
+
+    def test_rows_are_routed_to_their_month(self):
+        entry = InventoryEntry.objects.create(product=self.product, delta=5)
+        assert rows_in(partition_name(ENTRIES, self.month)) == 1
+        assert set(partitions(ENTRIES)) >= {add_months(self.month, n) for n in range(4)}
+
+        # Moving created_at moves the row, and the ORM still finds it by id
+        self.backdate(InventoryEntry, entry.pk, datetime.datetime(2001, 2, 3))
+        assert rows_in(f"{ENTRIES}_default") == 1
+        entry.refresh_from_db()
+        entry.delta = 7
+        entry.save()
+        assert StockBalance.objects.get(product=self.product).quantity == 7
+        entry.delete()
+        assert not InventoryEntry.objects.exists()
+
+    def test_created_at_ranges_are_pruned(self):
+        InventoryEntry.objects.create(product=self.product, delta=5)
+        start = datetime.datetime.combine(self.month, datetime.time.min)
+        plan = InventoryEntry.objects.filter(
+            created_at__gte=start, created_at__lt=add_months(self.month, 1)
+        ).explain()
+        assert partition_name(ENTRIES, self.month) in plan
+        assert partition_name(ENTRIES, add_months(self.month, 1)) not in plan
+        assert f"{ENTRIES}_default" not in plan
+
+    def test_maintenance_creates_partitions_and_expires_events(self):
+        old = AnalyticsEvent.objects.create(kind="OLD")
+        self.backdate(AnalyticsEvent, old.pk, datetime.datetime(2001, 2, 3))
+        AnalyticsEvent.objects.create(kind="NEW")
+        entry = InventoryEntry.objects.create(product=self.product, delta=5)
+        self.backdate(InventoryEntry, entry.pk, datetime.datetime(2001, 2, 3))
+
+        out = StringIO()
+        call_command("maintain_partitions", "--ahead", "5", "--retention", "12", stdout=out)
+        output = out.getvalue()
+        # The rows written to the default partition get a partition of their own...
+        assert f"created {partition_name(ENTRIES, datetime.date(2001, 2, 1))}" in output
+        assert f"created {partition_name(EVENTS, add_months(self.month, 5))}" in output
+        assert rows_in(f"{ENTRIES}_default") == rows_in(f"{EVENTS}_default") == 0
+        # ...and the expired analytics month is dropped, never the ledger
+        assert f"dropped {partition_name(EVENTS, datetime.date(2001, 2, 1))}" in output
+        assert list(AnalyticsEvent.objects.values_list("kind", flat=True)) == ["NEW"]
+        assert InventoryEntry.objects.filter(pk=entry.pk).exists()
+
+        call_command("maintain_partitions", "--ahead", "5", "--retention", "12", stdout=out)
+        assert out.getvalue().endswith("0 partition(s) created, 0 expired.\n")
+
+
+class PartitionedQueryTests(GraphQLTestCase):
+    GRAPHQL_URL = "/graphql/"
+
+    def test_created_at_filter_across_partitions(self):
+        product = Product.objects.create(name="Widget", sku="W-1", price_cents=500)
+        for when, delta in [(datetime.datetime(2001, 2, 3), 1), (datetime.datetime.now(), 2)]:
+            entry = InventoryEntry.objects.create(product=product, delta=delta)
+            InventoryEntry.objects.filter(pk=entry.pk).update(created_at=when)
+        q = """
+        query ($c: DatetimeFilter) {
+          inventoryEntries(where: {createdAt: $c}, orderBy: {createdAt: ASC}) { delta }
+        }
+        """
+        r = self.query(q, variables={"c": {"gte": "2001-01-01", "lt": "2001-03-01"}})
+        self.assertResponseNoErrors(r)
+        assert r.json()["data"]["inventoryEntries"] == [{"delta": 1}]
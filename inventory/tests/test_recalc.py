@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from inventory.models import AnalyticsEvent, InventoryEntry, PendingRecalculation, Product
+from inventory.recalc import drain_recalculations, request_recalculation
+from inventory.tasks import drain_recalculations_async, recalc_inventory_async
+
+
+class RecalculationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(drain_recalculations_async, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.products = [
+            Product.objects.create(name=f"P{i}", sku=f"P-{i}", price_cents=100) for i in range(3)
+        ]
+        for product, delta in zip(self.products, (5, 7, 0)):
+            InventoryEntry.objects.create(product=product, delta=delta)
+            InventoryEntry.objects.create(product=product, delta=-1)
+
+    def test_requests_coalesce_into_one_debounced_drain(self):
+        first, second, _ = self.products
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(100):
+                request_recalculation([first.id, second.id, first.id])
+            recalc_inventory_async(second.id)
+        assert PendingRecalculation.objects.count() == 2
+        self.apply_async.assert_called_once_with(countdown=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            request_recalculation([first.id])
+        assert self.apply_async.call_count == 1
+
+    def test_drain_recomputes_each_product_once_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            request_recalculation(product.id for product in self.products)
+        # per batch: savepoint, pop, aggregate, insert and release, then the empty pop
+        with self.assertNumQueries(2 * 5 + 3):
+            assert drain_recalculations(batch_size=2) == 3
+        events = AnalyticsEvent.objects.filter(kind="RECALC_PRODUCT").order_by("id")
+        assert [event.payload for event in events] == [
+            {"product_id": product.id, "stock": stock}
+            for product, stock in zip(self.products, (4, 6, -1))
+        ]
+        assert not PendingRecalculation.objects.exists()
+        assert drain_recalculations() == 0
@@ -0,0 +1,65 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from inventory import tasks
+from inventory.models import AnalyticsEvent, InventoryEntry, Product, StockBalance
+from inventory.reconcile import product_id_chunks, reconcile_chunk, reconcile_stock
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f"P{i}", sku=f"P-{i}", price_cents=100) for i in range(7)
+        ]
+        for product in self.products:
+            InventoryEntry.objects.create(product=product, delta=10)
+            InventoryEntry.objects.create(product=product, delta=-3)
+        # Drift a queryset write would leave behind
+        StockBalance.objects.filter(product=self.products[2]).update(quantity=5)
+        StockBalance.objects.filter(product=self.products[6]).delete()
+
+    def test_chunks_cover_the_id_space(self):
+        first, last = self.products[0].id, self.products[-1].id
+        chunks = product_id_chunks(3)
+        assert chunks == [(first, first + 2), (first + 3, first + 5), (first + 6, last)]
+
+    def test_each_chunk_is_one_grouped_aggregate(self):
+        first = self.products[0].id
+        with self.assertNumQueries(5):  # savepoint, products, ledger, balances, release
+            result = reconcile_chunk(first, first + 2)
+        assert (result["products"], result["entries"]) == (3, 6)
+        assert result["drift"] == [[self.products[2].id, 5, 7]]
+
+    def test_reconcile_records_a_summary(self):
+        progress = mock.Mock()
+        summary = reconcile_stock(chunk_size=3, workers=1, local=True, progress=progress)
+        assert progress.call_count == 3
+        assert progress.call_args.args[:3] == (3, 3, 14)
+        assert (summary["chunks"], summary["products"], summary["entries"]) == (3, 7, 14)
+        assert summary["drift"] == [[self.products[2].id, 5, 7], [self.products[6].id, None, 7]]
+        event = AnalyticsEvent.objects.get(kind="STOCK_RECONCILED")
+        assert event.payload["drift_count"] == 2
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True, RECONCILE_WORKERS=1)
+    def test_command_reports_progress_and_drift(self):
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("reconcile_stock", "--chunk-size", "4", "--check", stdout=out)
+        output = out.getvalue()
+        assert "2/2 chunks, 14 ledger rows" in output
+        assert f"Product {self.products[2].id}: balance 5 != ledger 7" in output
+
+        call_command("rebuild_stock_balances", stdout=out)
+        call_command("reconcile_stock", "--check", stdout=out)
+        assert "7 products, 14 ledger rows" in out.getvalue()
+
+    def test_task_fans_out_a_chord(self):
+        with mock.patch.object(tasks, "chord") as chord:
+            tasks.reconcile_stock_async(chunk_size=5)
+        header = list(chord.call_args.args[0])
+        assert [signature.args for signature in header] == [
+            (self.products[0].id, self.products[0].id + 4),
+            (self.products[0].id + 5, self.products[-1].id),
+        ]
@@ -0,0 +1,58 @@
+from datetime import datetime
+from unittest import mock
+
+import pytz
+from django.test import RequestFactory, SimpleTestCase
+from inventory.management.commands.benchmark_timezones import scan_offset_to_timezone
+from modules.shared import utils
+
+
+class TimezoneIndexTests(SimpleTestCase):
+    def test_index_matches_full_scan(self):
+        for offset in (0, -300, -240, 60, 330, 345, -210, 840, 17):
+            assert utils.convert_offset_to_timezone(offset) == scan_offset_to_timezone(offset)
+
+    def test_index_is_rebuilt_after_dst_transition(self):
+        winter = pytz.utc.localize(datetime(2030, 1, 15, 12))
+        summer = pytz.utc.localize(datetime(2030, 7, 15, 12))
+        with mock.patch.dict(utils._offset_index, {"zones": None, "expires_at": None}):
+            zones = utils.timezone_offset_index(winter)
+            expires_at = utils._offset_index["expires_at"]
+            assert winter.replace(tzinfo=None) < expires_at < summer.replace(tzinfo=None)
+            assert utils.timezone_offset_index(winter) is zones
+
+            summer_zones = utils.timezone_offset_index(summer)
+            assert summer_zones is not zones
+            # Offsets only used during northern summer time, e.g. UTC+1 for London
+            assert set(summer_zones.values()) != set(zones.values())
+
+    def test_zones_are_loaded_only_up_to_the_requested_offset(self):
+        with mock.patch.dict(utils._offset_index, {"zones": None, "expires_at": None}):
+            assert utils.convert_offset_to_timezone(0) == pytz.all_timezones[0]
+            assert utils._offset_index["scanned"] == 1
+            utils.convert_offset_to_timezone(330)
+            scanned = utils._offset_index["scanned"]
+            assert scanned < len(pytz.all_timezones)
+            utils.convert_offset_to_timezone(330)
+            assert utils._offset_index["scanned"] == scanned
+            # An offset no zone uses reads them all once
+            assert utils.convert_offset_to_timezone(17) == utils.DEFAULT_TIMEZONE
+            assert utils._offset_index["scanned"] == len(pytz.all_timezones)
+
+    def test_request_timezone_is_memoized(self):
+        request = RequestFactory().get("/graphql/")
+        request.COOKIES["timezone"] = "330"
+        with mock.patch.object(
+            utils, "convert_offset_to_timezone", wraps=utils.convert_offset_to_timezone
+        ) as convert:
+            assert utils.request_timezone(request) == utils.request_timezone(request)
+        assert convert.call_count == 1
+
+    def test_db_now_matches_the_stored_form(self):
+        with self.settings(USE_TZ=False):
+            assert utils.db_now().tzinfo is None
+        with self.settings(USE_TZ=True):
+            assert utils.db_now().tzinfo is not None
+        aware = pytz.utc.localize(datetime(2030, 1, 15, 12))
+        with self.settings(USE_TZ=True):
+            assert utils.as_db_datetime(aware) is aware
@@ -0,0 +1,144 @@
+from collections import defaultdict
+
+import graphene
+from django.core.exceptions import (
+    NON_FIELD_ERRORS,
+    FieldDoesNotExist,
+    MultipleObjectsReturned,
+    ObjectDoesNotExist,
+    ValidationError,
+)
+from graphene_django_crud.utils import error_data_from_validation_error, where_input_to_Q
+
+
+class BulkErrorType(graphene.ObjectType):
+    index = graphene.Int(required=True, description="Position of the row in `input`")
+    field = graphene.String(required=True)
+    messages = graphene.List(graphene.NonNull(graphene.String), required=True)
+
+
+def row_errors(index, error):
+    """BulkErrorType dicts for the ValidationError of the row at `index`."""
+    if not hasattr(error, "error_dict"):
+        error = ValidationError({NON_FIELD_ERRORS: error.error_list})
+    return [{"index": index, **data} for data in error_data_from_validation_error(error)]
+
+
+_types = {}
+
+
+def bulk_payload_type(django_type, operation_flag):
+    name = f"{django_type._meta.model.__name__}{operation_flag.capitalize()}ManyPayload"
+    if name not in _types:
+        _types[name] = type(
+            name,
+            (graphene.ObjectType,),
+            {
+                "ok": graphene.Boolean(description="True when every row was written"),
+                "errors": graphene.List(
+                    graphene.NonNull(BulkErrorType), description="Errors of the rejected rows"
+                ),
+                "results": graphene.List(django_type, description="Written rows, in input order"),
+            },
+        )
+    return _types[name]
+
+
+def bulk_update_input_type(django_type, where_type, update_type):
+    name = f"{django_type._meta.model.__name__}UpdateManyInput"
+    if name not in _types:
+        _types[name] = type(
+            name,
+            (graphene.InputObjectType,),
+            {
+                "where": graphene.Field(where_type, required=True),
+                "input": graphene.Field(update_type, required=True),
+            },
+        )
+    return _types[name]
+
+
+def unique_exact_lookup(model, where):
+    """
+    (field, value) when `where` is an exact match on one unique column, such as
+    {"id": {"exact": 1}} or {"sku": {"exact": "A-1"}}, so many of them can be
+    fetched with a single IN query.
+    """
+    if len(where) != 1:
+        return None
+    ((name, condition),) = where.items()
+    if not isinstance(condition, dict) or list(condition) != ["exact"]:
+        return None
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if field.is_relation or not (field.primary_key or field.unique):
+        return None
+    try:
+        return field, field.to_python(condition["exact"])
+    except ValidationError:
+        return None
+
+
+def resolve_wheres(queryset, wheres):
+    """
+    The single row of `queryset` matched by each where input, or a ValidationError
+    when there is none or more than one. Exact lookups on unique columns are
+    fetched together, one query per column.
+    """
+    model = queryset.model
+    results = [None] * len(wheres)
+    batches = defaultdict(lambda: defaultdict(list))
+    for position, where in enumerate(wheres):
+        lookup = unique_exact_lookup(model, where)
+        if lookup is not None:
+            field, value = lookup
+            batches[field][value].append(position)
+            continue
+        try:
+            results[position] = queryset.filter(where_input_to_Q(where)).distinct().get()
+        except (ObjectDoesNotExist, MultipleObjectsReturned) as e:
+            results[position] = ValidationError(str(e))
+    for field, positions in batches.items():
+        found = queryset.in_bulk(list(positions), field_name=field.name)
+        for value, value_positions in positions.items():
+            for position in value_positions:
+                results[position] = found.get(value) or ValidationError(
+                    f"{model._meta.object_name} matching query does not exist."
+                )
+    return results
+
+
+def unique_errors(model, instances):
+    """
+    ValidationErrors, keyed like `instances`, for single column unique values taken
+    by another row in the database or repeated within the batch. One query per
+    unique column instead of one per row.
+    """
+    errors = {}
+    for field in model._meta.fields:
+        if not field.unique or field.primary_key:
+            continue
+        positions = defaultdict(list)
+        for position, instance in instances.items():
+            value = getattr(instance, field.attname)
+            if value is not None:
+                positions[value].append(position)
+        if not positions:
+            continue
+        taken = set(
+            model._default_manager.filter(**{f"{field.attname}__in": list(positions)})
+            .exclude(pk__in=[instance.pk for instance in instances.values() if instance.pk])
+            .values_list(field.attname, flat=True)
+        )
+        for value, value_positions in positions.items():
+            duplicates = value_positions if value in taken else value_positions[1:]
+            for position in duplicates:
+                instance = instances[position]
+                errors[position] = instance.unique_error_message(model, [field.name])
+    return {
+        position: ValidationError({field: [error]})
+        for position, error in errors.items()
+        for field in error.params["unique_check"]
+    }
@@ -1,24 +1,50 @@
 from functools import partial
+
 from django.db.models.query import QuerySet
 from graphene.relay.connection import connection_adapter, page_info_adapter
 from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
 from graphql_relay.connection.array_connection import connection_from_array_slice
-from graphene_django_crud.fields import DjangoConnectionField
+from graphene_django_crud.fields import DjangoConnectionField, related_batchread
+
+from modules.graphene_custom.keyset import (
+    CURSOR_FIELD,
+    page_size,
+    paginate_keyset,
+    row_cursor,
+    window_bounds,
+    window_queryset,
+)
+
+
+def is_unevaluated(iterable):
+    return isinstance(iterable, QuerySet) and iterable._result_cache is None
 
 
 class CustomDjangoConnectionField(DjangoConnectionField):
-    """Calculates total length and preserves iterable on connection for totalCount."""
+    """
+    Builds connection pages from keyset windows: rows arrive already cut to the
+    requested page (see keyset.window_queryset), and plain querysets returned by a
+    resolver are cut in SQL here, so a page never loads the whole relation.
+    """
 
     @classmethod
     def resolve_connection(cls, connection, args, iterable, max_limit=None):
         iterable = maybe_queryset(iterable)
-        if isinstance(iterable, QuerySet):
-            list_length = iterable.count()
-        else:
-            list_length = len(iterable)
+        if is_unevaluated(iterable) and not iterable.query.is_sliced:
+            page = paginate_keyset(iterable, after=args.get("after"), before=args.get("before"))
+            rows = list(window_queryset(page, args, max_limit))
+            return cls.resolve_keyset_connection(connection, args, iterable, rows, max_limit)
+
+        rows = list(iterable)
+        if rows and hasattr(rows[0], CURSOR_FIELD):
+            return cls.resolve_keyset_connection(connection, args, iterable, rows, max_limit)
+
+        # The rows are loaded anyway, so their length is the total without a COUNT(*)
+        list_length = len(rows)
 
         conn = connection_from_array_slice(
-            iterable[:],
+            rows,
             args,
             slice_start=0,
             array_length=list_length,
@@ -31,21 +57,110 @@ class CustomDjangoConnectionField(DjangoConnectionField):
         conn.length = list_length
         return conn
 
+    @classmethod
+    def resolve_keyset_connection(cls, connection, args, iterable, rows, max_limit=None):
+        """
+        `rows` hold the window of `window_bounds`: `after`/`before` and `offset` are
+        applied, and at most one row beyond the page was read.
+        """
+        start, stop, reverse = window_bounds(args, max_limit)
+        first, last = page_size(args, max_limit)
+        has_previous_page = bool(args.get("after")) or start > 0
+        has_next_page = bool(args.get("before"))
+        if reverse:
+            rows = rows[::-1]
+        if first is not None:
+            has_next_page = has_next_page or len(rows) > first
+            rows = rows[:first]
+        if last is not None:
+            has_previous_page = has_previous_page or len(rows) > last
+            rows = rows[max(len(rows) - last, 0) :]
+
+        edges = [connection.Edge(node=row, cursor=row_cursor(row)) for row in rows]
+        conn = connection_adapter(
+            connection,
+            edges,
+            page_info_adapter(
+                edges[0].cursor if edges else None,
+                edges[-1].cursor if edges else None,
+                has_previous_page,
+                has_next_page,
+            ),
+        )
+        conn.iterable = iterable
+        conn.length = len(rows)
+        return conn
+
 
 class CustomDjangoConnectionFieldWithOutPagination(DjangoConnectionField):
+    """
+    Returns every row of the relation in one page, up to `max_rows`: larger results
+    raise an error instead of loading without bound. With `stream=True` rows are read
+    from a server-side cursor in chunks of `chunk_size` while the edges are built.
+    """
+
+    max_rows = 10000
+    chunk_size = 2000
+
+    def __init__(self, type, *args, max_rows=None, stream=False, chunk_size=None, **kwargs):
+        self.max_rows = max_rows or self.max_rows
+        self.chunk_size = chunk_size or self.chunk_size
+        self.stream = stream
+        super().__init__(type, *args, **kwargs)
+
+    def wrap_resolve(self, parent_resolver):
+        # As DjangoConnectionField.wrap_resolve: relation resolvers are partials of the
+        # related field name, and max_rows / stream have to reach resolve_connection
+        resolver = partial(related_batchread, self.django_type, parent_resolver.args[0])
+        return partial(self.connection_resolver_all, resolver)
+
+    def connection_resolver_all(self, resolver, root, info, **args):
+        return self.resolve_connection(
+            self.connection_type,
+            args,
+            resolver(root, info, **args),
+            max_rows=self.max_rows,
+            stream=self.stream,
+            chunk_size=self.chunk_size,
+        )
+
     @classmethod
-    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+    def resolve_connection(
+        cls,
+        connection,
+        args,
+        iterable,
+        max_limit=None,
+        max_rows=None,
+        stream=False,
+        chunk_size=None,
+    ):
         iterable = maybe_queryset(iterable)
+        max_rows = max_rows or cls.max_rows
+
+        if stream and is_unevaluated(iterable):
+            if iterable[: max_rows + 1].count() > max_rows:
+                raise cls.too_many_rows(max_rows)
+            rows = iterable.iterator(chunk_size=chunk_size or cls.chunk_size)
+            edges = (connection.Edge(node=row, cursor=None) for row in rows)
+            conn = connection_adapter(
+                connection, edges, page_info_adapter(None, None, False, False)
+            )
+            conn.iterable = iterable
+            return conn
 
-        if isinstance(iterable, QuerySet):
-            list_length = iterable.count()
+        if is_unevaluated(iterable):
+            rows = list(iterable[: max_rows + 1])
         else:
-            list_length = len(iterable)
+            rows = list(iterable)
+        if len(rows) > max_rows:
+            raise cls.too_many_rows(max_rows)
+        list_length = len(rows)
 
         args["first"] = list_length
 
         connection = connection_from_array_slice(
-            iterable[:],
+            rows,
             args,
             slice_start=0,
             array_length=list_length,
@@ -57,3 +172,15 @@ class CustomDjangoConnectionFieldWithOutPagination(DjangoConnectionField):
         connection.iterable = iterable
         connection.length = list_length
         return connection
+
+    @staticmethod
+    def too_many_rows(max_rows):
+        return GraphQLError(f"More than {max_rows} rows; use a paginated connection instead.")
+
+
+def as_custom_connection_field(get_field):
+    """Swap the connection field graphene-django-crud builds for a relation for ours."""
+    field = get_field()
+    if type(field) is DjangoConnectionField:
+        return CustomDjangoConnectionField(field._type, description=field.description, **field.args)
+    return field
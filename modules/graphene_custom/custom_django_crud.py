@@ -1,14 +1,76 @@
+import copy
+from collections import defaultdict
 from enum import Enum
+from functools import lru_cache, partial
 import graphene
 import pytz
-from django.db.models import F
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, ForeignKey, OneToOneField
 from django.db.models.functions import Extract
+from graphene_django.settings import graphene_settings
 from graphene_django_crud.converter import convert_model_to_input_type
+from graphene_django_crud.registry import get_global_registry
 from graphene_django_crud.types import DjangoCRUDObjectType
+from graphene_django_crud.utils import (
+    get_field_ast_by_path,
+    get_model_fields,
+    order_by_input_to_args,
+    parse_arguments_ast,
+    resolve_argument,
+    where_input_to_Q,
+)
+from graphql import GraphQLError
 from stringcase import snakecase
 from collections import OrderedDict
 
-from modules.shared.utils import TimeZoneConversion, convert_offset_to_timezone
+from modules.graphene_custom.bulk import (
+    bulk_payload_type,
+    bulk_update_input_type,
+    resolve_wheres,
+    row_errors,
+    unique_errors,
+)
+from modules.graphene_custom.custom_connection_field import as_custom_connection_field
+from modules.graphene_custom.dataloaders import (
+    get_loaders,
+    get_related_filter,
+    get_related_only,
+    loader_key,
+    relation_resolver,
+)
+from modules.graphene_custom.keyset import (
+    ConnectionRows,
+    paginate_keyset,
+    row_cursor,
+    window_bounds,
+)
+from modules.graphene_custom.query_optimizer import (
+    is_prefetched,
+    iter_selected_fields,
+    optimize_queryset,
+)
+from modules.graphene_custom.response_cache import derived_models, invalidate_models
+from modules.shared.utils import (
+    TimeZoneConversion,
+    input_to_dict,
+    local_period_range,
+    local_to_db_datetime,
+    request_timezone,
+)
+
+
+@lru_cache(maxsize=None)
+def model_input_type(model, input_flag, registry, only="__all__", exclude=()):
+    """
+    convert_model_to_input_type memoized per (model, input_flag). The registry
+    already reuses the type, but finding it lists and filters the model fields
+    again, for every field of the schema at build time and for every filtered
+    request.
+    """
+    return convert_model_to_input_type(
+        model, input_flag=input_flag, registry=registry, only=only, exclude=list(exclude)
+    )
 
 
 class CustomDjangoCRUDObjectType(DjangoCRUDObjectType):
@@ -21,44 +83,97 @@ class CustomDjangoCRUDObjectType(DjangoCRUDObjectType):
         - batchread & BatchReadField: to add custom logic to the query for filtering and
             slicing to increase performance
         - mutate: to convert Enum values to their actual values
+        - read, batchread, _update, _delete & mutate: to turn graphene input containers
+            into plain dicts before graphene-django-crud walks them
+        - _queryset_factory: to derive only/select_related/prefetch_related from the
+            selection set (see query_optimizer)
+        - default resolver & batchread: to batch relations the selection set could not
+            eager load through per-request loaders (see dataloaders)
+        - cursor, BatchReadField & nested connections: keyset pagination with
+            first/after cursors built from the orderBy columns and the pk (see keyset)
+        - WhereInputType & co: input types memoized per (model, input_flag)
+        - field_costs: weights of costly fields for the query cost limit (see query_cost)
+        - cache_ttl & mutate: lifetime of cached responses reading this type, dropped
+            by any mutation of the model (see response_cache)
+        - CreateManyField & UpdateManyField: batch mutations validated up front and
+            written with bulk_create / bulk_update (see bulk); bulk_clean,
+            bulk_create and bulk_update are the hooks for side effects of a batch
     """
 
+    cursor = graphene.String(
+        description="Keyset cursor of this row, to be passed as `after` to the same list"
+    )
+
+    # python field name -> cost of resolving it once, e.g. {"stock": 1}
+    field_costs = {}
+    # seconds a cached response reading this type may be served, None for the default
+    cache_ttl = None
+    # rows per INSERT / UPDATE statement of the CreateMany / UpdateMany mutations
+    bulk_chunk_size = 500
+
     class Meta:
         abstract = True
 
     @classmethod
-    def get_queryset(cls, parent, info, **kwargs):
-        query = cls._meta.model.objects.all()
+    def __init_subclass_with_meta__(cls, default_resolver=None, **options):
+        super().__init_subclass_with_meta__(
+            default_resolver=default_resolver or relation_resolver, **options
+        )
+        for name, field in cls._meta.fields.items():
+            if isinstance(field, graphene.Dynamic):
+                cls._meta.fields[name] = graphene.Dynamic(
+                    partial(as_custom_connection_field, field.get_type), field.with_schema
+                )
 
-        # To filter out records by timezone from user
-        # we'll add an extra column with the created_at field
-        # converted in the timezone of the user
-        if hasattr(cls._meta.model, "created_at"):
-            timezone_from_cookie = convert_offset_to_timezone(
-                int(info.context.COOKIES.get("timezone", 0))
-            )
-            query = query.annotate(
-                created_at_in_timezone=TimeZoneConversion(timezone_from_cookie, F("created_at"))
-            )
+    def resolve_cursor(self, info):
+        return row_cursor(self)
 
-        return query
+    @classmethod
+    def _input_type(cls, input_flag, only="__all__", exclude=()):
+        if only != "__all__":
+            only = tuple(only)
+        return model_input_type(
+            cls._meta.model, input_flag, cls._meta.registry, only, tuple(exclude)
+        )
+
+    @classmethod
+    def WhereInputType(cls, only="__all__", exclude=(), *args, **kwargs):
+        return cls._input_type("where", only, exclude)
+
+    @classmethod
+    def OrderByInputType(cls, only="__all__", exclude=(), *args, **kwargs):
+        return cls._input_type("order_by", only, exclude)
+
+    @classmethod
+    def CreateInputType(cls, only="__all__", exclude=(), *args, **kwargs):
+        return cls._input_type("create", only, exclude)
+
+    @classmethod
+    def UpdateInputType(cls, only="__all__", exclude=(), *args, **kwargs):
+        return cls._input_type("update", only, exclude)
+
+    @classmethod
+    def get_queryset(cls, parent, info, **kwargs):
+        return cls._meta.model.objects.all()
 
     @classmethod
     def filter(cls, parent, info, id, **kwargs):
-        query = cls._meta.model.objects.filter(pk=id)
+        return cls._meta.model.objects.filter(pk=id)
 
-        # To filter out records by timezone from user
-        # we'll add an extra column with the created_at field
-        # converted in the timezone of the user
+    @classmethod
+    def annotate_created_at_in_timezone(cls, queryset, info):
+        """
+        Add created_at converted in the timezone of the user, for computed fields that
+        need the local time. Filters should compare created_at itself so its index
+        stays usable.
+        """
         if hasattr(cls._meta.model, "created_at"):
-            timezone_from_cookie = convert_offset_to_timezone(
-                int(info.context.COOKIES.get("timezone", 0))
-            )
-            query = query.annotate(
-                created_at_in_timezone=TimeZoneConversion(timezone_from_cookie, F("created_at"))
+            queryset = queryset.annotate(
+                created_at_in_timezone=TimeZoneConversion(
+                    request_timezone(info.context), F("created_at")
+                )
             )
-
-        return query
+        return queryset
 
     @classmethod
     def _is_method_overridden(cls, method_name):
@@ -72,33 +187,33 @@ class CustomDjangoCRUDObjectType(DjangoCRUDObjectType):
 
     @classmethod
     def filter_by_date_timezone(cls, queryset, date_variables, timezone):
-        # Check if the user is trying to filter by month and year
-        # if so, we'll use the created_at_in_timezone field to filter
-        # and remove the createdAt field from the variable_values
-
+        """
+        Filter by the month / year / gte / lte of createdAt as seen in `timezone`.
+        Local bounds are turned into the instants they denote, so the filter is a
+        plain range on created_at; only a month without a year needs Extract.
+        """
         month = date_variables.get("month", {}).get("exact")
         year = date_variables.get("year", {}).get("exact")
 
         gte = date_variables.get("gte")
         lte = date_variables.get("lte")
 
-        if month:
+        if year:
+            start, end = local_period_range(timezone, year, month)
+            queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+        elif month:
             queryset = queryset.annotate(
                 created_at_in_timezone_month=Extract(
                     "created_at", "month", tzinfo=pytz.timezone(timezone)
                 )
             ).filter(created_at_in_timezone_month=month)
-        if year:
-            queryset = queryset.annotate(
-                created_at_in_timezone_year=Extract(
-                    "created_at", "year", tzinfo=pytz.timezone(timezone)
-                )
-            ).filter(created_at_in_timezone_year=year)
 
         if gte:
-            queryset = queryset.filter(created_at_in_timezone__gte=gte)
+            queryset = queryset.filter(created_at__gte=local_to_db_datetime(gte, timezone))
         if lte:
-            queryset = queryset.filter(created_at_in_timezone__lte=lte)
+            queryset = queryset.filter(
+                created_at__lte=local_to_db_datetime(lte, timezone, first=False)
+            )
 
         return queryset
 
@@ -140,10 +255,65 @@ class CustomDjangoCRUDObjectType(DjangoCRUDObjectType):
         return queryset
 
     @classmethod
-    def batchread(cls, parent, info, related_field=None, **kwargs):
+    def _normalize_variable_values(cls, info):
         for key, value in info.variable_values.items():
             if isinstance(value, Enum):
                 info.variable_values[key] = value.value
+            else:
+                info.variable_values[key] = input_to_dict(value)
+
+    @classmethod
+    def read(cls, parent, info, **kwargs):
+        cls._normalize_variable_values(info)
+        return super().read(parent, info, **kwargs)
+
+    @classmethod
+    def _update(cls, parent, info, where, data, *args, **kwargs):
+        return super()._update(parent, info, input_to_dict(where), data, *args, **kwargs)
+
+    @classmethod
+    def _delete(cls, parent, info, where, *args, **kwargs):
+        return super()._delete(parent, info, input_to_dict(where), *args, **kwargs)
+
+    @classmethod
+    def _queryset_factory(cls, info, field_ast=None, is_connection=True, only=(), **kwargs):
+        if is_connection and not cls._meta.use_connection:
+            is_connection = False
+        queryset = optimize_queryset(
+            cls,
+            cls.get_queryset(None, info),
+            info,
+            field_ast.selection_set,
+            is_connection=is_connection,
+            only=only,
+        )
+        arguments = parse_arguments_ast(field_ast.arguments, variable_values=info.variable_values)
+        return cls._filter_by_arguments(queryset, arguments).distinct()
+
+    @classmethod
+    def _connection_max_limit(cls):
+        if cls._meta.max_limit is not None:
+            return cls._meta.max_limit
+        return graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+    @classmethod
+    def _filter_by_arguments(cls, queryset, arguments):
+        if "where" in arguments:
+            where = resolve_argument(cls.WhereInputType(), arguments["where"])
+            queryset = queryset.filter(where_input_to_Q(where))
+        order_by = arguments.get("orderBy", arguments.get("order_by"))
+        if order_by:
+            if isinstance(order_by, dict):
+                order_by = [order_by]
+            order_by = resolve_argument(cls.OrderByInputType(), order_by)
+            queryset = queryset.order_by(*order_by_input_to_args(order_by))
+        return queryset
+
+    @classmethod
+    def batchread(cls, parent, info, related_field=None, **kwargs):
+        if kwargs.get("first") is not None and kwargs["first"] < 0:
+            raise GraphQLError('Argument "first" must not be negative.')
+        cls._normalize_variable_values(info)
 
         date_filters = info.variable_values.pop("createdAt", None)
 
@@ -161,26 +331,102 @@ class CustomDjangoCRUDObjectType(DjangoCRUDObjectType):
                     ob for ob in info.variable_values["orderBy"] if ob not in custom_order_by
                 ]
 
-        query = super().batchread(parent, info, related_field, **kwargs)
+        if parent is None:
+            # BatchReadField returns a plain list, so its selection set holds node fields
+            query = cls._queryset_factory(info, field_ast=info.field_nodes[0], is_connection=False)
+        elif is_prefetched(parent, related_field) and not (date_filters or custom_order_by):
+            get_loaders(info).register_prefetched(parent, related_field)
+            rows = super().batchread(parent, info, related_field, **kwargs)
+            return cls._connection_rows(parent, info, related_field, rows)
+        else:
+            query = cls._queryset_factory(
+                info,
+                field_ast=info.field_nodes[0],
+                is_connection=True,
+                only=get_related_only(parent._meta.model, related_field),
+            )
 
         if date_filters:
-            timezone_from_cookie = convert_offset_to_timezone(
-                int(info.context.COOKIES.get("timezone", 0))
-            )
+            timezone_from_cookie = request_timezone(info.context)
             query = cls.filter_by_date_timezone(query, date_filters, timezone_from_cookie)
 
         if custom_order_by:
+            query = cls.annotate_created_at_in_timezone(query, info)
             query = cls.order_by_custom(query, custom_order_by, info.variable_values)
 
+        if parent is not None:
+            # Load the page of every sibling of `parent` at once
+            rows = get_loaders(info).load_many(
+                parent,
+                related_field,
+                paginate_keyset(query, after=kwargs.get("after"), before=kwargs.get("before")),
+                loader_key(info),
+                window=window_bounds(kwargs, cls._connection_max_limit()),
+            )
+            return cls._connection_rows(parent, info, related_field, rows, query)
+
+        if "first" in kwargs or "after" in kwargs or cls._selects_cursor(info):
+            query = paginate_keyset(query, after=kwargs.get("after"))
+            if kwargs.get("first") is not None:
+                query = query[: kwargs["first"]]
         return query
 
+    @classmethod
+    def _selects_cursor(cls, info):
+        selection_set = info.field_nodes[0].selection_set
+        return any(
+            field.name.value == "cursor" for field in iter_selected_fields(info, selection_set)
+        )
+
+    @classmethod
+    def _connection_rows(cls, parent, info, related_field, rows, query=None):
+        """
+        Rows cut to a page in SQL no longer tell the size of the connection, so
+        totalCount has to count it separately unless the page holds every row.
+        """
+        arguments = parse_arguments_ast(
+            info.field_nodes[0].arguments, variable_values=info.variable_values
+        )
+        start, stop, _ = window_bounds(arguments, cls._connection_max_limit())
+        cursors = arguments.get("after") or arguments.get("before")
+        if not cursors and not start and (stop is None or len(rows) < stop):
+            return rows
+
+        def queryset():
+            unpaginated = query
+            if unpaginated is None:
+                unpaginated = cls._queryset_factory(
+                    info, field_ast=info.field_nodes[0], is_connection=True
+                )
+            return unpaginated
+
+        lookup = get_related_filter(parent._meta.model, related_field)
+        key = ("count",) + loader_key(info)
+
+        def count():
+            return get_loaders(info).load_count(parent, lookup, queryset(), key)
+
+        def parent_queryset():
+            return queryset().filter(**{lookup: parent})
+
+        return ConnectionRows(rows, count, parent_queryset)
+
+    @classmethod
+    def _resolve_batch(cls, parent, info, **kwargs):
+        instances = list(cls.batchread(parent, info, **kwargs))
+        get_loaders(info).register(instances)
+        return instances
+
     @classmethod
     def mutate(cls, parent, info, instance, data, *args, **kwargs):
         try:
+            data = input_to_dict(data)
             for key, value in data.items():
                 if isinstance(value, Enum):
                     data[key] = value.value
-            return super().mutate(parent, info, instance, data, *args, **kwargs)
+            instance = super().mutate(parent, info, instance, data, *args, **kwargs)
+            invalidate_models(cls._meta.model)
+            return instance
         except Exception as e:
             # Log the error for debugging purposes
             # structured_logger.log_error(
@@ -192,37 +438,260 @@ class CustomDjangoCRUDObjectType(DjangoCRUDObjectType):
     @classmethod
     def BatchReadField(cls, *args, **kwargs):
         arguments = {
-            "where": graphene.Argument(
-                convert_model_to_input_type(
-                    cls._meta.model, input_flag="where", registry=cls._meta.registry
-                )
-            ),
-            "order_by": graphene.List(
-                convert_model_to_input_type(
-                    cls._meta.model, input_flag="order_by", registry=cls._meta.registry
-                )
-            ),
+            "where": graphene.Argument(cls.WhereInputType()),
+            "order_by": graphene.List(cls.OrderByInputType()),
             "page": graphene.Argument(graphene.Int, default_value=None),
+            "first": graphene.Int(),
+            "after": graphene.String(),
         }
 
         if hasattr(cls, "CustomArguments"):
             arguments.update({"custom_args": graphene.Argument(cls.CustomArguments)})
 
         return graphene.Field(
-            graphene.List(cls), args=arguments, resolver=cls.batchread, *args, **kwargs
+            graphene.List(cls), args=arguments, resolver=cls._resolve_batch, *args, **kwargs
         )
 
     @classmethod
     def ReadField(cls, *args, **kwargs):
         arguments = OrderedDict()
-        arguments = {
-            "where": graphene.Argument(
-                convert_model_to_input_type(
-                    cls._meta.model, input_flag="where", registry=cls._meta.registry
-                )
-            )
-        }
+        arguments = {"where": graphene.Argument(cls.WhereInputType())}
 
         if hasattr(cls, "CustomArguments"):
             arguments.update({"custom_args": graphene.Argument(cls.CustomArguments)})
         return graphene.Field(cls, args=arguments, resolver=cls.read, *args, **kwargs)
+
+    @classmethod
+    def CreateManyField(cls, *args, **kwargs):
+        create_input = cls.CreateInputType()
+        arguments = {
+            "input": graphene.Argument(
+                graphene.List(graphene.NonNull(create_input)), required=True
+            ),
+            "partial": graphene.Boolean(
+                default_value=False, description="Write the valid rows even if others fail"
+            ),
+        }
+        return graphene.Field(
+            bulk_payload_type(cls, "create"),
+            args=arguments,
+            resolver=cls.create_many_resolver,
+            *args,
+            **kwargs,
+        )
+
+    @classmethod
+    def UpdateManyField(cls, *args, **kwargs):
+        update_many_input = bulk_update_input_type(
+            cls,
+            cls.WhereInputType(),
+            cls.UpdateInputType(),
+        )
+        arguments = {
+            "input": graphene.Argument(
+                graphene.List(graphene.NonNull(update_many_input)), required=True
+            ),
+            "partial": graphene.Boolean(
+                default_value=False, description="Write the valid rows even if others fail"
+            ),
+        }
+        return graphene.Field(
+            bulk_payload_type(cls, "update"),
+            args=arguments,
+            resolver=cls.update_many_resolver,
+            *args,
+            **kwargs,
+        )
+
+    @classmethod
+    def create_many_resolver(cls, parent, info, input, partial=False):
+        rows = input_to_dict(input)
+        with transaction.atomic():
+            instances = [cls._meta.model() for _ in rows]
+            return cls._bulk_mutate(parent, info, instances, rows, "create", partial)
+
+    @classmethod
+    def update_many_resolver(cls, parent, info, input, partial=False):
+        rows = input_to_dict(input)
+        with transaction.atomic():
+            targets = resolve_wheres(
+                cls.get_queryset(parent, info).select_for_update(),
+                [row["where"] for row in rows],
+            )
+            instances, errors, seen = [], {}, set()
+            for position, target in enumerate(targets):
+                if isinstance(target, ValidationError):
+                    errors[position] = ValidationError({"where": target.messages})
+                    target = None
+                elif target.pk in seen:
+                    errors[position] = ValidationError(
+                        {"where": ["Matches a row already updated by this batch."]}
+                    )
+                    target = None
+                else:
+                    seen.add(target.pk)
+                instances.append(target)
+            return cls._bulk_mutate(
+                parent, info, instances, [row["input"] for row in rows], "update", partial, errors
+            )
+
+    @classmethod
+    def _bulk_mutate(cls, parent, info, instances, rows, operation_flag, partial, errors=None):
+        """
+        Validate every row up front, then write the valid ones with bulk_create /
+        bulk_update in chunks of `bulk_chunk_size`. Unless `partial`, one invalid
+        row means nothing is written.
+        """
+        errors = dict(errors or {})
+        previous = {
+            instance.pk: copy.copy(instance)
+            for instance in instances
+            if instance is not None and instance.pk is not None
+        }
+        fields = cls._bulk_assign(parent, info, instances, rows, errors)
+        valid = cls._bulk_validate(instances, errors)
+        errors.update(cls.bulk_clean(valid, previous))
+        valid = {
+            position: instance
+            for position, instance in valid.items()
+            if position not in errors and (partial or not errors)
+        }
+        if valid:
+            if operation_flag == "create":
+                cls.bulk_create(list(valid.values()))
+            else:
+                cls.bulk_update(list(valid.values()), fields, previous)
+            # The bulk writes send no signal, so nothing else invalidates what they derive
+            invalidate_models(cls._meta.model, *derived_models(cls._meta.model))
+
+        results = None
+        results_field_ast = get_field_ast_by_path(info, ["results"])
+        if results_field_ast is not None:
+            rows = cls._queryset_factory(
+                info, field_ast=results_field_ast, is_connection=False
+            ).filter(pk__in=[instance.pk for instance in valid.values()])
+            rows = {row.pk: row for row in rows}
+            get_loaders(info).register(rows.values())
+            results = [
+                rows.get(valid[position].pk) if position in valid else None
+                for position in range(len(instances))
+            ]
+        return {
+            "ok": not errors,
+            "errors": [
+                error
+                for position in sorted(errors)
+                for error in row_errors(position, errors[position])
+            ],
+            "results": results,
+        }
+
+    @classmethod
+    def _bulk_assign(cls, parent, info, instances, rows, errors):
+        """
+        Set the input values on `instances`, resolving the `connect` of each foreign
+        key for all rows at once. Returns the names of the fields set.
+        """
+        model_fields = get_model_fields(cls._meta.model, to_dict=True)
+        connects, fields = defaultdict(dict), set()
+        for position, (instance, data) in enumerate(zip(instances, rows)):
+            if position in errors:
+                continue
+            for key, value in data.items():
+                model_field = model_fields.get(key)
+                if model_field is None:
+                    continue
+                if isinstance(value, Enum):
+                    value = value.value
+                if isinstance(model_field, (ForeignKey, OneToOneField)):
+                    if value is None or "disconnect" in value:
+                        setattr(instance, key, None)
+                    elif list(value) == ["connect"]:
+                        connects[key][position] = value["connect"]
+                    else:
+                        errors[position] = ValidationError(
+                            {key: ["Bulk mutations can only connect or disconnect relations."]}
+                        )
+                        break
+                elif model_field.is_relation:
+                    errors[position] = ValidationError(
+                        {key: ["Bulk mutations cannot write related rows."]}
+                    )
+                    break
+                else:
+                    setattr(instance, key, value)
+                fields.add(key)
+
+        for key, wheres in connects.items():
+            related_type = get_global_registry().get_type_for_model(
+                model_fields[key].remote_field.model
+            )
+            related = resolve_wheres(related_type.get_queryset(parent, info), list(wheres.values()))
+            for position, related_instance in zip(wheres, related):
+                if isinstance(related_instance, ValidationError):
+                    errors.setdefault(
+                        position, ValidationError({f"{key}.connect": related_instance.messages})
+                    )
+                elif position not in errors:
+                    setattr(instances[position], key, related_instance)
+        return fields
+
+    @classmethod
+    def _bulk_validate(cls, instances, errors):
+        """Run the model validation of each row, with unique checks batched per column."""
+        model = cls._meta.model
+        valid = {}
+        for position, instance in enumerate(instances):
+            if position in errors:
+                continue
+            if cls._meta.validator:
+                # Connected rows were just read, checking they exist again is one query per row
+                exclude = [
+                    field.name
+                    for field in model._meta.concrete_fields
+                    if field.is_relation and field.is_cached(instance)
+                ]
+                try:
+                    instance.full_clean(
+                        exclude=[*(cls._meta.validator_exclude or ()), *exclude],
+                        validate_unique=False,
+                    )
+                except ValidationError as e:
+                    errors[position] = e
+                    continue
+            valid[position] = instance
+        if cls._meta.validator and cls._meta.validator_validate_unique:
+            for position, error in unique_errors(model, valid).items():
+                errors[position] = error
+                del valid[position]
+        return valid
+
+    @classmethod
+    def bulk_clean(cls, instances, previous):
+        """
+        Checks of a bulk mutation that need the whole batch, run in its transaction
+        before anything is written. `instances` maps input positions to valid rows,
+        `previous` maps pks to the rows as they were before an update. Returns
+        ValidationErrors by position.
+        """
+        return {}
+
+    @classmethod
+    def bulk_create(cls, instances):
+        return cls._meta.model.objects.bulk_create(instances, batch_size=cls.bulk_chunk_size)
+
+    @classmethod
+    def bulk_update(cls, instances, fields, previous):
+        auto_now = [
+            field
+            for field in cls._meta.model._meta.concrete_fields
+            if getattr(field, "auto_now", False)
+        ]
+        for instance in instances:
+            for field in auto_now:
+                field.pre_save(instance, add=False)
+        return cls._meta.model.objects.bulk_update(
+            instances,
+            [*fields, *(field.name for field in auto_now if field.name not in fields)],
+            batch_size=cls.bulk_chunk_size,
+        )
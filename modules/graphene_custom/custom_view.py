@@ -1,9 +1,43 @@
+import json
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import HttpResponseNotAllowed
+from django.http.response import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import HttpError
 from graphene_file_upload.django import FileUploadGraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from graphql import GraphQLError, MiddlewareManager, OperationType, execute_sync, get_operation_ast
+from graphql.execution import ExecutionResult
+
+from modules.graphene_custom.document_cache import DocumentCache, PersistedQueries
+from modules.graphene_custom.query_cost import QueryCostError, check_query_cost
+from modules.graphene_custom.response_cache import ResponseCache
+from modules.graphene_custom.tracing import Tracer, histograms, trace_requested
 
 
 class CustomGraphQLView(FileUploadGraphQLView):
-    """Minimal custom GraphQL view with file upload + error formatting."""
+    """
+    Minimal custom GraphQL view with file upload + error formatting.
+
+    Parsed and validated documents are kept in a process wide LRU cache
+    (`document_cache.cache_info()` reports hits and misses), and clients may send
+    automatic persisted query hashes instead of query bodies. Operations deeper or
+    costlier than GRAPHQL_MAX_QUERY_DEPTH / GRAPHQL_MAX_QUERY_COST are rejected
+    before execution, and the computed cost is reported in `extensions.cost`.
+    Query responses are cached until a write to a model they read (see
+    response_cache). With GRAPHQL_TRACING, or an authorized X-GraphQL-Trace header,
+    resolver and SQL timings are recorded (see tracing) and the latter returns them
+    in `extensions.tracing`.
+    """
+
+    document_cache = DocumentCache(getattr(settings, "GRAPHQL_DOCUMENT_CACHE_SIZE", 500))
+    persisted_queries = PersistedQueries()
+    response_cache = ResponseCache(getattr(settings, "GRAPHQL_RESPONSE_CACHE_TTL", 60))
 
     @staticmethod
     def format_error(error):
@@ -20,3 +54,180 @@ class CustomGraphQLView(FileUploadGraphQLView):
         # Mirror pattern: csrf_exempt(CustomGraphQLView.as_view(graphiql=True))
         view = super().as_view(*args, **kwargs)
         return csrf_exempt(view)
+
+    def get_extensions(self, request, data):
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if extensions and isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        return extensions
+
+    def get_tracer(self, request):
+        if getattr(settings, "GRAPHQL_TRACING", False) or trace_requested(request):
+            return Tracer()
+        return None
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        tracer = getattr(request, "_graphql_tracer", None)
+        if tracer is None:
+            return middleware
+        if isinstance(middleware, MiddlewareManager):
+            return MiddlewareManager(*middleware.middlewares, tracer)
+        return [*(middleware or ()), tracer]
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        request._graphql_tracer = tracer = self.get_tracer(request)
+        try:
+            query, key = self.persisted_queries.resolve(query, self.get_extensions(request, data))
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        try:
+            document, validation_errors = self.document_cache.get(
+                self.schema.graphql_schema, query, key, phase=tracer and tracer.phase
+            )
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method.lower() == "get":
+            if operation_ast and operation_ast.operation != OperationType.QUERY:
+                if show_graphiql:
+                    return None
+
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["POST"],
+                        "Can only perform a {} operation from a POST request.".format(
+                            operation_ast.operation.value
+                        ),
+                    )
+                )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        try:
+            cost, depth = check_query_cost(
+                self.schema.graphql_schema,
+                document,
+                operation_name,
+                variables,
+                max_cost=getattr(settings, "GRAPHQL_MAX_QUERY_COST", None),
+                max_depth=getattr(settings, "GRAPHQL_MAX_QUERY_DEPTH", None),
+                default_list_size=getattr(settings, "GRAPHQL_DEFAULT_LIST_SIZE", 100),
+                max_limit=graphene_settings.RELAY_CONNECTION_MAX_LIMIT,
+            )
+        except QueryCostError as e:
+            return ExecutionResult(errors=[e])
+        extensions = {"cost": {"requested": cost, "depth": depth}}
+
+        def execute():
+            return self.execute_document(
+                request, document, operation_ast, variables, operation_name
+            )
+
+        key, ttl = self.response_cache.operation_key(
+            self.schema.graphql_schema, document, operation_name, variables, request
+        )
+        if key is None:
+            result = execute()
+        else:
+            result, hit = self.response_cache.get_or_execute(key, ttl, execute)
+            extensions["cache"] = {"hit": hit, "ttl": ttl}
+        if tracer is not None:
+            tracer.finish()
+            if trace_requested(request):
+                extensions["tracing"] = {
+                    **tracer.as_extension(),
+                    "hotResolvers": histograms.top(10),
+                }
+        result.extensions = {**(result.extensions or {}), **extensions}
+        return result
+
+    def execute_document(self, request, document, operation_ast, variables, operation_name):
+        with ExitStack() as stack:
+            tracer = getattr(request, "_graphql_tracer", None)
+            if tracer is not None:
+                stack.enter_context(connection.execute_wrapper(tracer))
+                stack.enter_context(tracer.phase("execution"))
+            return self._execute_document(
+                request, document, operation_ast, variables, operation_name
+            )
+
+    def _execute_document(self, request, document, operation_ast, variables, operation_name):
+        try:
+            options = {
+                "root_value": self.get_root_value(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "context_value": self.get_context(request),
+                "middleware": self.get_middleware(request),
+                "execution_context_class": self.execution_context_class,
+            }
+            if (
+                operation_ast
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute_sync(self.schema.graphql_schema, document, **options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute_sync(self.schema.graphql_schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def get_response(self, request, data, show_graphiql=False):
+        # Same as GraphQLView.get_response, plus the `extensions` of the result
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
@@ -0,0 +1,153 @@
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import (
+    Count,
+    ForeignKey,
+    ManyToManyField,
+    ManyToOneRel,
+    Model,
+    OneToOneField,
+    OneToOneRel,
+    Prefetch,
+    prefetch_related_objects,
+)
+from graphene.types.resolver import dict_or_attr_resolver
+
+from modules.graphene_custom.keyset import window_per_parent
+
+
+class RequestLoaders:
+    """
+    Per-request relation loaders, kept on `info.context.loaders`.
+
+    graphql-core executes a sync document depth first, so a resolver cannot wait
+    for its siblings the way a promise based DataLoader does. Instead every list of
+    instances handed out by the schema is registered here, and the first relation
+    lookup for one instance loads that relation for all registered siblings with a
+    single `WHERE ... IN (...)` query.
+    """
+
+    def __init__(self):
+        self.instances = defaultdict(dict)
+        self.attrs = {}
+        self.counts = defaultdict(dict)
+
+    def register(self, instances):
+        for instance in instances:
+            if isinstance(instance, Model):
+                self.instances[type(instance)][id(instance)] = instance
+
+    def siblings(self, instance):
+        self.register([instance])
+        return self.instances[type(instance)].values()
+
+    def load_object(self, instance, field):
+        """Resolve a forward foreign key / one-to-one (or its reverse) for `instance`."""
+        if not field.is_cached(instance):
+            # Instances whose FK column was deferred would be refreshed one by one
+            batch = [
+                sibling
+                for sibling in self.siblings(instance)
+                if not field.is_cached(sibling)
+                and (isinstance(field, OneToOneRel) or field.attname in sibling.__dict__)
+            ]
+            if batch:
+                prefetch_related_objects(batch, field.get_cache_name())
+                self.register(field.get_cached_value(sibling, None) for sibling in batch)
+        return getattr(instance, field.get_cache_name(), None)
+
+    def load_many(self, instance, related_field, queryset, key, window=None):
+        """
+        Resolve a reverse / many-to-many relation filtered by `queryset`. `key` tells
+        apart selections of the same relation with different arguments. `window` is a
+        keyset.window_bounds triple applied to each parent separately.
+        """
+        to_attr = self.attrs.setdefault(key, f"_loader_{len(self.attrs)}")
+        if not hasattr(instance, to_attr):
+            batch = [
+                sibling for sibling in self.siblings(instance) if not hasattr(sibling, to_attr)
+            ]
+            if window is not None:
+                lookup = get_related_filter(type(instance), related_field)
+                queryset = window_per_parent(
+                    queryset.filter(**{f"{lookup}__in": [sibling.pk for sibling in batch]}),
+                    lookup,
+                    *window,
+                )
+            prefetch_related_objects(batch, Prefetch(related_field, queryset, to_attr=to_attr))
+            for sibling in batch:
+                self.register(getattr(sibling, to_attr))
+        return getattr(instance, to_attr)
+
+    def load_count(self, instance, lookup, queryset, key):
+        """
+        Size of `queryset` restricted to the children of `instance` (through `lookup`),
+        counted for all siblings with one GROUP BY query.
+        """
+        counts = self.counts[key]
+        if instance.pk not in counts:
+            batch = [sibling.pk for sibling in self.siblings(instance) if sibling.pk not in counts]
+            counts.update(dict.fromkeys(batch, 0))
+            counts.update(
+                queryset.filter(**{f"{lookup}__in": batch})
+                .prefetch_related(None)
+                .order_by()
+                .values_list(lookup)
+                .annotate(total=Count("pk", distinct=True))
+            )
+        return counts[instance.pk]
+
+    def register_prefetched(self, instance, related_field):
+        """Register eagerly prefetched children of `instance` and of its siblings."""
+        for sibling in self.siblings(instance):
+            cache = getattr(sibling, "_prefetched_objects_cache", {})
+            if related_field in cache:
+                self.register(cache[related_field])
+
+
+def get_loaders(info):
+    loaders = getattr(info.context, "loaders", None)
+    if loaders is None:
+        loaders = info.context.loaders = RequestLoaders()
+    return loaders
+
+
+def loader_key(info):
+    """Response path without list indexes, e.g. ("orders", "items")."""
+    return tuple(key for key in info.path.as_list() if isinstance(key, str))
+
+
+@lru_cache(maxsize=None)
+def get_single_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if isinstance(field, (ForeignKey, OneToOneField, OneToOneRel)):
+        return field
+    return None
+
+
+def get_related_only(model, related_field):
+    """Columns a related queryset needs so prefetching can match rows to parents."""
+    field = model._meta.get_field(related_field)
+    return (field.field.name,) if isinstance(field, ManyToOneRel) else ()
+
+
+def get_related_filter(model, related_field):
+    """Lookup on the related model that selects the children of one parent."""
+    field = model._meta.get_field(related_field)
+    if isinstance(field, ManyToManyField):
+        return field.related_query_name()
+    return field.field.name
+
+
+def relation_resolver(attname, default_value, root, info, **args):
+    """Default resolver that batches foreign key lookups through the request loaders."""
+    if isinstance(root, Model):
+        field = get_single_relation(type(root), attname)
+        if field is not None:
+            return get_loaders(info).load_object(root, field)
+    return dict_or_attr_resolver(attname, default_value, root, info, **args)
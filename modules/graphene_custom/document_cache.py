@@ -0,0 +1,104 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+
+from django.core.cache import caches
+from graphql import GraphQLError, parse, validate
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+class DocumentCache:
+    """
+    LRU cache of parsed and validated GraphQL documents keyed by the sha256 of the
+    query string, so the handful of operations clients repeat are parsed and
+    validated against the schema once per process.
+    """
+
+    def __init__(self, maxsize=500):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, schema, query, key=None, phase=None):
+        """
+        (document, validation_errors) for `query`. Parse errors are raised as
+        GraphQLError and never cached. `phase(name)` is entered around parsing and
+        validation on a miss, to time them.
+        """
+        key = (schema, key or query_hash(query))
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is not None:
+                self._documents.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        phase = phase or (lambda name: nullcontext())
+        with phase("parsing"):
+            document = parse(query)
+        with phase("validation"):
+            entry = document, validate(schema, document)
+        with self._lock:
+            self._documents[key] = entry
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+        return entry
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._documents))
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.hits = self.misses = 0
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code):
+        super().__init__(message, extensions={"code": code})
+
+
+class PersistedQueries:
+    """
+    Automatic persisted queries (the Apollo protocol): a client sends only
+    `extensions.persistedQuery.sha256Hash`, and the full query once when the hash
+    is unknown. Queries are kept in a Django cache, Redis when configured.
+    """
+
+    def __init__(self, cache_alias="persisted_queries"):
+        self.cache_alias = cache_alias
+
+    @property
+    def store(self):
+        return caches[self.cache_alias]
+
+    def resolve(self, query, extensions):
+        """(query, hash) of a request, looking up or storing its persisted query."""
+        persisted = (extensions or {}).get("persistedQuery")
+        if not persisted:
+            return query, None
+        if persisted.get("version") != 1:
+            raise PersistedQueryError(
+                "Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED"
+            )
+        key = persisted.get("sha256Hash")
+        if not key:
+            raise PersistedQueryError("Missing persisted query hash", "BAD_USER_INPUT")
+        if query:
+            if query_hash(query) != key:
+                raise PersistedQueryError("Provided sha does not match query", "BAD_USER_INPUT")
+            self.store.set(f"apq:{key}", query, None)
+            return query, key
+        query = self.store.get(f"apq:{key}")
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+        return query, key
@@ -0,0 +1,219 @@
+import base64
+import binascii
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Field, Func, JSONField, Q, Value, Window
+from django.db.models.expressions import OrderBy, RawSQL
+from django.db.models.functions import RowNumber
+from django.db.models.lookups import GreaterThan, LessThan
+from graphql import GraphQLError
+
+from modules.shared.utils import estimate_count
+
+CURSOR_FIELD = "keyset_cursor"
+
+
+class RowValue(Func):
+    """Postgres row constructor, `ROW(a, b) > ROW(x, y)` compares lexicographically."""
+
+    function = "ROW"
+    output_field = Field()
+
+
+def encode_cursor(values):
+    if values is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise GraphQLError(f"Invalid cursor: {cursor!r}")
+    return values
+
+
+def ordering_keys(queryset):
+    """
+    (expression, descending) pairs of the queryset ordering, closed with the pk so
+    every row has a unique position.
+    """
+    pk_name = queryset.model._meta.pk.name
+    ordering = queryset.query.order_by or (
+        queryset.model._meta.ordering if queryset.query.default_ordering else ()
+    )
+    keys, names = [], set()
+    for item in ordering:
+        if isinstance(item, OrderBy):
+            keys.append((item.expression, item.descending))
+        elif isinstance(item, str) and item != "?":
+            name = item.lstrip("-")
+            name = pk_name if name == "pk" else name
+            names.add(name)
+            keys.append((F(name), item.startswith("-")))
+    if pk_name not in names:
+        # Same direction as the last key so a single row-value comparison still applies
+        keys.append((F(pk_name), keys[-1][1] if keys else False))
+    return keys
+
+
+def keyset_condition(queryset, names, keys, values, forward=True):
+    """Rows strictly after (`forward`) or before the position described by `values`."""
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        # (a, b, pk) > (x, y, z) can walk a composite index in one range scan
+        greater = forward != directions.pop()
+        lookup = GreaterThan if greater else LessThan
+        return lookup(
+            RowValue(*(F(name) for name in names)),
+            RowValue(
+                *(
+                    Value(value, output_field=queryset.query.annotations[name].output_field)
+                    for name, value in zip(names, values)
+                )
+            ),
+        )
+
+    # Mixed directions have no row-value form: a > x OR (a = x AND b < y) OR ...
+    condition = Q()
+    for index, (name, (_, descending)) in enumerate(zip(names, keys)):
+        operator = "gt" if forward != descending else "lt"
+        condition |= Q(
+            **{previous: value for previous, value in zip(names[:index], values)},
+            **{f"{name}__{operator}": values[index]},
+        )
+    return condition
+
+
+def paginate_keyset(queryset, after=None, before=None):
+    """
+    Order `queryset` by its keyset, annotate each row with its cursor values and keep
+    only the rows between the `after` and `before` cursors. Ordering columns are
+    expected to be non-null.
+    """
+    keys = ordering_keys(queryset)
+    names = [f"keyset_{index}" for index in range(len(keys))]
+    queryset = queryset.annotate(
+        **{name: expression for name, (expression, _) in zip(names, keys)}
+    ).annotate(
+        **{
+            CURSOR_FIELD: Func(
+                *(F(name) for name in names),
+                function="jsonb_build_array",
+                output_field=JSONField(),
+            )
+        }
+    )
+    queryset = queryset.order_by(
+        *(
+            F(name).desc() if descending else F(name).asc()
+            for name, (_, descending) in zip(names, keys)
+        )
+    )
+    for cursor, forward in ((after, True), (before, False)):
+        if cursor:
+            values = decode_cursor(cursor, len(keys))
+            queryset = queryset.filter(keyset_condition(queryset, names, keys, values, forward))
+    return queryset
+
+
+def page_size(args, max_limit=None):
+    """`first` / `last` of a connection page, capped at `max_limit` like graphene-django."""
+    first, last = args.get("first"), args.get("last")
+    if max_limit is not None:
+        if first is None and last is None:
+            first = max_limit
+        first = None if first is None else min(first, max_limit)
+        last = None if last is None else min(last, max_limit)
+    return first, last
+
+
+def window_bounds(args, max_limit=None):
+    """
+    (start, stop, reverse) slice of the keyset ordered rows that covers a connection
+    page plus one extra row, which tells whether there is a further page. `last`
+    without `first` reads the ordering backwards so it still needs no COUNT(*).
+    """
+    offset = args.get("offset") or 0
+    first, last = page_size(args, max_limit)
+    if first is not None:
+        return offset, offset + first + 1, False
+    if last is not None and not offset:
+        return 0, last + 1, True
+    return offset, None, False
+
+
+def window_queryset(queryset, args, max_limit=None):
+    """LIMIT/OFFSET a keyset paginated queryset to the rows of one connection page."""
+    start, stop, reverse = window_bounds(args, max_limit)
+    if reverse:
+        queryset = queryset.reverse()
+    if start or stop is not None:
+        queryset = queryset[start:stop]
+    return queryset
+
+
+def window_per_parent(queryset, lookup, start, stop, reverse=False):
+    """
+    Cut a keyset paginated queryset of related rows to the same window for every
+    parent, numbering the rows per `lookup` value with ROW_NUMBER() so one query
+    serves all parents.
+    """
+    ordering = [expression.copy() for expression in queryset.query.order_by]
+    if reverse:
+        ordering = [expression.reverse_ordering() for expression in ordering]
+    numbered = (
+        queryset.annotate(
+            keyset_row=Window(RowNumber(), partition_by=[F(lookup)], order_by=ordering)
+        )
+        .order_by()
+        .values_list("pk", "keyset_row")
+    )
+    sql, params = numbered.query.sql_with_params()
+    condition, bounds = "keyset_row > %s", [start]
+    if stop is not None:
+        condition, bounds = condition + " AND keyset_row <= %s", bounds + [stop]
+    queryset = queryset.filter(
+        pk__in=RawSQL(
+            f"SELECT keyset_window.{queryset.model._meta.pk.column} "
+            f"FROM ({sql}) keyset_window WHERE {condition}",
+            (*params, *bounds),
+        )
+    )
+    return queryset.reverse() if reverse else queryset
+
+
+def row_cursor(row):
+    return encode_cursor(getattr(row, CURSOR_FIELD, None))
+
+
+class ConnectionRows:
+    """
+    Rows of a connection already narrowed by cursors in SQL. `count()` still counts
+    the whole connection, as totalCount did before cursors were applied, and
+    `estimate_count()` asks the planner about `queryset()` instead.
+    """
+
+    def __init__(self, rows, count, queryset):
+        self.rows = list(rows)
+        self._count = count
+        self._queryset = queryset
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def count(self):
+        return self._count()
+
+    def estimate_count(self):
+        return estimate_count(self._queryset())
@@ -0,0 +1,165 @@
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    InlineFragmentNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_composite_type,
+)
+from graphql.execution.values import get_argument_values
+from stringcase import snakecase
+
+
+class QueryCostError(GraphQLError):
+    """A query rejected before execution, with the measured value and its limit."""
+
+    def __init__(self, message, code, **extensions):
+        super().__init__(message, extensions={"code": code, **extensions})
+
+
+def is_connection_type(graphql_type):
+    fields = getattr(graphql_type, "fields", {})
+    return "edges" in fields and "pageInfo" in fields
+
+
+def field_weight(parent_type, name, field_type):
+    """
+    Cost of resolving one field once: `field_costs` of the graphene type when it
+    declares one (keyed by python field name), else 1 for objects and 0 for scalars.
+    """
+    field_costs = getattr(getattr(parent_type, "graphene_type", None), "field_costs", {})
+    weight = field_costs.get(snakecase(name))
+    if weight is None:
+        weight = 1 if is_composite_type(get_named_type(field_type)) else 0
+    return weight
+
+
+class QueryCostAnalyzer:
+    """
+    Static cost and depth of an operation, computed from the document before it is
+    executed. A list field multiplies the cost of its selections by the number of
+    rows it may return: `first` / `last` when given, the connection max limit for
+    connections and `default_list_size` for other lists. A `max_limit` of None (no
+    connection limit) counts connections as other lists.
+    """
+
+    def __init__(self, schema, document, variables=None, default_list_size=100, max_limit=100):
+        self.schema = schema
+        self.variables = variables or {}
+        self.default_list_size = default_list_size
+        self.max_limit = max_limit
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    def analyze(self, operation):
+        """(cost, depth) of `operation`."""
+        root_type = self.schema.get_root_type(operation.operation)
+        return self.selection_cost(root_type, operation.selection_set, 1)
+
+    def iter_fields(self, parent_type, selection_set, visited=()):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield parent_type, selection
+                continue
+            spread = visited
+            if isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                if name in visited:
+                    continue
+                fragment, spread = self.fragments[name], (*visited, name)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment = selection
+            condition = fragment.type_condition
+            fragment_type = self.schema.get_type(condition.name.value) if condition else parent_type
+            yield from self.iter_fields(fragment_type, fragment.selection_set, spread)
+
+    def selection_cost(self, parent_type, selection_set, depth):
+        cost, max_depth = 0, depth - 1
+        for field_type_parent, field in self.iter_fields(parent_type, selection_set):
+            name = field.name.value
+            if name.startswith("__"):
+                continue
+            field_def = getattr(field_type_parent, "fields", {}).get(name)
+            if field_def is None:
+                continue
+            field_cost, field_depth = self.field_cost(field_type_parent, field, field_def, depth)
+            cost += field_cost
+            max_depth = max(max_depth, field_depth)
+        return cost, max_depth
+
+    def field_cost(self, parent_type, field, field_def, depth):
+        weight = field_weight(parent_type, field.name.value, field_def.type)
+        if not field.selection_set:
+            return weight, depth
+        child_cost, child_depth = self.selection_cost(
+            get_named_type(field_def.type), field.selection_set, depth + 1
+        )
+        return weight + self.multiplier(parent_type, field, field_def) * child_cost, child_depth
+
+    def multiplier(self, parent_type, field, field_def):
+        try:
+            arguments = get_argument_values(field_def, field, self.variables)
+        except GraphQLError:
+            arguments = {}
+        for name in ("first", "last"):
+            if arguments.get(name) is not None and arguments[name] < 0:
+                raise QueryCostError(
+                    f'Argument "{name}" of {field.name.value} must not be negative',
+                    "INVALID_LIMIT",
+                    field=field.name.value,
+                    argument=name,
+                )
+        size = arguments.get("first")
+        if size is None:
+            size = arguments.get("last")
+        if is_connection_type(get_named_type(field_def.type)):
+            if self.max_limit is None:
+                return self.default_list_size if size is None else size
+            return self.max_limit if size is None else min(size, self.max_limit)
+        if not isinstance(get_nullable_type(field_def.type), GraphQLList):
+            return 1
+        if size is not None:
+            return size
+        # edges of a connection are already counted by the connection field
+        return 1 if is_connection_type(parent_type) else self.default_list_size
+
+
+def check_query_cost(
+    schema,
+    document,
+    operation_name=None,
+    variables=None,
+    max_cost=None,
+    max_depth=None,
+    **options,
+):
+    """
+    (cost, depth) of the operation to execute, raising QueryCostError when it is
+    over `max_depth` or `max_cost`.
+    """
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return 0, 0
+    cost, depth = QueryCostAnalyzer(schema, document, variables, **options).analyze(operation)
+    if max_depth is not None and depth > max_depth:
+        raise QueryCostError(
+            f"Query depth {depth} exceeds the maximum of {max_depth}",
+            "QUERY_TOO_DEEP",
+            depth=depth,
+            maxDepth=max_depth,
+        )
+    if max_cost is not None and cost > max_cost:
+        raise QueryCostError(
+            f"Query cost {cost} exceeds the maximum of {max_cost}",
+            "QUERY_TOO_COMPLEX",
+            cost=cost,
+            maxCost=max_cost,
+        )
+    return cost, depth
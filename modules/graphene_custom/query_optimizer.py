@@ -0,0 +1,147 @@
+from django.db.models import (
+    ForeignKey,
+    ManyToManyField,
+    ManyToManyRel,
+    ManyToOneRel,
+    OneToOneField,
+    OneToOneRel,
+    Prefetch,
+)
+from graphene_django_crud.registry import get_global_registry
+from graphene_django_crud.settings import gdc_settings
+from graphene_django_crud.utils import get_type_field
+from graphql.language.ast import FragmentSpreadNode, InlineFragmentNode
+
+SINGLE_RELATIONS = (ForeignKey, OneToOneField, OneToOneRel)
+MANY_RELATIONS = (ManyToOneRel, ManyToManyField, ManyToManyRel)
+
+
+def iter_selected_fields(info, selection_set):
+    """
+    Yield the field nodes of a selection set with fragment spreads and inline
+    fragments expanded. Node types are concrete object types, so every fragment
+    that passed validation applies to the current type.
+    """
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments[selection.name.value]
+            yield from iter_selected_fields(info, fragment.selection_set)
+        elif isinstance(selection, InlineFragmentNode):
+            yield from iter_selected_fields(info, selection.selection_set)
+        elif not selection.name.value.startswith("__"):
+            yield selection
+
+
+class QueryPlan:
+    """only / select_related / prefetch_related lookups collected from a selection set."""
+
+    def __init__(self):
+        self.only = []
+        self.select_related = []
+        self.prefetches = {}
+        self.conflicting_prefetches = set()
+
+    def add_only(self, *lookups):
+        self.only.extend(lookup for lookup in lookups if lookup not in self.only)
+
+    def add_select_related(self, lookup):
+        if lookup not in self.select_related:
+            self.select_related.append(lookup)
+
+    def add_prefetch(self, lookup, queryset):
+        # The same relation selected twice (e.g. aliased with different arguments) cannot
+        # share one prefetch cache; leave it to the relation resolver instead.
+        if lookup in self.prefetches:
+            self.conflicting_prefetches.add(lookup)
+        self.prefetches[lookup] = Prefetch(lookup, queryset=queryset)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        queryset = queryset.only(*self.only)
+        prefetches = [
+            prefetch
+            for lookup, prefetch in self.prefetches.items()
+            if lookup not in self.conflicting_prefetches
+        ]
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+def plan_selection(django_type, info, selection_set, is_connection=False, prefix="", plan=None):
+    """
+    Walk a selection set of `django_type` and record the columns, joins and
+    prefetches needed to resolve it without extra queries per row.
+    """
+    if plan is None:
+        plan = QueryPlan()
+    model = django_type._meta.model
+    plan.add_only(prefix + model._meta.pk.name)
+
+    if is_connection:
+        for field in iter_selected_fields(info, selection_set):
+            name = field.name.value
+            if name == "edges":
+                plan_selection(django_type, info, field.selection_set, True, prefix, plan)
+            elif name in ("node", gdc_settings.DEFAULT_CONNECTION_NODES_FIELD_NAME):
+                plan_selection(django_type, info, field.selection_set, False, prefix, plan)
+        return plan
+
+    model_fields, computed_field_hints = django_type._get_fields()
+    for field in iter_selected_fields(info, selection_set):
+        type_field = get_type_field(django_type, field.name.value)
+        if type_field is None:
+            continue
+        name = type_field[0]
+
+        if name in computed_field_hints:
+            hints = computed_field_hints[name]
+            for lookup in hints["select_related"]:
+                plan.add_select_related(prefix + lookup)
+            plan.add_only(*(prefix + lookup for lookup in hints["only"]))
+            continue
+
+        model_field = model_fields.get(name)
+        if model_field is None:
+            continue
+
+        if isinstance(model_field, SINGLE_RELATIONS + MANY_RELATIONS):
+            if not field.selection_set:
+                continue
+            related_type = get_global_registry().get_type_for_model(model_field.remote_field.model)
+            if related_type is None:
+                continue
+            if isinstance(model_field, SINGLE_RELATIONS):
+                if not isinstance(model_field, OneToOneRel):
+                    plan.add_only(prefix + name)
+                plan.add_select_related(prefix + name)
+                plan_selection(
+                    related_type, info, field.selection_set, False, f"{prefix}{name}__", plan
+                )
+            elif related_type._meta.use_connection:
+                # Connections are cut to a page per parent by the request loaders
+                continue
+            else:
+                # Reverse FKs are matched back to their parent through the FK column
+                only = (model_field.field.name,) if isinstance(model_field, ManyToOneRel) else ()
+                queryset = related_type._queryset_factory(
+                    info, field_ast=field, is_connection=True, only=only
+                )
+                plan.add_prefetch(prefix + name, queryset)
+        else:
+            plan.add_only(prefix + name)
+    return plan
+
+
+def optimize_queryset(django_type, queryset, info, selection_set, is_connection=False, only=()):
+    """Apply only(), select_related() and prefetch_related() for a GraphQL selection set."""
+    plan = plan_selection(django_type, info, selection_set, is_connection)
+    plan.add_only(*only)
+    return plan.apply(queryset)
+
+
+def is_prefetched(instance, related_field):
+    return related_field in getattr(instance, "_prefetched_objects_cache", {})
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import time
+from functools import lru_cache
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import signals
+from graphene.relay import Connection, PageInfo
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    OperationType,
+    get_named_type,
+    get_operation_ast,
+    is_leaf_type,
+    print_ast,
+)
+from graphql.execution import ExecutionResult
+from stringcase import snakecase
+
+CACHE_ALIAS = "graphql_responses"
+
+
+def model_tag(model):
+    return f"gqlresp:tag:{model._meta.label_lower}"
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def invalidate_models(*models):
+    """
+    Drop every cached response that read one of `models`, by moving their tag
+    versions. Done now and again on commit, so a response cached from a read made
+    before the writing transaction committed does not survive it.
+    """
+    if not models:
+        return
+    tags = [model_tag(model) for model in models]
+
+    def bump():
+        get_cache().set_many({tag: time.time_ns() for tag in tags}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+_derived = {}
+
+
+def derived_models(model):
+    """Models that writes to `model` also change, directly or through another derived model."""
+    found, pending = [], list(_derived.get(model, ()))
+    while pending:
+        derived = pending.pop(0)
+        if derived is not model and derived not in found:
+            found.append(derived)
+            pending.extend(_derived.get(derived, ()))
+    return found
+
+
+def _invalidate_sender(sender, **kwargs):
+    if kwargs.get("model") is not None:
+        # m2m_changed is sent by the through model, for both ends of the relation
+        invalidate_models(sender, kwargs["instance"].__class__, kwargs["model"])
+    else:
+        invalidate_models(sender, *derived_models(sender))
+
+
+def connect_invalidation(models, derived=None):
+    """
+    Invalidate responses on the write signals of `models` (those the schema
+    exposes) and of the models derived from them. `derived` maps a model to the
+    models its writes also change through queryset updates and bulk_create, which
+    send no signal. Receivers are connected per sender, so deletes cascading to
+    other models can still skip loading the rows.
+    """
+    _derived.update(derived or {})
+    senders = []
+    for model in models:
+        for sender in [model, *derived_models(model)]:
+            if sender not in senders:
+                senders.append(sender)
+    for sender in senders:
+        label = sender._meta.label_lower
+        signals.post_save.connect(
+            _invalidate_sender, sender=sender, dispatch_uid=f"response_cache_save_{label}"
+        )
+        signals.post_delete.connect(
+            _invalidate_sender, sender=sender, dispatch_uid=f"response_cache_delete_{label}"
+        )
+        for field in sender._meta.many_to_many:
+            through = field.remote_field.through
+            signals.m2m_changed.connect(
+                _invalidate_sender,
+                sender=through,
+                dispatch_uid=f"response_cache_m2m_{through._meta.label_lower}",
+            )
+
+
+def is_connection_plumbing(graphql_type):
+    """Connection, edge and page info types, which only wrap the node types."""
+    graphene_type = getattr(graphql_type, "graphene_type", None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, (Connection, PageInfo)):
+        return True
+    return {"node", "cursor"} <= set(getattr(graphql_type, "fields", {}))
+
+
+@lru_cache(maxsize=None)
+def _hint_models(django_type, field_name):
+    """Models a computed field reads through its select_related resolver hints."""
+    _, hints = django_type._get_fields()
+    models = frozenset()
+    for lookup in hints.get(field_name, {}).get("select_related", ()):
+        model = django_type._meta.model
+        for name in lookup.split("__"):
+            model = model._meta.get_field(name).related_model
+            models |= {model}
+    return models
+
+
+class OperationTags:
+    """
+    Models an operation reads and the shortest TTL of the node types it touches,
+    or `cacheable = False` when it selects anything not backed by a model (plain
+    resolvers such as stockLevels), whose freshness no tag can track.
+    """
+
+    def __init__(self, schema, document, operation, default_ttl):
+        self.schema = schema
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        self.models, self.ttl, self.cacheable = set(), default_ttl, True
+        root_type = schema.get_root_type(operation.operation)
+        for field in self.iter_fields(operation.selection_set):
+            field_def = root_type.fields.get(field.name.value)
+            if field_def is None or is_leaf_type(get_named_type(field_def.type)):
+                self.cacheable = False
+            else:
+                self.visit(get_named_type(field_def.type), field)
+
+    def iter_fields(self, selection_set):
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield selection
+            elif isinstance(selection, FragmentSpreadNode):
+                yield from self.iter_fields(self.fragments[selection.name.value].selection_set)
+            else:
+                yield from self.iter_fields(selection.selection_set)
+
+    def visit(self, graphql_type, field):
+        graphene_type = getattr(graphql_type, "graphene_type", None)
+        model = getattr(getattr(graphene_type, "_meta", None), "model", None)
+        if model is not None:
+            self.models.add(model)
+            ttl = getattr(graphene_type, "cache_ttl", None)
+            if ttl is not None:
+                self.ttl = min(self.ttl, ttl)
+        elif not is_connection_plumbing(graphql_type):
+            self.cacheable = False
+            return
+        for child in self.iter_fields(field.selection_set):
+            name = child.name.value
+            child_def = graphql_type.fields.get(name)
+            if name.startswith("__") or child_def is None:
+                continue
+            child_type = get_named_type(child_def.type)
+            if not is_leaf_type(child_type):
+                self.visit(child_type, child)
+            elif model is not None:
+                self.models.update(_hint_models(graphene_type, snakecase(name)))
+
+
+class ResponseCache:
+    """
+    Cache of query responses in the `graphql_responses` Django cache. Keys combine
+    the normalized document, the variables and the timezone cookie with the
+    current versions of the models the operation reads, so writes to those models
+    make earlier entries unreachable. One request fills a missing entry while the
+    others wait for it, instead of all running the same query at once.
+    """
+
+    def __init__(self, default_ttl=60, lock_timeout=10, lock_wait=2.0, poll_interval=0.05):
+        self.default_ttl = default_ttl
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+
+    def operation_key(self, schema, document, operation_name, variables, request):
+        operation = get_operation_ast(document, operation_name)
+        if operation is None or operation.operation != OperationType.QUERY:
+            return None, None
+        tags = OperationTags(schema, document, operation, self.default_ttl)
+        if not tags.cacheable or tags.ttl <= 0:
+            return None, None
+        cache = get_cache()
+        tag_keys = sorted(model_tag(model) for model in tags.models)
+        versions = cache.get_many(tag_keys)
+        missing = {tag: time.time_ns() for tag in tag_keys if tag not in versions}
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        source = json.dumps(
+            [
+                print_ast(document),
+                operation_name,
+                variables,
+                request.COOKIES.get("timezone"),
+                [versions[tag] for tag in tag_keys],
+            ],
+            sort_keys=True,
+            cls=DjangoJSONEncoder,
+        )
+        return f"gqlresp:{hashlib.sha256(source.encode()).hexdigest()}", tags.ttl
+
+    def get_or_execute(self, key, ttl, execute):
+        """
+        Result for `key` from the cache, else from `execute()`, cached when it has
+        no errors. Returns (result, hit).
+        """
+        cache = get_cache()
+        data = cache.get(key)
+        if data is not None:
+            return ExecutionResult(data=data), True
+
+        lock = f"{key}:lock"
+        locked = cache.add(lock, 1, self.lock_timeout)
+        if not locked:
+            # Someone else is filling it; wait a little for their result
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                data = cache.get(key)
+                if data is not None:
+                    return ExecutionResult(data=data), True
+        try:
+            result = execute()
+            if not result.errors and result.data is not None:
+                cache.set(key, result.data, ttl)
+        finally:
+            if locked:
+                cache.delete(lock)
+        return result, False
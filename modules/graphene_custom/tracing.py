@@ -0,0 +1,204 @@
+import bisect
+import hmac
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+TRACE_HEADER = "X-GraphQL-Trace"
+
+
+def trace_requested(request):
+    """
+    Whether the response of `request` may carry `extensions.tracing`: its
+    X-GraphQL-Trace header must match GRAPHQL_TRACING_TOKEN (any value in DEBUG).
+    """
+    header = request.headers.get(TRACE_HEADER)
+    if not header:
+        return False
+    token = getattr(settings, "GRAPHQL_TRACING_TOKEN", None)
+    if token:
+        return hmac.compare_digest(header, token)
+    return settings.DEBUG
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 3)
+
+
+class Histogram:
+    """
+    Counts of durations in fixed millisecond buckets, with their sum and max. One
+    observation is the time a field took in one operation, over `calls` resolver calls.
+    """
+
+    BOUNDS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = self.calls = 0
+        self.total_ms = self.max_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+
+    def observe(self, ms, calls=1, sql_count=0, sql_ms=0.0):
+        self.buckets[bisect.bisect_left(self.BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.calls += calls
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.sql_count += sql_count
+        self.sql_ms += sql_ms
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the `q` quantile (max past the last bound)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.BOUNDS_MS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "calls": self.calls,
+            "totalMs": round(self.total_ms, 3),
+            "maxMs": round(self.max_ms, 3),
+            "p50Ms": self.percentile(0.5),
+            "p95Ms": self.percentile(0.95),
+            "sqlCount": self.sql_count,
+            "sqlMs": round(self.sql_ms, 3),
+            "buckets": dict(zip([*map(str, self.BOUNDS_MS), "+Inf"], self.buckets)),
+        }
+
+
+class ResolverHistograms:
+    """
+    Process wide histograms of resolver durations keyed by `ParentType.field`, fed
+    by every traced operation, to find the resolvers that cost the most overall.
+    """
+
+    def __init__(self):
+        self._histograms = defaultdict(Histogram)
+        self._lock = threading.Lock()
+
+    def observe(self, key, ms, calls=1, sql_count=0, sql_ms=0.0):
+        with self._lock:
+            self._histograms[key].observe(ms, calls, sql_count, sql_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: histogram.as_dict() for key, histogram in self._histograms.items()}
+
+    def top(self, n=10, by="totalMs"):
+        """The `n` resolvers with the highest `by` (totalMs, sqlMs, maxMs, count...)."""
+        stats = self.snapshot()
+        keys = sorted(stats, key=lambda key: stats[key][by], reverse=True)[:n]
+        return [{"resolver": key, **stats[key]} for key in keys]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+histograms = ResolverHistograms()
+
+
+class FieldStats:
+    __slots__ = ("resolver", "count", "total", "max", "sql_count", "sql_time")
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.count = self.sql_count = 0
+        self.total = self.max = self.sql_time = 0.0
+
+
+class Tracer:
+    """
+    Timings of one operation: the parse / validate / execute phases, and for each
+    field path (list indexes dropped) how often its resolver ran, how long it took
+    and the SQL it sent. It is a graphql middleware and a database execute wrapper;
+    queries are charged to the resolver running when they are sent.
+    """
+
+    def __init__(self, histograms=histograms):
+        self.histograms = histograms
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.fields = {}
+        self.stack = []
+        self.sql_count = 0
+        self.sql_time = self.duration = 0.0
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def resolve(self, next, root, info, **args):
+        path = ".".join(str(key) for key in info.path.as_list() if not isinstance(key, int))
+        stats = self.fields.get(path)
+        if stats is None:
+            stats = self.fields[path] = FieldStats(f"{info.parent_type.name}.{info.field_name}")
+        self.stack.append(stats)
+        started = time.perf_counter()
+        try:
+            return next(root, info, **args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stack.pop()
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            if self.stack:
+                self.stack[-1].sql_count += 1
+                self.stack[-1].sql_time += elapsed
+
+    def finish(self):
+        """Add the time of each field path to the process histograms."""
+        self.duration = time.perf_counter() - self.started
+        if self.histograms is None:
+            return
+        for stats in self.fields.values():
+            self.histograms.observe(
+                stats.resolver,
+                milliseconds(stats.total),
+                stats.count,
+                stats.sql_count,
+                milliseconds(stats.sql_time),
+            )
+
+    def as_extension(self):
+        return {
+            "durationMs": milliseconds(self.duration),
+            "phases": {name: milliseconds(seconds) for name, seconds in self.phases.items()},
+            "sql": {"count": self.sql_count, "durationMs": milliseconds(self.sql_time)},
+            "fields": [
+                {
+                    "path": path,
+                    "resolver": stats.resolver,
+                    "count": stats.count,
+                    "durationMs": milliseconds(stats.total),
+                    "maxMs": milliseconds(stats.max),
+                    "sqlCount": stats.sql_count,
+                    "sqlMs": milliseconds(stats.sql_time),
+                }
+                for path, stats in self.fields.items()
+            ],
+        }
@@ -1,24 +1,88 @@
+import bisect
+import json
+import threading
+
 import graphene
 from graphene import relay
-from django.db.models import Func
+from django.conf import settings
+from django.db import connections
+from django.db.models import Func, QuerySet
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_date, parse_datetime
 import pytz
-from datetime import timedelta, datetime
+from datetime import date, datetime, time
 
 
 class TotalCountConnection(relay.Connection):
     total_count = graphene.Int()
+    total_count_estimate = graphene.Int(
+        description="Planner estimate of totalCount, cheap on very large tables"
+    )
+
+    # Each count is a query of its own
+    field_costs = {"total_count": 1, "total_count_estimate": 1}
 
     class Meta:
         abstract = True
 
     def resolve_total_count(self, info, *args, **kwargs):
+        # Counted on first use only, and once per connection
+        if getattr(self, "_total_count", None) is None:
+            iterable = getattr(self, "iterable", None)
+            if iterable is None:
+                self._total_count = 0
+            else:
+                try:
+                    self._total_count = iterable.count()
+                except Exception:
+                    self._total_count = len(iterable)
+        return self._total_count
+
+    def resolve_total_count_estimate(self, info, *args, **kwargs):
+        if getattr(self, "_total_count", None) is not None:
+            return self._total_count
         iterable = getattr(self, "iterable", None)
         if iterable is None:
             return 0
-        try:
-            return iterable.count()
-        except Exception:
-            return len(iterable)
+        if hasattr(iterable, "estimate_count"):
+            return iterable.estimate_count()
+        if isinstance(iterable, QuerySet) and iterable._result_cache is None:
+            return estimate_count(iterable)
+        return len(iterable)
+
+
+def estimate_count(queryset):
+    """
+    Row count estimate from the Postgres planner: pg_class.reltuples for a whole
+    table, otherwise the row estimate of EXPLAIN for the filtered query.
+    """
+    if not queryset.query.where and not queryset.query.distinct:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 until the table has been vacuumed or analyzed
+        if row and row[0] >= 0:
+            return row[0]
+    plan = json.loads(queryset.explain(format="json"))
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+def input_to_dict(value):
+    """
+    Convert graphene input object containers into plain dicts and lists.
+
+    Containers expose every input field as an attribute, so a model field named
+    like a dict method (e.g. Order.items) hides that method and breaks the
+    dict-based argument handling in graphene-django-crud.
+    """
+    if isinstance(value, dict):
+        return {key: input_to_dict(item) for key, item in dict.items(value)}
+    if isinstance(value, list):
+        return [input_to_dict(item) for item in value]
+    return value
 
 
 class CustomNode(relay.Node):
@@ -38,21 +102,110 @@ class TimeZoneConversion(Func):
         super().__init__(expression, timezone=timezone, **extra)
 
 
+DEFAULT_TIMEZONE = "America/New_York"
+
+_offset_index = {"zones": None, "expires_at": None, "scanned": 0}
+_offset_index_lock = threading.Lock()
+
+
+def _offset_index_stale(index, naive_now):
+    return index["zones"] is None or bool(index["expires_at"] and naive_now >= index["expires_at"])
+
+
+def _scan_offset_index(now, offset=None):
+    """
+    Map each UTC offset in minutes in effect at `now` to the first zone of
+    pytz.all_timezones using it, loading zones in order only until one uses
+    `offset` (all of them when None), and track the next moment a loaded zone
+    changes offset. Most requests come from a handful of offsets whose first zone
+    is early in the list, so the ~600 zone files are rarely all read.
+    """
+    index = _offset_index
+    naive_now = now.replace(tzinfo=None)
+    if _offset_index_stale(index, naive_now):
+        index.update(zones={}, expires_at=None, scanned=0)
+    zones, names = index["zones"], pytz.all_timezones
+    while offset not in zones and index["scanned"] < len(names):
+        name = names[index["scanned"]]
+        tz = pytz.timezone(name)
+        zones.setdefault(int(now.astimezone(tz).utcoffset().total_seconds()) // 60, name)
+        transitions = getattr(tz, "_utc_transition_times", None)
+        if transitions:
+            position = bisect.bisect_right(transitions, naive_now)
+            if position < len(transitions) and (
+                index["expires_at"] is None or transitions[position] < index["expires_at"]
+            ):
+                index["expires_at"] = transitions[position]
+        index["scanned"] += 1
+    return zones
+
+
+def timezone_offset_index(now=None):
+    """
+    offset -> zone name index, built on first use and rebuilt once a DST transition
+    (or any other offset change) makes it stale.
+    """
+    with _offset_index_lock:
+        return _scan_offset_index(now or datetime.now(pytz.utc))
+
+
 def convert_offset_to_timezone(offset_minutes):
-    # Convert minutes to hours and minutes
-    offset_hours = offset_minutes // 60
-    offset_remainder_minutes = offset_minutes % 60
-
-    # Create a timedelta object from the offset
-    offset = timedelta(hours=offset_hours, minutes=offset_remainder_minutes)
-
-    # Create a timezone object from the timedelta
-    now = datetime.now(pytz.utc)  # current time
-    tz_names = [
-        tz.zone
-        for tz in map(pytz.timezone, pytz.all_timezones)
-        if now.astimezone(tz).utcoffset() == offset
-    ]
-    if tz_names:
-        return tz_names[0]
-    return "America/New_York"
+    """Name of a timezone currently `offset_minutes` away from UTC."""
+    now = datetime.now(pytz.utc)
+    index = _offset_index
+    if not _offset_index_stale(index, now.replace(tzinfo=None)):
+        zone = index["zones"].get(offset_minutes)
+        if zone is not None:
+            return zone
+    with _offset_index_lock:
+        return _scan_offset_index(now, offset_minutes).get(offset_minutes, DEFAULT_TIMEZONE)
+
+
+def request_timezone(request):
+    """Timezone of the request's `timezone` cookie (minutes from UTC), memoized on it."""
+    timezone = getattr(request, "_timezone_from_cookie", None)
+    if timezone is None:
+        timezone = convert_offset_to_timezone(int(request.COOKIES.get("timezone", 0)))
+        request._timezone_from_cookie = timezone
+    return timezone
+
+
+def local_to_db_datetime(value, timezone, first=True):
+    """
+    Instant a wall clock `value` in `timezone` denotes, in the form created_at is
+    stored in. Strings and dates are parsed, aware values are kept as they are, and
+    an ambiguous local time picks its `first` (or last) occurrence.
+    """
+    if isinstance(value, str):
+        value = parse_datetime(value) or parse_date(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time())
+    if django_timezone.is_naive(value):
+        tz = pytz.timezone(timezone)
+        value = tz.normalize(tz.localize(value, is_dst=first))
+    return as_db_datetime(value)
+
+
+def as_db_datetime(value):
+    """`value` in the form datetimes are stored in: naive (server time) unless USE_TZ."""
+    if django_timezone.is_aware(value) and not settings.USE_TZ:
+        return django_timezone.make_naive(value)
+    return value
+
+
+def db_now():
+    """The current time, comparable with stored datetimes whatever USE_TZ is."""
+    return as_db_datetime(django_timezone.now())
+
+
+def local_period_range(timezone, year, month=None):
+    """
+    [start, end) created_at bounds of a calendar year, or one of its months, in
+    `timezone`, so the filter can range scan an index on created_at.
+    """
+    start = date(year, month or 1, 1)
+    if month and month < 12:
+        end = date(year, month + 1, 1)
+    else:
+        end = date(year + 1, 1, 1)
+    return local_to_db_datetime(start, timezone), local_to_db_datetime(end, timezone)